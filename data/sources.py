@@ -16,7 +16,9 @@ processed_dir = Path(__file__).resolve().parents[1] / "data" / "processed"
 destatis_tablefile_url = "https://www-genesis.destatis.de/genesisWS/rest/2020/data/tablefile"
 regiostat_url = "https://www-genesis.destatis.de/genesisWS/rest/2020/helloworld/logincheck"
 
-# Beschreibung der einzelnen Abfragen:
+# Beschreibung der einzelnen Abfragen. "tablefile" beschreibt den Aufbau der
+# heruntergeladenen Tabelle für elternsein.genesis.read_tablefile(): Anzahl der
+# Kopfzeilen, die die Spaltennamen bilden, und der führenden Textspalten.
 destatis_sources = {
     "ewz" : {
         # Einwohnerzahlen auf Landesebene von 2009-2022
@@ -24,6 +26,7 @@ destatis_sources = {
         "url": destatis_tablefile_url,
         "raw_file": raw_dir / "destatis_12411-0010_Einwohnerzahlen.csv",
         "processed_file": processed_dir / "ewz.parquet",
+        "tablefile": {"header_rows": 1, "label_cols": 1},
         "params": {
             "username": destatis_login,
             "password": destatis_password,
@@ -53,6 +56,7 @@ destatis_sources = {
         "url": destatis_tablefile_url,
         "raw_file": raw_dir / "destatis_12612-0100_Geburten.csv",
         "processed_file": processed_dir / "geburten.parquet",
+        "tablefile": {"header_rows": 1, "label_cols": 2},
         "params": {
             "username": destatis_login,
             "password": destatis_password,
@@ -86,6 +90,7 @@ destatis_sources = {
         "url": destatis_tablefile_url,
         "raw_file": raw_dir / "destatis_22922-0025_Elterngeldempfangende.csv",
         "processed_file": processed_dir / "eg_empf.parquet",
+        "tablefile": {"header_rows": 2, "label_cols": 3},
         "params": {
             "username": destatis_login,
             "password": destatis_password,
@@ -120,6 +125,7 @@ destatis_sources = {
         "url": destatis_tablefile_url,
         "raw_file": raw_dir / "destatis_22922-0118_dschn_Höhe_EG.csv",
         "processed_file": processed_dir / "eg_hoehe.parquet",
+        "tablefile": {"header_rows": 2, "label_cols": 4},
         "params": {
             "username": destatis_login,
             "password": destatis_password,
@@ -149,6 +155,7 @@ destatis_sources = {
         "url": destatis_tablefile_url,
         "raw_file": raw_dir / "destatis_22922-0125_dschn_Dauer_EG.csv",
         "processed_file": processed_dir / "eg_dauer.parquet",
+        "tablefile": {"header_rows": 1, "label_cols": 3},
         "params": {
             "username": destatis_login,
             "password": destatis_password,
@@ -178,6 +185,7 @@ destatis_sources = {
         "url": regiostat_url,
         "raw_file": raw_dir / "regionalstatistik 73111-01-01-4 - Steuern.csv",
         "processed_file": processed_dir / "steuern.parquet",
+        "tablefile": {"header_rows": 1, "label_cols": 3, "encoding": "latin-1"},
         "params": {
             "username": regiostat_login,
             "password": regiostat_password,
@@ -209,4 +217,45 @@ bkg_source = {
     "raw_file": raw_dir / "vg250.zip",
     "processed_file": processed_dir / "vg250_krs.parquet",
     "extractable": "vg250-ew_12-31.utm32s.gpkg.ebenen/vg250-ew_ebenen_1231/DE_VG250.gpkg",
+    # vereinfachte Varianten der Kreisgeometrien, etwa für die Maßstäbe 1:1 Mio.
+    # und 1:5 Mio.: Toleranz der Vereinfachung in Metern (UTM32; etwa die Wurzel
+    # der Fläche der Dreiecke, die wegfallen), danach Koordinaten gerundet auf
+    # ein Raster von grid_size Grad:
+    "variants": {
+        "1m": {
+            "processed_file": processed_dir / "vg250_krs_1m.parquet",
+            "tolerance": 250,
+            "grid_size": 0.001,
+        },
+        "5m": {
+            "processed_file": processed_dir / "vg250_krs_5m.parquet",
+            "tolerance": 1250,
+            "grid_size": 0.005,
+        },
+    },
+}
+
+# Gemeinden (rund 11.000) aus demselben Archiv. Die Geometrien werden nur
+# einmal gespeichert, mit einer ganzzahligen gid als Schlüssel; Namen,
+# Einwohner, Fläche und die Zuordnung zu Kreis und Land stehen getrennt davon
+# in der Attributtabelle und werden über die gid verknüpft:
+bkg_gem_source = {
+    "raw_file": bkg_source["raw_file"],
+    "extractable": bkg_source["extractable"],
+    "layer": "vg250_gem",
+    "geometry_file": processed_dir / "vg250_gem_geom.parquet",
+    "attribute_file": processed_dir / "vg250_gem.parquet",
+    # vereinfachte Varianten wie bei den Kreisen:
+    "variants": {
+        "1m": {
+            "processed_file": processed_dir / "vg250_gem_geom_1m.parquet",
+            "tolerance": 100,
+            "grid_size": 0.0005,
+        },
+        "5m": {
+            "processed_file": processed_dir / "vg250_gem_geom_5m.parquet",
+            "tolerance": 500,
+            "grid_size": 0.002,
+        },
+    },
 }
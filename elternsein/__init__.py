@@ -1,21 +1,43 @@
-from io import BytesIO
 import sys
+import time
+from io import BytesIO
 from pathlib import Path
-import base64
 import logging
 
-# from flask import Flask
-from dash import Dash, dcc, html  # , Input, Output, State, callback, dash_table
+from flask import abort, g, jsonify, request, send_file
+from dash import Dash, dcc, html, Input, Output, State, Patch  # , callback, dash_table
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
 base_dir = Path(__file__).resolve().parents[1]
 sys.path.append(base_dir)
 
 # from data.sources import destatis_sources, bkg_source
-from . import viz
-from .config import current_language
+from .viz import choropleth
+from .viz.cht_krs_steuern_bezdauer import (
+    steuern_bezdauer_years,
+    steuern_bezdauer_values,
+    steuern_bezdauer_title,
+)
+from .figcache import (
+    get_figure,
+    cache_stats,
+    cache_key,
+    figure_specs,
+    image_variants,
+    layout_figures,
+)
+from .querycache import query_stats, timed_callback
+from .config import (
+    current_language,
+    language_codes,
+    lazy_layout,
+    map_engine,
+    map_image_widths,
+    map_image_formats,
+)
 from .language_context import language_context
-from .i18n import translate as t
+from .i18n import translate as t, dictionary_cache, translation_batch
 
 # set up logging:
 logging.basicConfig(
@@ -26,11 +48,30 @@ logging.basicConfig(
 formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 root_logger = logging.getLogger()
 root_logger.handlers[0].setFormatter(formatter)
+logger = logging.getLogger(__name__)
+
 
+def route_language(route: str) -> str:
+    """
+    Return the language a route is for: its first path segment that is a
+    language code (as in "/en/elternsein/"), else config.current_language.
+    """
+    for segment in route.strip("/").split("/"):
+        if segment in language_codes:
+            return segment
 
-def init_dashboard(flask_app, route):
+    return current_language
 
-    language_context.set_language(current_language)
+
+def init_dashboard(flask_app, route, language: str = None):
+    """
+    Add the dashboard in <language> (default: the one in <route>) to
+    <flask_app> under <route>. Called once per language, all of them are
+    served by the same process: data, query results and figures are cached
+    per process (figures and anything translated per language), so each
+    further language only costs its layout and its translated figures.
+    """
+    language = language or route_language(route)
 
     app = Dash(
         __name__,
@@ -40,40 +81,188 @@ def init_dashboard(flask_app, route):
         external_stylesheets=[dbc.themes.FLATLY],
     )
 
+    start = time.perf_counter()
+    before = cache_stats.as_dict()
+
+    # strings missing from the dictionary are collected while building and
+    # translated in one batch at the end; if there were any, the first build
+    # still shows placeholders and we build once more:
+    with language_context.using(language):
+        with translation_batch(language) as batch:
+            app.layout = build_layout(route, lazy=lazy_layout)
+
+        if batch.translated:
+            app.layout = build_layout(route, lazy=lazy_layout)
+
+    init_request_language(flask_app, route, language)
+    init_routes(flask_app, route)
+    if lazy_layout:
+        init_callbacks(app, route, language)
+    if map_engine == "choropleth":
+        init_map_callbacks(app)
+    init_chart_callbacks(app)
+
+    elapsed = time.perf_counter() - start
+    # nur die Figuren dieses Aufrufs; mit lazy_layout werden keine geladen:
+    stats = {key: value - before[key] for key, value in cache_stats.as_dict().items()}
+    if stats["hits"] + stats["misses"]:
+        start_kind = "warm" if stats["misses"] == 0 else "cold"
+        logger.info(
+            f"Dashboard init ({language}) took {elapsed:.2f} s "
+            f"({start_kind} start, figure cache: {stats})."
+        )
+    else:
+        logger.info(f"Dashboard init ({language}) took {elapsed:.2f} s (no figures loaded).")
+    logger.info(f"Dictionary cache after init: {dictionary_cache.stats()}")
+    logger.info(f"Query cache after init: {query_stats.as_dict()}")
+
+    return app
+
+
+image_mimetypes = {
+    "png": "image/png",
+    "webp": "image/webp",
+}
+
+
+def map_picture(name: str, language: str, route: str):
+    """
+    Return a <picture> element for map <name>, pointing to the image files
+    served by init_routes() in all configured widths and formats. The cache
+    key in the URLs lets browsers keep the files as long as they are current.
+    """
+    key = cache_key(name, language)
+
+    def url(width, fmt):
+        return f"{route}maps/{language}/{name}-{width}.{fmt}?v={key}"
+
+    def srcset(fmt):
+        return ", ".join(f"{url(width, fmt)} {width}w" for width in map_image_widths)
+
+    fallback = map_image_formats[-1]
+
+    return html.Picture(
+        [
+            html.Source(type=image_mimetypes[fmt], srcSet=srcset(fmt), sizes="100vw")
+            for fmt in map_image_formats[:-1]
+        ]
+        + [
+            html.Img(
+                src=url(max(map_image_widths), fallback),
+                srcSet=srcset(fallback),
+                sizes="100vw",
+                style={"width": "100%"},
+            )
+        ]
+    )
+
+
+def lazy_slot(name: str, placeholder):
+    """
+    Wrap an empty figure placeholder, so assets/lazy.js can tell the server
+    (via the "<name>-visible" store) when it scrolls into view.
+    """
+    return html.Div(
+        [
+            dcc.Store(id=f"{name}-visible", data=False),
+            dcc.Loading(placeholder),
+        ],
+        className="lazy-figure",
+        **{"data-store": f"{name}-visible"},
+    )
+
+
+def build_layout(route: str, lazy: bool = False):
+    """
+    Compute all texts in the current language and assemble them into the app
+    layout. Figures are either computed right away, or, if <lazy>, left as
+    placeholders for init_callbacks() to fill in.
+    """
+    language = language_context.get_language()
+
+    def graph(name, height):
+        if not lazy:
+            return dcc.Graph(id=name, figure=get_figure(name))
+        return lazy_slot(name, dcc.Graph(id=name, style={"height": f"{height}px"}))
+
+    def bitmap(name):
+        if not lazy:
+            return html.Div(map_picture(name, language, route), id=name)
+        return lazy_slot(name, html.Div(id=name))
+
     #
     # Plotly elements
     # (defined outside the layout, so it stays legible)
     # =========================================================================
 
     # Births:
-    fig_gb = dcc.Graph(id="fig_gb", figure=viz.cht_births())
+    fig_gb = graph("fig_gb", height=800)
 
     # recipients of Elterngeld:
-    fig_eg = dcc.Graph(id="fig_eg", figure=viz.cht_eg())
+    fig_eg = graph("fig_eg", height=550)
 
     # EG recipients vs. births:
-    fig_egb = dcc.Graph(id="fig_egb", figure=viz.cht_eg_births())
-
-    # map: months of EG support:
-    fig, axs = viz.map_bezdauer()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", transparent=True)
-    plot_map_bezdauer_data = base64.b64encode(buf.getbuffer()).decode("ascii")
-    bezdauer_bitmap = f"data:image/png;base64,{plot_map_bezdauer_data}"
-    fig_map_bezdauer = html.Img(src=bezdauer_bitmap, style={"width": "100%"})
-
-    # map: taxes:
-    fig, ax = viz.map_steuern()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", transparent=True)
-    taxes_bitmap = "data:image/png;base64," + base64.b64encode(buf.getbuffer()).decode(
-        "ascii"
-    )
-    fig_map_taxes = html.Img(src=taxes_bitmap, style={"width": "100%"})
+    fig_egb = graph("fig_egb", height=800)
 
-    # tax level vs. months of EG support
-    fig_taxes_egdauer = dcc.Graph(
-        id="fig_taxes_egdauer", figure=viz.cht_krs_steuern_bezdauer()
+    def choropleth_map(name, controls):
+        return html.Div(
+            [
+                dcc.Store(id=f"{name}-level", data="coarse"),
+                dbc.Row([dbc.Col(control, xs=12, md=True) for control in controls]),
+                graph(name, height=750),
+            ]
+        )
+
+    def year_slider(name, years, value=None):
+        return dcc.Slider(
+            id=f"{name}-jahr",
+            min=min(years),
+            max=max(years),
+            step=1,
+            value=value if value is not None else max(years),
+            marks={year: str(year) for year in years},
+        )
+
+    def radio(name, var, values):
+        return dcc.RadioItems(
+            id=f"{name}-{var}",
+            options=[{"label": t(value), "value": value} for value in values],
+            value=values[0],
+            inline=True,
+            inputStyle={"marginRight": "4px", "marginLeft": "12px"},
+        )
+
+    if map_engine == "choropleth":
+        # map: months of EG support:
+        fig_map_bezdauer = choropleth_map(
+            "chp_bezdauer",
+            [
+                year_slider("chp_bezdauer", choropleth.bezdauer_years()),
+                radio("chp_bezdauer", "egplus", ["Mit Elterngeld Plus", "Ohne Elterngeld Plus", "Insgesamt"]),
+                radio("chp_bezdauer", "fm", ["Insgesamt", "weiblich", "männlich"]),
+            ],
+        )
+
+        # map: taxes:
+        fig_map_taxes = choropleth_map(
+            "chp_steuern",
+            [year_slider("chp_steuern", choropleth.steuern_years())],
+        )
+
+    else:
+        # map: months of EG support:
+        fig_map_bezdauer = bitmap("map_bezdauer")
+
+        # map: taxes:
+        fig_map_taxes = bitmap("map_steuern")
+
+    # tax level vs. months of EG support (the figure shows the first year):
+    taxes_egdauer_years = steuern_bezdauer_years()
+    fig_taxes_egdauer = html.Div(
+        [
+            year_slider("fig_taxes_egdauer", taxes_egdauer_years, value=taxes_egdauer_years[0]),
+            graph("fig_taxes_egdauer", height=600),
+        ]
     )
 
     #
@@ -132,7 +321,7 @@ def init_dashboard(flask_app, route):
         return out
 
 
-    app.layout = html.Div(
+    layout = html.Div(
         [
             html.Div(className="background-fixed"),
             html.Div(
@@ -168,51 +357,196 @@ def init_dashboard(flask_app, route):
         ]
     )
 
-    # init_callbacks(app, data_bund, data_raw)
+    return layout
+
+
+def init_request_language(flask_app, route, language):
+    """
+    Let every request under <route> (page, layout, callbacks, images) run in
+    <language>: it is set in the request context, not for the process, so
+    the dashboards of all languages can answer side by side.
+    """
+    languages = flask_app.extensions.setdefault("elternsein_languages", {})
+
+    # ein Hook für alle Routen, beim ersten Dashboard angemeldet:
+    if not languages:
+        @flask_app.before_request
+        def set_request_language():
+            for prefix, prefix_language in languages.items():
+                if request.path.startswith(prefix):
+                    g.language = prefix_language
+                    return
+
+    languages[route] = language
+
+
+def init_routes(flask_app, route):
+    """
+    Serve the maps as image files with ETag and Cache-Control headers. URLs
+    carrying the current cache key (?v=, see map_picture()) may be cached for
+    good; anything else has to be revalidated.
+
+    Also serve the cache statistics of the worker that answers, as JSON:
+    figure and query cache hits, and the latency of each callback.
+    """
+    @flask_app.route(f"{route}stats", endpoint=f"{route}stats")
+    def stats():
+        return jsonify(figures=cache_stats.as_dict(), queries=query_stats.as_dict())
+
+    @flask_app.route(
+        f"{route}maps/<language>/<name>-<int:width>.<fmt>",
+        endpoint=f"{route}maps",
+    )
+    def map_image(language, name, width, fmt):
+        if (
+            language not in language_codes
+            or figure_specs.get(name, {}).get("kind") != "image"
+            or (width, fmt) not in image_variants()
+        ):
+            abort(404)
+
+        language_context.set_language(language)
+        with translation_batch(language) as batch:
+            images = get_figure(name)
+        if batch.translated:
+            images = get_figure(name)
+        key = cache_key(name, language)
+        current = request.args.get("v") == key
+
+        response = send_file(
+            BytesIO(images[(width, fmt)]),
+            mimetype=image_mimetypes[fmt],
+            etag=f"{key}-{width}.{fmt}",
+            max_age=365 * 24 * 3600 if current else 0,
+        )
+        response.cache_control.public = True
+        if current:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+
+        return response
+
+
+def init_callbacks(app, route, language):
+    """
+    Fill in the lazy figure placeholders once they scroll into view. Figures
+    come from the memoized figure cache, so each one is only built once per
+    process and language; for maps, only the <picture> element is sent and
+    the browser fetches the image files from init_routes().
+    """
+    for name, spec in figure_specs.items():
+        if name not in layout_figures():
+            continue
+
+        prop = "figure" if spec["kind"] == "plotly" else "children"
+
+        app.callback(
+            Output(name, prop),
+            Input(f"{name}-visible", "data"),
+            prevent_initial_call=True,
+        )(timed_callback(f"load_{name}")(figure_loader(name, spec["kind"], route, language)))
+
+
+def init_map_callbacks(app):
+    """
+    Interaction with the choropleth maps: a new selection only replaces the
+    z values of the map trace (from the query cache, see
+    => elternsein.querycache), and zooming in swaps in finer geometries once
+    per level. Everything else stays in the browser.
+    """
+    @app.callback(
+        Output("chp_bezdauer", "figure", allow_duplicate=True),
+        Input("chp_bezdauer-jahr", "value"),
+        Input("chp_bezdauer-egplus", "value"),
+        Input("chp_bezdauer-fm", "value"),
+        prevent_initial_call=True,
+    )
+    @timed_callback("update_bezdauer")
+    def update_bezdauer(jahr, egplus, fm):
+        patch = Patch()
+        patch["data"][0]["z"] = choropleth.bezdauer_values(jahr, egplus, fm)
+        return patch
+
+    @app.callback(
+        Output("chp_steuern", "figure", allow_duplicate=True),
+        Input("chp_steuern-jahr", "value"),
+        prevent_initial_call=True,
+    )
+    @timed_callback("update_steuern")
+    def update_steuern(jahr):
+        patch = Patch()
+        patch["data"][0]["z"] = choropleth.steuern_values(jahr)
+        return patch
+
+    for name in ["chp_bezdauer", "chp_steuern"]:
+        app.callback(
+            Output(name, "figure", allow_duplicate=True),
+            Output(f"{name}-level", "data"),
+            Input(name, "relayoutData"),
+            State(f"{name}-level", "data"),
+            prevent_initial_call=True,
+        )(timed_callback(f"zoom_{name}")(update_geometry_level))
+
+
+def init_chart_callbacks(app):
+    """
+    The year slider of the tax chart: only x, y and customdata of its traces
+    and the title are replaced. The values of each year come from the query
+    cache, so they are only made once for all workers.
+    """
+    @app.callback(
+        Output("fig_taxes_egdauer", "figure", allow_duplicate=True),
+        Input("fig_taxes_egdauer-jahr", "value"),
+        prevent_initial_call=True,
+    )
+    @timed_callback("update_taxes_egdauer")
+    def update_taxes_egdauer(jahr):
+        patch = Patch()
+        for i, values in enumerate(steuern_bezdauer_values(jahr)):
+            for prop, value in values.items():
+                patch["data"][i][prop] = value
+        patch["layout"]["title"]["text"] = steuern_bezdauer_title(jahr)
+        return patch
+
 
-    return app
+def update_geometry_level(relayout, current_level):
+    """
+    Swap the map's geometries for the level that fits the new zoom.
+    """
+    if not relayout or "mapbox.zoom" not in relayout:
+        raise PreventUpdate
+
+    level = choropleth.level_for_zoom(relayout["mapbox.zoom"])
+    if level == current_level:
+        raise PreventUpdate
+
+    patch = Patch()
+    patch["data"][0]["geojson"] = choropleth.krs_geojson(level)
+
+    return patch, level
+
+
+def figure_loader(name: str, kind: str, route: str, language: str):
+    """
+    Return the callback that delivers figure <name>. It runs in the
+    language of its route (see init_request_language()). Strings missing from
+    the dictionary are translated in one batch, as in init_dashboard().
+    """
+    def load(visible):
+        if not visible:
+            raise PreventUpdate
+
+        if kind != "plotly":
+            return map_picture(name, language, route)
+
+        with translation_batch(language) as batch:
+            fig = get_figure(name)
+
+        # mit Platzhaltern gebaut und nicht gecacht, also nochmal:
+        if batch.translated:
+            fig = get_figure(name)
 
+        return fig
 
-# def init_callbacks(app, data_bund, data_raw):
-
-# DEBUG: display sunburst clickdata:
-# @app.callback(
-#     Output("location", "children"),
-#     Input("fig-sunburst", "clickData")
-# )
-# def update_location(clickdata):
-#     return(sunburst_location(clickdata))
-# ---------------------------------
-
-# Update Presence chart
-# @app.callback(Output("fig-key-presence", "figure"),
-#               Input("fig-sunburst", "clickData"),
-#               Input("table-textsearch", "derived_viewport_data"),
-#               Input("tabs", "active_tab"))
-# def update_presence_chart(keypicker_parent, table_data, active_tab):
-#     """
-#     Presence chart
-#     """
-#     if active_tab == "keypicker":
-#         key = sunburst_location(keypicker_parent)
-
-#         if key == "root" or key is None:  # just special syntax for when parent is None
-#             child_keys = data_bund.loc[
-#                 data_bund.parent.eq("------")
-#                 ].key.unique()
-#         else:
-#             child_keys = data_bund.loc[data_bund.parent == key].key.unique(
-#             )
-#         selected_keys = child_keys
-
-#     elif active_tab == "textsearch":
-#         selected_keys = []
-#         for element in table_data:
-#             selected_keys.append(element["key"])
-
-#     colormap = {k: grp.color.iloc[0]
-#                 for k, grp in data_bund.groupby("key")}
-
-#     fig = get_presence_chart(data_bund, selected_keys, colormap)
-
-#     return (fig)
+    return load
@@ -0,0 +1,39 @@
+// Lazy figures: when a placeholder (class "lazy-figure") scrolls into view,
+// set the dcc.Store named in its data-store attribute, so the server-side
+// callback fills in the figure (see init_callbacks() in __init__.py).
+(function () {
+    function reveal(element) {
+        window.dash_clientside.set_props(element.dataset.store, {data: true});
+    }
+
+    var observer = null;
+    if ("IntersectionObserver" in window) {
+        observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    reveal(entry.target);
+                }
+            });
+        }, {rootMargin: "300px 0px"});
+    }
+
+    // Dash renders the layout after page load, so we watch for new
+    // placeholders instead of looking for them once:
+    function watch() {
+        var elements = document.querySelectorAll(".lazy-figure:not([data-watched])");
+        elements.forEach(function (element) {
+            element.dataset.watched = "true";
+            if (observer) {
+                observer.observe(element);
+            } else {
+                reveal(element);
+            }
+        });
+    }
+
+    new MutationObserver(watch).observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+    });
+})();
@@ -0,0 +1,785 @@
+"""
+Benchmarks for the data pipeline.
+
+    python -m elternsein.bench [name ...]
+
+Without names, all benchmarks run. Each prints one line per case with the
+best of several runs.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import chardet
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import plotly.graph_objects as go
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(base_dir))
+
+from data.sources import destatis_sources
+from .genesis import read_tablefile, wide_to_long
+from .download import Utf8Transcoder, chunk_size
+from .utils import num, nums
+from .datasets import kreise_steuern_egdauer
+from .viz.geometry import krs_geometry, krs_shapes
+from .viz.map_bezdauer import bezdauer_facets
+from .viz.map_steuern import steuern_frame
+from .viz.traces import grouped_traces, bulk_figure
+from .viz import cht_births, cht_eg, cht_eg_births, cht_krs_steuern_bezdauer
+from .viz.cht_krs_steuern_bezdauer import steuern_bezdauer_years, steuern_bezdauer_values, steuern_bezdauer_title
+from . import datasets, querycache
+from .viz import choropleth
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """
+    Run <func> <repeat> times and return the fastest run in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def report(name: str, before: float, after: float) -> None:
+    print(
+        f"{name:<24} {before * 1000:>9.1f} ms  {after * 1000:>9.1f} ms"
+        f"  {before / after:>6.1f}x"
+    )
+
+
+#
+# GENESIS-Tabellen
+# =============================================================================
+# So hat import.py die Tabellen bisher gelesen (python-Engine wegen skipfooter):
+legacy_read_args = {
+    "geburten": {"skiprows": 4, "skipfooter": 3},
+    "eg_empf": {"skiprows": 6, "header": [0, 1], "skipfooter": 25},
+    "eg_hoehe": {"skiprows": 6, "header": [0, 1], "skipfooter": 3},
+    "eg_dauer": {"skiprows": 5, "skipfooter": 4},
+    "steuern": {"skiprows": 5, "skipfooter": 4, "encoding": "latin-1"},
+    "ewz": {"skiprows": 5, "skipfooter": 4},
+}
+
+# Größe synthetischer Tabellen für den Fall, dass die Rohdaten fehlen
+# (Zeilen, Wertespalten); das Layout kommt aus destatis_sources:
+synthetic_shapes = {
+    "geburten": (17 * 3, 13),
+    "eg_empf": (17 * 3 * 4, 13 * 4),
+    "eg_hoehe": (17 * 3 * 3 * 3, 7 * 4),
+    "eg_dauer": (400 * 3 * 2, 8),
+    "steuern": (3766, 3),
+    "ewz": (17, 14),
+}
+
+
+def write_synthetic_tablefile(path: Path, source: str, n_rows: int = None, encoding: str = None) -> None:
+    """
+    Write a GENESIS-like tablefile with the layout of <source> and the same
+    number of title and footer lines the legacy parse expects.
+
+    :param path: where to write the file
+    :param source: key of destatis_sources whose layout to imitate
+    :param n_rows: number of body rows (default: about as many as the real table)
+    :param encoding: encoding of the file (default: that of the real table)
+    """
+    layout = destatis_sources[source]["tablefile"]
+    legacy = legacy_read_args[source]
+    default_rows, n_values = synthetic_shapes[source]
+    n_rows = n_rows or default_rows
+    label_cols = layout["label_cols"]
+    header_rows = layout["header_rows"]
+    rng = random.Random(source)
+
+    def value():
+        x = rng.random()
+        if x < 0.05:
+            return rng.choice(["-", "/", "."])
+        if source != "eg_dauer":
+            return str(rng.randrange(10000))
+        return f"{rng.uniform(0, 20):.1f}".replace(".", ",")
+
+    # Zeiträume wie bei Destatis: Jahre ab 2015, bei zwei Kopfzeilen je vier
+    # Quartale:
+    if source == "steuern":
+        header = [[f"0_{i}" for i in range(n_values)]]
+    elif header_rows == 2:
+        header = [
+            [str(2015 + i // 4) for i in range(n_values)],
+            [f"{i % 4 + 1}. Quartal" for i in range(n_values)],
+        ]
+    else:
+        prefix = "31.12." if source == "ewz" else ""
+        header = [[f"{prefix}{2015 + i}" for i in range(n_values)]]
+
+    lines = [f"GENESIS-Tabelle: {source}"]
+    lines += [f"Titelzeile {i}" for i in range(1, legacy["skiprows"])]
+    for row in header:
+        lines.append(";" * label_cols + ";".join(row))
+    if source == "steuern":
+        lines.append(";" * label_cols + ";".join("Anzahl" for _ in range(n_values)))
+    for row in range(n_rows):
+        labels = [f"Landkreis Süd-{row}"] + [
+            ["Insgesamt", "männlich", "weiblich"][(row + i) % 3] for i in range(1, label_cols)
+        ]
+        lines.append(";".join(labels + [value() for _ in range(n_values)]))
+    lines.append("__________")
+    lines += [f"Fußnote {i}" for i in range(1, legacy["skipfooter"])]
+
+    path.write_text("\n".join(lines) + "\n", encoding=encoding or layout.get("encoding", "utf-8"))
+
+
+def bench_genesis(repeat: int = 5) -> None:
+    """
+    Legacy python-engine parse vs read_tablefile() for each Destatis table.
+    Tables that have not been downloaded are replaced by synthetic ones.
+    """
+    print(f"{'table':<24} {'python':>12} {'tablefile':>12}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for source, legacy in legacy_read_args.items():
+            path = destatis_sources[source]["raw_file"]
+            name = source
+            if not path.exists():
+                path = Path(temp_dir) / f"{source}.csv"
+                write_synthetic_tablefile(path, source)
+                name = f"{source} (synthetic)"
+
+            layout = destatis_sources[source]["tablefile"]
+            before = best_of(
+                lambda: pd.read_csv(path, sep=";", engine="python", **legacy),
+                repeat,
+            )
+            after = best_of(lambda: read_tablefile(path, **layout), repeat)
+            report(name, before, after)
+
+
+#
+# Umformen von breit nach lang
+# =============================================================================
+# So hat import.py die Tabellen bisher umgeformt:
+def legacy_geburten(df):
+    return (df
+     .rename({"Unnamed: 0": "land", "Unnamed: 1": "fm"}, axis=1)
+     .set_index(["land", "fm"])
+     .loc[(slice(None), ["männlich", "weiblich"]), :]
+     .rename_axis(axis=1, mapper="jahr")
+     .stack(future_stack=True)
+     .to_frame("geburten")
+     .reorder_levels(["jahr", "land", "fm"])
+     .sort_index()
+     .reset_index()
+     .astype({"jahr": pd.Int64Dtype()})
+    )
+
+
+def legacy_eg_empf(df):
+    df = (df
+        .rename(columns={"Unnamed: 0_level_0": "land",
+                         "Unnamed: 1_level_0": "fm",
+                         "Unnamed: 2_level_0": "art",
+                         "Unnamed: 0_level_1": "",
+                         "Unnamed: 1_level_1": "",
+                         "Unnamed: 2_level_1": ""})
+        .rename_axis(columns=("jahr", "quartal"))
+    )
+    df.columns = ['_'.join(col).strip() for col in df.columns.values]
+
+    return (
+        df
+        .drop("2021_4. Quartal", axis=1)
+        .rename(columns={"land_": "land", "fm_": "fm", "art_": "art"})
+        .set_index(["land", "fm", "art"])
+        .rename_axis("jahr_quartal", axis=1)
+        .stack(future_stack=True)
+        .to_frame("pers")
+        .reset_index(level=3)
+        .assign(jahr=lambda x: x["jahr_quartal"].str.extract(r"(\d{4})"))
+        .assign(quartal=lambda x: x["jahr_quartal"].str[5])
+        .drop("jahr_quartal", axis=1)
+        .set_index(["jahr", "quartal"], append=True)
+        .reorder_levels(["jahr", "quartal", "land", "fm", "art"])
+        .reset_index()
+        .astype({"jahr": pd.Int64Dtype(), "quartal": pd.Int64Dtype()})
+    )
+
+
+def legacy_eg_hoehe(df):
+    df = (df
+          .rename(columns={"Unnamed: 0_level_0": "state",
+                         "Unnamed: 1_level_0": "sex",
+                         "Unnamed: 2_level_0": "egplus",
+                         "Unnamed: 3_level_0": "erwerbstaetig",
+                         "Unnamed: 0_level_1": "",
+                         "Unnamed: 1_level_1": "",
+                         "Unnamed: 2_level_1": "",
+                         "Unnamed: 3_level_1": "",})
+          .rename_axis(columns=("year", "quarter"))
+    )
+    df.columns = ['_'.join(col).strip() for col in df.columns.values]
+
+    return (
+        df
+        .rename(columns={"state_": "state", "sex_": "sex", "egplus_": "egplus", "erwerbstaetig_": "erwerbstaetig"})
+        .set_index(["state", "sex", "egplus", "erwerbstaetig"])
+        .rename_axis("year_quarter", axis=1)
+        .stack(future_stack=True)
+        .to_frame("eur")
+        .reset_index(level=4)
+        .assign(year=lambda x: x["year_quarter"].str.extract(r"(\d{4})"))
+        .assign(quarter=lambda x: x["year_quarter"].str[5])
+        .drop("year_quarter", axis=1)
+        .set_index(["year", "quarter"], append=True)
+        .reorder_levels(["year", "quarter", "state", "egplus", "erwerbstaetig", "sex"])
+        .sort_index()
+        .reset_index()
+        .astype({"year": pd.Int64Dtype(), "quarter": pd.Int64Dtype(), "eur": pd.Int64Dtype()})
+    )
+
+
+def legacy_eg_dauer(df):
+    return (df
+        .rename(columns={"Unnamed: 0": "krs", "Unnamed: 1": "fm", "Unnamed: 2": "egplus"})
+        .rename_axis(columns="jahr")
+        .set_index(["krs", "fm", "egplus"])
+        .stack(future_stack=True)
+        .to_frame("monate")
+        .reorder_levels(["jahr", "krs", "fm", "egplus"])
+        .sort_index()
+        .reset_index()
+        .astype({"jahr": pd.Int64Dtype(), "monate": pd.Float64Dtype()})
+    )
+
+
+def legacy_ewz(df):
+    return (df
+     .rename({"Unnamed: 0": "land"}, axis=1)
+     .set_index(["land"])
+     .rename_axis(axis=1, mapper="jahr")
+     .rename(columns=lambda x: re.sub(r"31\.12\.", "", x))
+     .stack(future_stack=True)
+     .to_frame("ewz")
+     .reorder_levels(["jahr", "land"])
+     .sort_index()
+     .reset_index()
+     .astype({"jahr": pd.Int64Dtype(), "ewz": pd.Int64Dtype()})
+    )
+
+
+legacy_reshapes = {
+    "geburten": legacy_geburten,
+    "eg_empf": legacy_eg_empf,
+    "eg_hoehe": legacy_eg_hoehe,
+    "eg_dauer": legacy_eg_dauer,
+    "ewz": legacy_ewz,
+}
+
+
+def reshape_geburten(df):
+    df = df.loc[df.iloc[:, 1].isin(["männlich", "weiblich"])]
+    return wide_to_long(df, ["land", "fm"], "geburten").sort_values(["jahr", "land", "fm"], ignore_index=True)
+
+
+def reshape_eg_empf(df):
+    df = df.drop(columns=[("2021", "4. Quartal")])
+    return wide_to_long(df, ["land", "fm", "art"], "pers", periods=["jahr", "quartal"])
+
+
+def reshape_eg_hoehe(df):
+    df = wide_to_long(df, ["state", "sex", "egplus", "erwerbstaetig"], "eur", periods=["year", "quarter"])
+    order = ["year", "quarter", "state", "egplus", "erwerbstaetig", "sex"]
+    return df[order + ["eur"]].sort_values(order, ignore_index=True)
+
+
+def reshape_eg_dauer(df):
+    df = wide_to_long(df, ["krs", "fm", "egplus"], "monate")
+    return df.sort_values(["jahr", "krs", "fm", "egplus"], ignore_index=True)
+
+
+def reshape_ewz(df):
+    df = wide_to_long(df, ["land"], "ewz")
+    return df.sort_values(["jahr", "land"], ignore_index=True)
+
+
+# dieselben Schritte, wie import.py sie jetzt macht:
+reshapes = {
+    "geburten": reshape_geburten,
+    "eg_empf": reshape_eg_empf,
+    "eg_hoehe": reshape_eg_hoehe,
+    "eg_dauer": reshape_eg_dauer,
+    "ewz": reshape_ewz,
+}
+
+
+def bench_reshape(repeat: int = 5, scale: int = 10) -> None:
+    """
+    stack()-chains vs. wide_to_long() on synthetic tables <scale> times as
+    long as the real ones; time and peak memory of the reshaping alone.
+    """
+    print(f"{'table':<24} {'stack':>12} {'wide_to_long':>12}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for source, legacy in legacy_reshapes.items():
+            path = Path(temp_dir) / f"{source}.csv"
+            write_synthetic_tablefile(path, source, n_rows=synthetic_shapes[source][0] * scale)
+            df = read_tablefile(path, **destatis_sources[source]["tablefile"])
+
+            before = lambda: legacy(df)
+            after = lambda: reshapes[source](df)
+            report(source, best_of(before, repeat), best_of(after, repeat))
+            print(
+                f"{'  peak memory':<24} {peak_memory(before) / 1e6:>9.1f} MB"
+                f"  {peak_memory(after) / 1e6:>9.1f} MB"
+            )
+
+
+#
+# Umkodierung beim Download
+# =============================================================================
+def peak_memory(func) -> int:
+    """
+    Run <func> and return the peak of memory allocated meanwhile, in bytes.
+    """
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak
+
+
+def bench_transcode(repeat: int = 5, n_rows: int = 100_000) -> None:
+    """
+    Whole-body chardet plus decode/encode, as download.py used to do, vs
+    Utf8Transcoder over the same bytes in download-sized chunks, on a large
+    synthetic Windows-1252 table.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = Path(temp_dir) / "eg_dauer.csv"
+        target = Path(temp_dir) / "eg_dauer.utf8.csv"
+        write_synthetic_tablefile(source, "eg_dauer", n_rows=n_rows, encoding="cp1252")
+        print(f"{source.stat().st_size / 1e6:.1f} MB, {n_rows} rows")
+
+        def full_body():
+            content = source.read_bytes()
+            encoding = chardet.detect(content)["encoding"]
+            target.write_bytes(content.decode(encoding).encode("utf-8"))
+
+        def streaming():
+            transcoder = Utf8Transcoder()
+            with open(source, "rb") as infile, open(target, "wb") as outfile:
+                while chunk := infile.read(chunk_size):
+                    outfile.write(transcoder.feed(chunk))
+                outfile.write(transcoder.finish())
+
+        print(f"{'':<24} {'chardet':>12} {'streaming':>12}")
+        # chardet over the whole body is slow, once is enough:
+        report("time", best_of(full_body, 1), best_of(streaming, repeat))
+        before, after = peak_memory(full_body), peak_memory(streaming)
+        print(f"{'peak memory':<24} {before / 1e6:>9.1f} MB  {after / 1e6:>9.1f} MB")
+
+
+#
+# Kartendaten
+# =============================================================================
+def legacy_bezdauer_facets() -> dict:
+    """
+    Data preparation of map_bezdauer() as it was: merge everything with the
+    geometries, then select.
+    """
+    eg = pd.read_parquet(destatis_sources["eg_dauer"]["processed_file"])
+    gdf = krs_geometry()
+    df = gpd.GeoDataFrame(pd.merge(eg, gdf[["ags", "geom"]], on="ags"), geometry="geom")
+    df_plot = df.query('egplus == "Mit Elterngeld Plus" and jahr == 2023')
+
+    return {fm: df_plot.loc[df_plot.fm.eq(fm)] for fm in df_plot.fm.unique()}
+
+
+def legacy_steuern_frame() -> gpd.GeoDataFrame:
+    dfs = pd.read_parquet(destatis_sources["steuern"]["processed_file"])
+    dfs = dfs.query("jahr == 2019")
+    dfs = dfs.loc[dfs.rs.str.len().le(5)]
+    dfs["ags"] = dfs.rs.str.ljust(8, "0")
+    gdf = krs_geometry()
+
+    return gpd.GeoDataFrame(pd.merge(dfs, gdf[["ags", "geom"]], on="ags"), geometry="geom")
+
+
+def bench_maps(repeat: int = 5) -> None:
+    """
+    Data preparation of the matplotlib maps: merge then filter vs. filter
+    then join by AGS, on the processed data (geometries already loaded; the
+    legacy path reads its table each time, the new one gets it from
+    => elternsein.datasets).
+    """
+    krs_geometry()
+    krs_shapes()
+
+    cases = {
+        "map_bezdauer": (legacy_bezdauer_facets, bezdauer_facets),
+        "map_steuern": (legacy_steuern_frame, steuern_frame),
+    }
+
+    print(f"{'':<24} {'merge':>12} {'join':>12}")
+    for name, (before, after) in cases.items():
+        report(name, best_of(before, repeat), best_of(after, repeat))
+        print(
+            f"{'  peak memory':<24} {peak_memory(before) / 1e6:>9.1f} MB"
+            f"  {peak_memory(after) / 1e6:>9.1f} MB"
+        )
+
+
+#
+# Datentypen der verarbeiteten Tabellen
+# =============================================================================
+def widened(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return <df> with the dtypes the processed files had before: object
+    labels instead of categoricals, Int64 instead of narrow integers.
+    """
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[column] = object
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = pd.Int64Dtype()
+
+    return df.astype(dtypes)
+
+
+def bench_dtypes(repeat: int = 5) -> None:
+    """
+    Memory use and typical groupby/filter/merge work of the viz modules on the
+    processed tables, with the old wide dtypes vs. categoricals and narrow
+    integers as written by the import now.
+    """
+    tables = {
+        name: pd.read_parquet(destatis_sources[name]["processed_file"])
+        for name in ["eg_empf", "eg_dauer", "geburten", "ewz"]
+    }
+    variants = {"wide": {name: widened(df) for name, df in tables.items()}, "compact": tables}
+
+    def memory(frames):
+        return sum(df.memory_usage(deep=True).sum() for df in frames.values())
+
+    def groupby(frames):
+        return frames["eg_empf"].groupby(["jahr", "land", "fm", "art"], observed=True).pers.sum()
+
+    def filter_(frames):
+        eg = frames["eg_dauer"]
+        return eg.loc[eg.egplus.eq("Mit Elterngeld Plus") & eg.fm.eq("Insgesamt") & eg.jahr.eq(2023)]
+
+    def pivot(frames):
+        return frames["eg_dauer"].pivot_table(
+            index="ags", columns=["jahr", "egplus", "fm"], values="monate", observed=True
+        )
+
+    def merge(frames):
+        return pd.merge(frames["geburten"], frames["ewz"], on=["jahr", "land"])
+
+    print(f"{'':<24} {'wide':>12} {'compact':>12}")
+    print(
+        f"{'memory':<24} {memory(variants['wide']) / 1e6:>9.2f} MB"
+        f"  {memory(variants['compact']) / 1e6:>9.2f} MB"
+    )
+    for name, func in [("groupby eg_empf", groupby), ("filter eg_dauer", filter_),
+                       ("pivot eg_dauer", pivot), ("merge geburten/ewz", merge)]:
+        report(
+            name,
+            best_of(lambda: func(variants["wide"]), repeat),
+            best_of(lambda: func(variants["compact"]), repeat),
+        )
+
+
+#
+# Zahlenformat
+# =============================================================================
+def bench_num(repeat: int = 5) -> None:
+    """
+    Formatting numbers for hover labels: num() applied to each element vs.
+    nums() on the whole column, for the tax power of all Kreise and years and
+    for synthetic numbers over all magnitudes. Both must give the same strings.
+    """
+    rng = random.Random(0)
+    cases = {
+        "steuer_pc": (kreise_steuern_egdauer().steuer_pc, {}),
+        "auto, 1 digit": (
+            pd.Series([rng.uniform(-1, 1) * 10 ** rng.uniform(0, 11) for _ in range(20_000)]),
+            {"magnitude": "auto", "digits": 1},
+        ),
+        "en, k, 2 digits": (
+            pd.Series([rng.uniform(0, 1e7) for _ in range(20_000)]),
+            {"magnitude": "k", "digits": 2, "lang": "en"},
+        ),
+    }
+
+    print(f"{'':<24} {'num':>12} {'nums':>12}")
+    for name, (values, options) in cases.items():
+        def before():
+            return values.apply(num, **options)
+
+        def after():
+            return nums(values, **options)
+
+        if not before().equals(after()):
+            raise AssertionError(f"nums() differs from num() for {name}")
+        report(f"{name} ({len(values)})", best_of(before, repeat), best_of(after, repeat))
+
+
+#
+# Figuren mit einem Trace je Gruppe
+# =============================================================================
+def figure_parts(fig: go.Figure) -> tuple:
+    """
+    Take a figure made with bulk_figure() apart into the shared trace, the
+    per-group trace dicts and the layout (without template), and also return
+    each trace with the shared properties merged in, as the per-group loop
+    built them.
+    """
+    defaults = go.Figure().layout.template.data.scatter[0].to_plotly_json()
+    shared = go.Scatter({
+        k: v for k, v in fig.layout.template.data.scatter[0].to_plotly_json().items()
+        if k not in defaults
+    })
+    traces = [{k: v for k, v in trace.to_plotly_json().items() if k != "type"} for trace in fig.data]
+    merged = [go.Scatter(shared).update(trace).to_plotly_json() for trace in traces]
+    layout = fig.layout.to_plotly_json()
+    layout.pop("template", None)
+
+    return shared, traces, merged, layout
+
+
+def per_trace_figure(merged: list, layout: dict) -> go.Figure:
+    fig = go.Figure()
+    for trace in merged:
+        fig.add_trace(go.Scatter(trace))
+    fig.update_layout(layout)
+
+    return fig
+
+
+def bulk_built_figure(shared: go.Scatter, traces: list, layout: dict) -> go.Figure:
+    fig = bulk_figure(shared, traces)
+    fig.update_layout(layout)
+
+    return fig
+
+
+def bench_figures(repeat: int = 5) -> None:
+    """
+    Building the line and scatter charts: one validated go.Scatter per group
+    with all its styling (add_trace loop) vs. shared styling in the template
+    and plain dicts per group (bulk_figure()). Both get the same traces and
+    layout; the size is that of the figure's JSON. The synthetic cases show
+    how both scale with the number of groups.
+    """
+    figures = [(f.__name__, f()) for f in (cht_births, cht_eg, cht_eg_births, cht_krs_steuern_bezdauer)]
+
+    rng = np.random.default_rng(0)
+    shared = go.Scatter(
+        mode="markers+lines",
+        line=dict(width=1),
+        marker=dict(size=6, line=dict(width=1, color="black")),
+        hovertemplate="%{meta}: %{y:.1f}<extra></extra>",
+    )
+    for n_groups in [100, 400]:
+        df = pd.DataFrame({
+            "grp": np.repeat(np.arange(n_groups), 9),
+            "jahr": np.tile(np.arange(2015, 2024), n_groups),
+            "wert": rng.uniform(0, 20, n_groups * 9),
+        })
+        traces = grouped_traces(
+            df, "grp", columns={"x": "jahr", "y": "wert"},
+            per_group=lambda grp, lgrp: {"name": f"Kreis {grp}", "meta": f"Kreis {grp}", "legendgroup": str(grp)},
+        )
+        figures.append(("synthetic", bulk_figure(shared, traces)))
+
+    print(f"{'':<24} {'per trace':>12} {'bulk':>12}")
+    for name, fig in figures:
+        shared, traces, merged, layout = figure_parts(fig)
+        before = per_trace_figure(merged, layout)
+        after = bulk_built_figure(shared, traces, layout)
+
+        report(
+            f"{name} ({len(traces)})",
+            best_of(lambda: per_trace_figure(merged, layout), repeat),
+            best_of(lambda: bulk_built_figure(shared, traces, layout), repeat),
+        )
+        print(
+            f"{'  JSON':<24} {len(before.to_json()) / 1e3:>9.1f} kB"
+            f"  {len(after.to_json()) / 1e3:>9.1f} kB"
+        )
+
+
+#
+# Jahresregler der Steuerkraft-Grafik
+# =============================================================================
+def legacy_steuern_bezdauer_figure() -> go.Figure:
+    """
+    All years in one figure, switched by a Plotly slider that toggles the
+    visibility of every trace, as cht_krs_steuern_bezdauer() was built before.
+    """
+    years = steuern_bezdauer_years()
+    fig = cht_krs_steuern_bezdauer(years[0])
+    per_year = len(fig.data)
+
+    for jahr in years[1:]:
+        for trace, values in zip(fig.data[:per_year], steuern_bezdauer_values(jahr)):
+            fig.add_trace(go.Scatter(trace).update(values, visible=False))
+
+    steps = [
+        dict(
+            method="update",
+            args=[
+                {"visible": [i // per_year == k for i in range(len(fig.data))]},
+                {"title": steuern_bezdauer_title(jahr)},
+            ],
+        )
+        for k, jahr in enumerate(years)
+    ]
+    fig.update_layout(sliders=[dict(active=0, steps=steps)])
+
+    return fig
+
+
+def bench_slider(repeat: int = 5) -> None:
+    """
+    What the browser gets for the tax chart: every year up front (Plotly
+    slider) vs. the first year, then one patch per year chosen with the Dash
+    slider. Timings are for the figure and for one year's values, without and
+    with the server-side cache.
+    """
+    years = steuern_bezdauer_years()
+    before = legacy_steuern_bezdauer_figure()
+    after = cht_krs_steuern_bezdauer()
+
+    print(f"{'':<24} {'all years':>12} {'one year':>12}")
+    print(
+        f"{'initial JSON':<24} {len(before.to_json()) / 1e3:>9.1f} kB"
+        f"  {len(after.to_json()) / 1e3:>9.1f} kB"
+    )
+    patch_sizes = [len(json.dumps(steuern_bezdauer_values(jahr))) for jahr in years[1:]]
+    print(f"{'patch per year':<24} {'-':>12} {sum(patch_sizes) / len(patch_sizes) / 1e3:>9.1f} kB")
+
+    def cold(func):
+        def run():
+            datasets.invalidate()
+            datasets.kreise_steuern_egdauer()
+            return func()
+        return run
+
+    report("figure (cold)", best_of(cold(legacy_steuern_bezdauer_figure), repeat), best_of(cold(cht_krs_steuern_bezdauer), repeat))
+    values_cold = best_of(cold(lambda: steuern_bezdauer_values(years[-1])), repeat)
+    values_warm = best_of(lambda: steuern_bezdauer_values(years[-1]), repeat)
+    print(f"{'year values':<24} {'cold':>12} {'cached':>12}")
+    report("  per callback", values_cold, values_warm)
+
+
+#
+# Abfrage-Cache der Callbacks
+# =============================================================================
+def bench_queries(repeat: int = 5, n_requests: int = 2000) -> None:
+    """
+    Latency of one map selection (choropleth.bezdauer_values) when computed
+    in a fresh worker (parquet not read yet), computed from tables already in
+    memory, read from the disk cache another worker wrote, and taken from the
+    worker's LRU cache. Then a stream of requests over all selections, with
+    some selections far more popular than others, through a cache smaller
+    than the number of selections; its hit ratio and latencies come from
+    query_stats. Uses a temporary cache directory.
+    """
+    selections = [
+        (jahr, egplus, fm)
+        for jahr in choropleth.bezdauer_years()
+        for egplus in ["Mit Elterngeld Plus", "Ohne Elterngeld Plus", "Insgesamt"]
+        for fm in ["Insgesamt", "weiblich", "männlich"]
+    ]
+    compute = choropleth.bezdauer_values.__wrapped__
+    selection = selections[-1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = querycache.cache_dir, querycache.query_cache_size, querycache.query_stats
+        querycache.cache_dir = Path(tmp)
+
+        def fresh_worker():
+            datasets.invalidate()
+            return compute(*selection)
+
+        def disk_hit():
+            querycache._memory.clear()
+            return choropleth.bezdauer_values(*selection)
+
+        print(f"{'one selection':<24} {'time':>12}")
+        cases = [
+            ("compute, fresh worker", fresh_worker),
+            ("compute, tables loaded", lambda: compute(*selection)),
+            ("disk cache", disk_hit),
+            ("LRU cache", lambda: choropleth.bezdauer_values(*selection)),
+        ]
+        for name, func in cases:
+            print(f"{name:<24} {best_of(func, repeat) * 1000:>9.2f} ms")
+
+        # Anfragen mit Zipf-verteilter Beliebtheit, Cache für ein Drittel:
+        querycache.invalidate()
+        querycache.query_cache_size = len(selections) // 3
+        querycache.query_stats = querycache.QueryStats()
+        rng = random.Random(0)
+        weights = [1 / rank for rank in range(1, len(selections) + 1)]
+        callback = querycache.timed_callback("update_bezdauer")(choropleth.bezdauer_values)
+        for jahr, egplus, fm in rng.choices(selections, weights, k=n_requests):
+            callback(jahr, egplus, fm)
+
+        stats = querycache.query_stats.as_dict()
+        print(
+            f"\n{n_requests} requests, {len(selections)} selections, LRU size {querycache.query_cache_size}:"
+            f" {stats['hits']} LRU hits, {stats['disk_hits']} disk hits, {stats['misses']} misses,"
+            f" hit ratio {stats['hit_ratio']:.3f}"
+        )
+        latency = stats["callbacks"]["update_bezdauer"]
+        print(
+            f"callback latency (last {querycache.query_stats.window} calls): mean {latency['mean_ms']} ms,"
+            f" p95 {latency['p95_ms']} ms, max {latency['max_ms']} ms"
+        )
+
+        querycache.invalidate()
+        querycache.cache_dir, querycache.query_cache_size, querycache.query_stats = saved
+
+
+benchmarks = {
+    "genesis": bench_genesis,
+    "reshape": bench_reshape,
+    "transcode": bench_transcode,
+    "maps": bench_maps,
+    "dtypes": bench_dtypes,
+    "num": bench_num,
+    "figures": bench_figures,
+    "slider": bench_slider,
+    "queries": bench_queries,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m elternsein.bench")
+    parser.add_argument("names", nargs="*", help=", ".join(benchmarks))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    unknown = set(args.names) - set(benchmarks)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    for name in args.names or benchmarks:
+        print(f"\n# {name}")
+        benchmarks[name](repeat=args.repeat)
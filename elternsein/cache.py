@@ -0,0 +1,53 @@
+"""
+Manage the figure and query caches from the command line:
+
+    python -m elternsein.cache prewarm [--lang de en] [--force]
+    python -m elternsein.cache invalidate [--lang en]
+    python -m elternsein.cache info
+
+Query results (see => elternsein.querycache) are not per language on disk,
+so invalidate always drops all of them.
+"""
+import argparse
+
+from . import querycache
+from .config import language_codes
+from .figcache import cache_dir, invalidate, prewarm
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m elternsein.cache",
+        description="Prewarm or invalidate the figure and query caches.",
+    )
+    parser.add_argument("command", choices=["prewarm", "invalidate", "info"])
+    parser.add_argument("--lang", nargs="+", choices=list(language_codes))
+    parser.add_argument(
+        "--force", action="store_true", help="drop cached figures before prewarming"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "invalidate":
+        print(f"Removed {invalidate(args.lang)} cached figures.")
+        print(f"Removed {querycache.invalidate()} cached query results.")
+
+    elif args.command == "prewarm":
+        for language, timing in prewarm(args.lang, force=args.force).items():
+            print(
+                f"{language}: cold {timing['cold']:.2f} s, "
+                f"warm {timing['warm']:.3f} s"
+            )
+
+    else:
+        for language in args.lang or language_codes:
+            files = sorted((cache_dir / language).glob("*"))
+            size = sum(f.stat().st_size for f in files)
+            print(f"{language}: {len(files)} files, {size / 1e6:.1f} MB")
+
+        files = sorted(querycache.cache_dir.glob("*.json"))
+        size = sum(f.stat().st_size for f in files)
+        print(f"queries: {len(files)} files, {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,26 @@ language_codes = {
     "de": "DE",
     "en": "EN-GB",
 }
+# each dashboard is in the language its route names ("/en/elternsein/"); this one
+# is for routes that name none:
 current_language = "de"
+
+# layout:
+# figures are only computed when their section scrolls into view
+lazy_layout = True
+
+# "choropleth": interactive Plotly maps; "matplotlib": static images
+map_engine = "choropleth"
+
+# callbacks:
+# how many query results (one selection of one dataset each) every worker keeps
+# in memory; all of them are also kept on disk, shared by all workers
+query_cache_size = 256
+# how many query results are kept on disk; beyond that, the least recently used
+# ones are removed (results made from older data are never asked for again)
+query_cache_files = 4096
+
+# matplotlib maps are served as image files in these widths (pixels) and formats; the
+# last format is the fallback for browsers that know none of the others:
+map_image_widths = [1000, 2000]
+map_image_formats = ["webp", "png"]
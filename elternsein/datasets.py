@@ -0,0 +1,168 @@
+"""
+Shared access to the processed data.
+
+Every processed file is read once per process, and the preparation several
+figures share (complete years only, sums per Land, births per 1000
+inhabitants, ...) is done once as well. Functions decorated with
+@memoized(<files>) cache their result together with the modification stamps
+of the files it was made from; when any of them changes, the result is made
+again on the next call. invalidate() drops everything explicitly.
+
+Cached frames stay in the cache: callers get a deep copy, which they may
+change in any way, including writing into existing values, without changing
+what the next caller gets.
+"""
+import sys
+import logging
+import threading
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+
+import pandas as pd
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(base_dir))
+
+from data.sources import destatis_sources, processed_dir
+
+
+logger = logging.getLogger(__name__)
+
+kreise_steuern_egdauer_file = processed_dir / "kreise_steuern_egdauer.parquet"
+
+# (Funktion, Argumente) -> (Stempel der Eingabedateien, Ergebnis):
+_cache = {}
+# abgeleitete Daten rufen andere memoisierte Funktionen auf, daher reentrant:
+_lock = threading.RLock()
+
+# wie oft jede Funktion wirklich gerechnet hat (statt aus dem Cache zu liefern):
+builds = Counter()
+
+
+def file_stamp(path: Path) -> tuple:
+    """
+    Return (mtime_ns, size) of <path>, or None if it doesn't exist.
+    """
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def handout(value):
+    """
+    Return what a caller may change without changing the cache.
+    """
+    # eine flache Kopie teilte die Puffer mit dem Cache:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+
+    return value
+
+
+def memoized(*paths):
+    """
+    Decorator: cache the function's result per arguments until one of the
+    files <paths> changes.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = (func.__module__, func.__qualname__, args)
+            stamps = tuple(file_stamp(path) for path in paths)
+
+            with _lock:
+                entry = _cache.get(key)
+                if entry is None or entry[0] != stamps:
+                    if entry is not None:
+                        logger.info(f"Input of {func.__qualname__} changed, rebuilding.")
+                    builds[f"{func.__module__}.{func.__qualname__}"] += 1
+                    entry = (stamps, func(*args))
+                    _cache[key] = entry
+
+            return handout(entry[1])
+
+        return wrapper
+
+    return decorate
+
+
+def invalidate() -> None:
+    """
+    Drop all cached data.
+    """
+    with _lock:
+        _cache.clear()
+
+
+#
+# Dateien, wie importiert
+# =============================================================================
+@memoized(destatis_sources["geburten"]["processed_file"])
+def geburten() -> pd.DataFrame:
+    return pd.read_parquet(destatis_sources["geburten"]["processed_file"])
+
+
+@memoized(destatis_sources["ewz"]["processed_file"])
+def ewz() -> pd.DataFrame:
+    return pd.read_parquet(destatis_sources["ewz"]["processed_file"])
+
+
+@memoized(destatis_sources["eg_empf"]["processed_file"])
+def eg_empf() -> pd.DataFrame:
+    return pd.read_parquet(destatis_sources["eg_empf"]["processed_file"]).reset_index(drop=True)
+
+
+@memoized(destatis_sources["eg_dauer"]["processed_file"])
+def eg_dauer() -> pd.DataFrame:
+    return pd.read_parquet(destatis_sources["eg_dauer"]["processed_file"])
+
+
+@memoized(destatis_sources["steuern"]["processed_file"])
+def steuern() -> pd.DataFrame:
+    return pd.read_parquet(destatis_sources["steuern"]["processed_file"])
+
+
+@memoized(kreise_steuern_egdauer_file)
+def kreise_steuern_egdauer() -> pd.DataFrame:
+    return pd.read_parquet(kreise_steuern_egdauer_file)
+
+
+#
+# Aufbereitet
+# =============================================================================
+@memoized(destatis_sources["eg_empf"]["processed_file"])
+def eg_empf_jahre() -> pd.DataFrame:
+    """
+    Elterngeld recipients per year, Land and sex (mothers and fathers only),
+    summed over the quarters. A last year with fewer entries than the one
+    before is incomplete and left out.
+    """
+    eg = eg_empf()
+
+    entries = eg.jahr.value_counts().sort_index()
+    if entries.iloc[-1] < entries.iloc[-2]:
+        eg = eg.loc[eg.jahr.ne(entries.index[-1])]
+
+    eg = eg.loc[eg.art.eq("Insgesamt") & eg.fm.ne("Insgesamt")]
+
+    return (
+        eg.groupby(["jahr", "land", "fm", "art"], observed=True)
+        .sum().drop("quartal", axis=1).reset_index()
+    )
+
+
+@memoized(destatis_sources["geburten"]["processed_file"], destatis_sources["ewz"]["processed_file"])
+def geburten_land() -> pd.DataFrame:
+    """
+    Births per year and Land, with population and births per 1000 inhabitants.
+    """
+    gb = geburten().groupby(["jahr", "land"], observed=True).geburten.sum().to_frame().reset_index()
+
+    gb = pd.merge(gb, ewz(), on=["jahr", "land"])
+    gb["geburten_pro_1000"] = gb.geburten / gb.ewz * 1000
+
+    return gb
@@ -1,65 +1,433 @@
-import requests
+"""
+Download der Rohdaten von Destatis, Regionalstatistik und BKG:
+
+    python -m elternsein.download [--jobs N] [--force | --refresh]
+
+All sources are fetched concurrently through one pooled session. Responses
+are streamed into a ".part" file next to the target and renamed into place
+only when complete, so an interrupted run never leaves a truncated raw file
+behind. Failed requests are retried with exponential backoff; for the large
+BKG archive, a retry (or the next run) continues where the ".part" file ends,
+using an HTTP Range request. Destatis tables are converted to UTF-8 on the
+way to disk, see Utf8Transcoder.
+
+Next to every raw file, a sidecar manifest ("<raw file>.json") records the
+ETag and Last-Modified headers and the SHA-256 of the response body. With
+--refresh, existing files are checked with conditional requests: a
+"304 Not Modified", or a body with the same hash, leaves the raw file (and
+thus the import, see => elternsein.pipeline) untouched.
+
+Everything below download_all() takes plain URLs and paths, so it can be
+pointed at a local HTTP server for testing.
+"""
+import os
+import json
+import codecs
+import time
+import hashlib
 import logging
-import chardet
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from email.message import Message
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from data.sources import destatis_sources, bkg_source
+from elternsein.i18n import write_atomically
 
 
 # set up logger, to be logged with the root logger in __init__.py:
 logger = logging.getLogger(__name__)
-logger.info("Starting new download run.")
 
-#
-# Destatis und Regionalstatistik:
-#
-for source in destatis_sources.values():
-    logger.debug(f"Checking if {source['raw_file']} already exists.")
-    if source["raw_file"].exists():
-        logger.info("Raw data file already exists. Skipping.")
-        next
+# Sekunden für Verbindungsaufbau und für das Warten auf Daten:
+timeout = (10, 120)
+chunk_size = 1 << 16
 
-    else:
-        logger.debug(f"Downloading {source['name']}")
-        logger.debug(f"Request: {requests.Request('GET', source['url'], params=source['params']).prepare().body}")
+# Antworten, bei denen sich ein neuer Versuch lohnt:
+retry_status = {429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """
+    Raised when a source could not be fetched, even after all retries.
+    """
+
+
+def make_session(pool_size: int = 4) -> requests.Session:
+    """
+    Return a session whose connection pool is large enough for <pool_size>
+    concurrent downloads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def part_file(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+class Utf8Transcoder:
+    """
+    Convert a byte stream to UTF-8, chunk by chunk. The encoding is the one
+    the server declared, or else guessed from the first <sniff_size> bytes
+    only, so memory use stays flat however large the table is.
+    """
+
+    # Destatis und Regionalstatistik liefern UTF-8 oder Windows-1252. Was
+    # nicht als UTF-8 lesbar ist, ist also Windows-1252 (chardet rät bei
+    # deutschen Tabellen gern andere Codepages):
+    fallback = "cp1252"
+
+    def __init__(self, declared: str = None, sniff_size: int = 1 << 16):
+        self.encoding = declared
+        self.sniff_size = sniff_size
+        self.buffer = b""
+        self.decoder = None
+
+    def start(self) -> None:
+        if self.encoding is None:
+            self.encoding = "utf-8" if is_utf8(self.buffer[:self.sniff_size]) else self.fallback
+        self.encoding = codecs.lookup(self.encoding).name
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+
+    def decode(self, data: bytes, final: bool = False) -> bytes:
+        try:
+            text = self.decoder.decode(data, final)
+        except UnicodeDecodeError:
+            if self.encoding == self.fallback:
+                raise
+            logger.warning(f"Not {self.encoding} after all, falling back to {self.fallback}.")
+            pending = self.decoder.getstate()[0]
+            self.encoding = self.fallback
+            self.decoder = codecs.getincrementaldecoder(self.fallback)()
+            text = self.decoder.decode(pending + data, final)
+
+        return text.encode("utf-8")
+
+    def feed(self, chunk: bytes) -> bytes:
+        """
+        Take the next chunk of the stream; return whatever UTF-8 is ready.
+        """
+        if self.decoder is not None:
+            return self.decode(chunk)
+
+        self.buffer += chunk
+        if len(self.buffer) < self.sniff_size:
+            return b""
+
+        self.start()
+        data, self.buffer = self.buffer, b""
+        return self.decode(data)
+
+    def finish(self) -> bytes:
+        """
+        Flush the rest once the stream has ended.
+        """
+        if self.decoder is None:
+            self.start()
+        data, self.buffer = self.buffer, b""
+        return self.decode(data, final=True)
+
+
+def is_utf8(prefix: bytes) -> bool:
+    """
+    Check whether <prefix> is valid UTF-8, allowing it to end in the middle
+    of a multi-byte sequence.
+    """
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+    except UnicodeDecodeError:
+        return False
+
+    return True
+
+
+def declared_charset(content_type: str) -> str:
+    """
+    Return the charset parameter of a Content-Type header, if any.
+    """
+    message = Message()
+    message["Content-Type"] = content_type or ""
+    return message.get_param("charset")
+
+
+def fetch(
+    session: requests.Session,
+    url: str,
+    path: Path,
+    params: dict = None,
+    headers: dict = None,
+    resume: bool = False,
+    transcode: bool = False,
+    previous_sha256: str = None,
+    retries: int = 4,
+    backoff: float = 1.0,
+) -> dict:
+    """
+    Stream <url> to <path>, retrying with exponential backoff.
 
-        response = requests.get(source["url"], params = source["params"])
+    :param session: the session to send requests through
+    :param url: the URL to fetch
+    :param path: where the file should end up
+    :param params: query parameters
+    :param headers: extra request headers, e.g. for a conditional request
+    :param resume: continue an existing ".part" file with a Range request
+    :param transcode: convert the body to UTF-8 while writing it
+    :param previous_sha256: hash of the last response body; an identical
+        download is discarded instead of replacing the file
+    :param retries: how many times to retry after the first attempt
+    :param backoff: seconds to wait before the first retry, doubled each time
+    :return: {"status": "fetched" | "not-modified" | "unchanged", "size",
+        "sha256", "etag", "last_modified", "encoding"}
+    """
+    path = Path(path)
+    part = part_file(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
 
-        if response.status_code == 200:
-            logger.debug("Request successful.")
+    for attempt in range(retries + 1):
+        try:
+            result = stream_to_part(session, url, part, params, headers or {}, resume, transcode)
 
-            content = response.text
-            # guess encoding:
-            encoding = chardet.detect(response.content)["encoding"]
-            logger.debug(f"Encoding of {source['name']} is {encoding}.")
-            content_utf8 = response.content.decode(encoding).encode("utf-8")
+            if result is not None:
+                if result["status"] == "not-modified":
+                    return result
 
-            with open(source["raw_file"], "wb") as file:
-                file.write(content_utf8)
+                if result["sha256"] == previous_sha256:
+                    part.unlink()
+                    result["status"] = "unchanged"
+                    return result
 
-            logger.debug(f"Wrote {len(content_utf8)} bytes to {source['raw_file']}.")
+                os.replace(part, path)
+                result["size"] = path.stat().st_size
+                return result
 
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+            logger.warning(f"{url}: {error.__class__.__name__} on attempt {attempt + 1}.")
+
+        except requests.HTTPError as error:
+            if error.response.status_code not in retry_status:
+                # nicht str(error): das enthält die URL samt Parametern, bei
+                # Destatis also Benutzername und Passwort
+                raise DownloadError(
+                    f"{url}: HTTP {error.response.status_code} {error.response.reason}"
+                ) from error
+            logger.warning(f"{url}: HTTP {error.response.status_code} on attempt {attempt + 1}.")
+
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    raise DownloadError(f"{url}: giving up after {retries + 1} attempts.")
+
+
+def stream_to_part(
+    session: requests.Session,
+    url: str,
+    part: Path,
+    params: dict,
+    headers: dict,
+    resume: bool,
+    transcode: bool,
+) -> dict:
+    """
+    Write the response body to <part>, appending to what is already there if
+    <resume> is set and the server honours the Range request (resume and
+    <transcode> don't mix). The body is asked for without Content-Encoding, so
+    that Content-Length and byte ranges refer to what is written. The SHA-256
+    is taken over the body as sent, not as written.
+
+    Return the result for fetch() once the body arrived completely, else None.
+    """
+    offset = part.stat().st_size if resume and part.exists() else 0
+
+    # Content-Length und Range zählen die Bytes, wie sie gesendet werden; ein
+    # komprimierter Body passt zu keinem von beiden, also unkomprimiert:
+    headers = {**headers, "Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    digest = hashlib.sha256()
+
+    with session.get(url, params=params, headers=headers, stream=True, timeout=timeout) as response:
+        result = {
+            "status": "fetched",
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+        if response.status_code == 304:
+            result["status"] = "not-modified"
+            return result
+
+        if response.status_code == 416 and offset:
+            # "Range Not Satisfiable": die Teildatei ist schon vollständig,
+            # wenn der Server genau ihre Größe meldet:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                with open(part, "rb") as file:
+                    result["sha256"] = hashlib.file_digest(file, "sha256").hexdigest()
+                return result
+            part.unlink()
+            return None
+
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            logger.info(f"Resuming {url} at byte {offset}.")
+            mode = "ab"
+            with open(part, "rb") as file:
+                digest = hashlib.file_digest(file, "sha256")
         else:
-            logger.error("Request was unsuccessful. Wrong URL?")
+            mode = "wb"
+
+        transcoder = None
+        if transcode:
+            transcoder = Utf8Transcoder(declared_charset(response.headers.get("Content-Type")))
+
+        expected = response.headers.get("Content-Length")
+        with open(part, mode) as file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                digest.update(chunk)
+                file.write(transcoder.feed(chunk) if transcoder else chunk)
+            if transcoder:
+                file.write(transcoder.finish())
+                result["encoding"] = transcoder.encoding
+
+        # Bytes auf der Leitung, vor dem Entpacken (falls ein Server trotz
+        # "identity" komprimiert):
+        received = response.raw.tell()
 
-#
-# BKG (Geodaten):
-#
-if bkg_source["raw_file"].exists():
-    logger.info(f"Raw data file {bkg_source['raw_file']} already exists. Skipping.")
+    # a connection that closes early is not an exception for requests:
+    if expected is not None and received != int(expected):
+        return None
 
-else:
+    result["sha256"] = digest.hexdigest()
+    return result
 
-    response = requests.get(bkg_source["url"])
 
-    if response.status_code == 200:
-        logger.debug("Request successful.")
+def manifest_file(path: Path) -> Path:
+    return path.with_name(path.name + ".json")
 
-        content = response.content
 
-        with open(bkg_source["raw_file"], "wb") as file:
-            file.write(content)
-        
-        logger.debug(f"Wrote {len(content)} bytes to {bkg_source['raw_file']}.")
+def read_manifest(path: Path) -> dict:
+    """
+    Return the sidecar manifest of raw file <path>, or {} if there is none.
+    """
+    try:
+        return json.loads(manifest_file(path).read_text())
+    except FileNotFoundError:
+        return {}
 
+
+def conditional_headers(manifest: dict) -> dict:
+    """
+    Build If-None-Match/If-Modified-Since headers from a manifest.
+    """
+    headers = {}
+    if manifest.get("etag"):
+        headers["If-None-Match"] = manifest["etag"]
+    if manifest.get("last_modified"):
+        headers["If-Modified-Since"] = manifest["last_modified"]
+
+    return headers
+
+
+def download_source(
+    session: requests.Session,
+    source: dict,
+    resume: bool = False,
+    transcode: bool = True,
+    refresh: bool = False,
+) -> str:
+    """
+    Download one entry of destatis_sources (or bkg_source) and update its
+    manifest. With <refresh>, ask the server only for a changed file. Return
+    the status of the download ("fetched", "not-modified" or "unchanged").
+    """
+    path = source["raw_file"]
+    manifest = read_manifest(path) if refresh and path.exists() else {}
+
+    logger.debug(f"Downloading {source.get('name', source['url'])}")
+    result = fetch(
+        session,
+        source["url"],
+        path,
+        source.get("params"),
+        headers=conditional_headers(manifest),
+        resume=resume,
+        transcode=transcode,
+        previous_sha256=manifest.get("sha256"),
+    )
+
+    if result["status"] == "fetched":
+        if transcode:
+            logger.debug(f"Encoding of {path.name} was {result['encoding']}.")
+        logger.debug(f"Wrote {result['size']} bytes to {path}.")
+        manifest = {
+            "url": source["url"],
+            "etag": result["etag"],
+            "last_modified": result["last_modified"],
+            # Hash der Antwort, nicht der umkodierten Datei:
+            "sha256": result["sha256"],
+            "encoding": result.get("encoding"),
+            "fetched": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
     else:
-        logger.error("Request was unsuccessful. Wrong URL?")
+        logger.info(f"{path.name} has not changed ({result['status']}).")
+
+    manifest["checked"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    write_atomically(manifest_file(path), json.dumps(manifest, indent=2).encode("utf-8"))
+
+    return result["status"]
+
+
+def download_all(jobs: int = 4, force: bool = False, refresh: bool = False) -> dict:
+    """
+    Download all sources that are not there yet (or all, with <force>), at
+    most <jobs> at a time. With <refresh>, existing files are checked for
+    changes with conditional requests. Return {raw file name: status or
+    error}.
+    """
+    tasks = [
+        (source, {"resume": False, "transcode": True})
+        for source in destatis_sources.values()
+    ]
+    tasks.append((bkg_source, {"resume": True, "transcode": False}))
+
+    results = {}
+    with make_session(jobs) as session, ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for source, options in tasks:
+            if source["raw_file"].exists() and not (force or refresh):
+                logger.info(f"Raw data file {source['raw_file']} already exists. Skipping.")
+                continue
+            future = executor.submit(download_source, session, source, refresh=refresh, **options)
+            futures[future] = source["raw_file"].name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except DownloadError as error:
+                logger.error(str(error))
+                results[name] = error
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m elternsein.download")
+    parser.add_argument("--jobs", type=int, default=4, help="number of parallel downloads")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--force", action="store_true", help="download existing files again")
+    mode.add_argument("--refresh", action="store_true", help="download existing files only if they changed")
+    args = parser.parse_args()
+
+    logger.info("Starting new download run.")
+    for name, result in download_all(jobs=args.jobs, force=args.force, refresh=args.refresh).items():
+        print(f"{name}: {result}")
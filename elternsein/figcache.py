@@ -0,0 +1,378 @@
+"""
+On-disk cache of finished figures.
+
+Every figure is stored as serialized Plotly JSON or as image files (the maps,
+in each of the configured widths and formats), under a key made from the
+content hashes of the processed parquet files it reads, the language, and the
+source of the module that builds it and of every project module that one
+imports. A warm restart thus skips all pandas/geopandas/matplotlib work, and
+any change to data, code or dictionary simply leads to a new key.
+
+The cache is managed from the command line, see => elternsein.cache.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+
+from matplotlib import pyplot as plt
+import plotly.io as pio
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(base_dir))
+
+from data.sources import destatis_sources, processed_dir
+from . import viz
+from .config import language_codes, map_engine, map_image_widths, map_image_formats
+from .i18n import dictionary_cache, active_batch, translation_batch
+from .language_context import language_context
+from .utils import file_digest, module_files
+from .viz.geometry import krs_geometry_files
+
+
+logger = logging.getLogger(__name__)
+
+cache_dir = base_dir / "data" / "cache" / "figures"
+
+
+# pyplot keeps global state and must not be used from two threads at once:
+_pyplot_lock = threading.Lock()
+
+
+def image_variants() -> list:
+    """
+    Return the (width, format) combinations each map is rendered in.
+    """
+    return [(width, fmt) for fmt in map_image_formats for width in map_image_widths]
+
+
+def render_map(builder) -> dict:
+    """
+    Run a matplotlib map builder once and save the figure in every configured
+    width and format. Return {(width, format): bytes}.
+    """
+    images = {}
+
+    with _pyplot_lock:
+        fig, _ = builder()
+        width_inches = fig.get_size_inches()[0]
+        for width, fmt in image_variants():
+            buf = BytesIO()
+            fig.savefig(buf, format=fmt, transparent=True, dpi=width / width_inches)
+            images[(width, fmt)] = buf.getvalue()
+        plt.close(fig)
+
+    return images
+
+
+# Welche Abbildungen es gibt, wie sie gebaut werden und welche Daten sie lesen:
+figure_specs = {
+    "fig_gb": {
+        "builder": viz.cht_births,
+        "kind": "plotly",
+        "inputs": [
+            destatis_sources["geburten"]["processed_file"],
+            destatis_sources["ewz"]["processed_file"],
+        ],
+    },
+    "fig_eg": {
+        "builder": viz.cht_eg,
+        "kind": "plotly",
+        "inputs": [destatis_sources["eg_empf"]["processed_file"]],
+    },
+    "fig_egb": {
+        "builder": viz.cht_eg_births,
+        "kind": "plotly",
+        "inputs": [
+            destatis_sources["eg_empf"]["processed_file"],
+            destatis_sources["geburten"]["processed_file"],
+            destatis_sources["ewz"]["processed_file"],
+        ],
+    },
+    "map_bezdauer": {
+        "builder": viz.map_bezdauer,
+        "kind": "image",
+        "inputs": [
+            destatis_sources["eg_dauer"]["processed_file"],
+            *krs_geometry_files,
+        ],
+    },
+    "map_steuern": {
+        "builder": viz.map_steuern,
+        "kind": "image",
+        "inputs": [
+            destatis_sources["steuern"]["processed_file"],
+            *krs_geometry_files,
+        ],
+    },
+    "chp_bezdauer": {
+        "builder": viz.chp_bezdauer,
+        "kind": "plotly",
+        "inputs": [
+            destatis_sources["eg_dauer"]["processed_file"],
+            *krs_geometry_files,
+        ],
+    },
+    "chp_steuern": {
+        "builder": viz.chp_steuern,
+        "kind": "plotly",
+        "inputs": [
+            destatis_sources["steuern"]["processed_file"],
+            *krs_geometry_files,
+        ],
+    },
+    "fig_taxes_egdauer": {
+        "builder": viz.cht_krs_steuern_bezdauer,
+        "kind": "plotly",
+        "inputs": [processed_dir / "kreise_steuern_egdauer.parquet"],
+    },
+}
+
+
+# the maps in the layout depend on the map engine:
+map_figures = {
+    "choropleth": ["chp_bezdauer", "chp_steuern"],
+    "matplotlib": ["map_bezdauer", "map_steuern"],
+}
+
+
+def layout_figures() -> list:
+    """
+    Return the names of all figures that appear in the layout.
+    """
+    other_maps = [
+        name
+        for engine, names in map_figures.items()
+        if engine != map_engine
+        for name in names
+    ]
+    return [name for name in figure_specs if name not in other_maps]
+
+
+class CacheStats:
+    """
+    Count how many figures came from the cache and how many had to be built.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+cache_stats = CacheStats()
+
+# Figures already handed out in this process, keyed by (name, language):
+_memory = {}
+_memory_lock = threading.Lock()
+_build_locks = {}
+
+
+def cache_key(name: str, language: str) -> str:
+    """
+    Build the cache key of one figure in one language.
+    """
+    spec = figure_specs[name]
+
+    parts = [
+        name,
+        language,
+        # das Modul des Builders und alles, was es aus dem Projekt verwendet:
+        *[file_digest(path) for path in module_files(spec["builder"].__module__)],
+        *[file_digest(Path(path)) for path in spec["inputs"]],
+    ]
+    if language != "de":
+        parts.append(dictionary_cache.digest())
+
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:24]
+
+
+def cache_paths(name: str, language: str) -> dict:
+    """
+    Return the cache file(s) of one figure: {None: path} for Plotly figures,
+    {(width, format): path} for maps.
+    """
+    stem = f"{name}-{cache_key(name, language)}"
+    folder = cache_dir / language
+
+    if figure_specs[name]["kind"] == "plotly":
+        return {None: folder / f"{stem}.json"}
+
+    return {
+        (width, fmt): folder / f"{stem}-{width}.{fmt}"
+        for width, fmt in image_variants()
+    }
+
+
+def build_figure(name: str):
+    """
+    Build one figure without the cache. Return a Plotly figure, or for maps
+    {(width, format): bytes}.
+    """
+    spec = figure_specs[name]
+
+    if spec["kind"] == "image":
+        return render_map(spec["builder"])
+
+    return spec["builder"]()
+
+
+def get_figure(name: str):
+    """
+    Return one figure in the current language: from memory if it was asked for
+    before in this process, else from the disk cache, else freshly built.
+    Plotly figures come back as dicts (ready for dcc.Graph), maps as
+    {(width, format): bytes}.
+    """
+    language = language_context.get_language()
+
+    with _memory_lock:
+        lock = _build_locks.setdefault((name, language), threading.Lock())
+
+    # one lock per figure, so concurrent callbacks don't build it twice:
+    with lock:
+        if (name, language) in _memory:
+            cache_stats.hits += 1
+            return _memory[(name, language)]
+
+        fig, complete = load_figure(name, language)
+        if complete:
+            if figure_specs[name]["kind"] == "plotly":
+                share_trace_data(name, fig)
+            with _memory_lock:
+                _memory[(name, language)] = fig
+
+    return fig
+
+
+def share_trace_data(name: str, fig: dict) -> None:
+    """
+    Let <fig> use the trace properties it has in common with the same figure
+    in another language already in memory (data, geometries, ...) instead of
+    its own copies, so that every further language only adds what is
+    translated.
+    """
+    # andere Figuren werden derweil womöglich abgelegt:
+    with _memory_lock:
+        others = [other for (other_name, _), other in _memory.items() if other_name == name]
+    if not others:
+        return
+
+    for trace, other_trace in zip(fig["data"], others[0]["data"]):
+        for prop, value in trace.items():
+            if prop in other_trace and other_trace[prop] == value:
+                trace[prop] = other_trace[prop]
+
+
+def load_figure(name: str, language: str) -> tuple:
+    """
+    Read one figure from the disk cache, or build and store it. Return the
+    figure and whether it is complete, i.e. free of untranslated placeholders.
+    """
+    paths = cache_paths(name, language)
+    kind = figure_specs[name]["kind"]
+
+    if all(path.exists() for path in paths.values()):
+        cache_stats.hits += 1
+        if kind == "plotly":
+            return json.loads(paths[None].read_text()), True
+        return {variant: path.read_bytes() for variant, path in paths.items()}, True
+
+    cache_stats.misses += 1
+
+    batch = active_batch()
+    n_pending = len(batch.pending) if batch is not None else 0
+
+    fig = build_figure(name)
+    if kind == "plotly":
+        fig = json.loads(pio.to_json(fig))
+        raws = {None: json.dumps(fig).encode("utf-8")}
+    else:
+        raws = fig
+
+    # figures with untranslated placeholders are not worth keeping:
+    complete = batch is None or len(batch.pending) == n_pending
+    if complete:
+        for variant, path in paths.items():
+            store(path, raws[variant])
+
+    return fig, complete
+
+
+def store(path: Path, raw: bytes) -> None:
+    """
+    Write a cache entry atomically and drop entries of the same figure that
+    were made under a different key.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    name, key = path.name.split("-")[:2]
+    for stale in path.parent.glob(f"{name}-*"):
+        if not stale.name.startswith(f"{name}-{key}"):
+            stale.unlink()
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as file:
+        file.write(raw)
+    os.replace(tmp_path, path)
+
+
+def invalidate(languages: list = None) -> int:
+    """
+    Remove cached figures for the given languages (default: all). Return the
+    number of files removed.
+    """
+    n = 0
+    for language in languages or language_codes:
+        with _memory_lock:
+            for key in [key for key in _memory if key[1] == language]:
+                del _memory[key]
+        for path in (cache_dir / language).glob("*"):
+            path.unlink()
+            n += 1
+
+    logger.info(f"Removed {n} cached figures.")
+    return n
+
+
+def prewarm(languages: list = None, force: bool = False) -> dict:
+    """
+    Build all figures the layout shows (see layout_figures()) into the cache,
+    then load them again. Return the cold and warm timings per language in
+    seconds. With <force>, existing entries are dropped first, so the cold
+    timing really is cold.
+    """
+    if force:
+        invalidate(languages)
+
+    names = layout_figures()
+
+    timings = {}
+    for language in languages or language_codes:
+        with language_context.using(language):
+            start = time.perf_counter()
+            with translation_batch(language) as batch:
+                for name in names:
+                    load_figure(name, language)
+
+            # figures with fresh translations were not cached in the first pass:
+            if batch.translated:
+                for name in names:
+                    load_figure(name, language)
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for name in names:
+                load_figure(name, language)
+            warm = time.perf_counter() - start
+
+        timings[language] = {"cold": cold, "warm": warm}
+
+    return timings
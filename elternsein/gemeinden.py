@@ -0,0 +1,80 @@
+"""
+Gemeinden and how their values add up to Kreise and Länder.
+
+Gemeinde geometries are stored once, keyed by an integer gid (see
+bkg_gem_source and the "gemeinden" stage of => elternsein.import); all other
+Gemeinde data refers to them by that gid only. Each Gemeinde is placed in its
+Kreis spatially, by looking up a point inside it in the spatial index of the
+Kreis geometries, so that aggregation doesn't depend on keys that change with
+every territorial reform.
+"""
+import sys
+import logging
+from pathlib import Path
+
+import pandas as pd
+import geopandas as gpd
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(base_dir))
+
+from data.sources import bkg_gem_source
+from .datasets import memoized
+
+
+logger = logging.getLogger(__name__)
+
+# Ebenen, auf die Gemeindewerte zusammengefasst werden können (Spalten der
+# Attributtabelle):
+levels = ["krs", "land"]
+
+
+def assign_areas(gdf: gpd.GeoDataFrame, areas: gpd.GeoDataFrame, key: str) -> pd.Series:
+    """
+    For each geometry in <gdf>, return the <key> of the area in <areas> that
+    contains a point inside it (NaN where there is none). Candidates come from
+    the spatial index of <areas>, so this stays fast for thousands of
+    geometries.
+
+    :param gdf: geometries to assign, e.g. Gemeinden
+    :param areas: geometries to assign them to, in the same CRS, e.g. Kreise
+    :param key: column of <areas> to return
+    """
+    points = gdf.geometry.representative_point()
+    point_pos, area_pos = areas.sindex.query(points, predicate="within")
+
+    assigned = pd.Series(areas[key].to_numpy()[area_pos], index=gdf.index[point_pos])
+    # ein Punkt genau auf einer Grenze liegt in keiner oder in beiden Flächen:
+    assigned = assigned.loc[~assigned.index.duplicated()]
+
+    return assigned.reindex(gdf.index)
+
+
+@memoized(bkg_gem_source["attribute_file"])
+def gem_attributes() -> pd.DataFrame:
+    """
+    Gemeinden without geometry, indexed by gid, loaded once per process.
+    """
+    return pd.read_parquet(bkg_gem_source["attribute_file"]).set_index("gid")
+
+
+def aggregate(values: pd.Series, level: str = "krs", weights: pd.Series = None) -> pd.Series:
+    """
+    Sum Gemeinde values up to Kreise or Länder, or, given <weights>, take
+    their weighted mean (e.g. a rate weighted by population).
+
+    :param values: values indexed by gid
+    :param level: "krs" (index: AGS of the Kreis) or "land" (index: first two
+        AGS digits)
+    :param weights: weights indexed by gid
+    """
+    if level not in levels:
+        raise ValueError(f"level must be one of {levels}, not {level!r}")
+
+    keys = gem_attributes()[level].reindex(values.index)
+
+    if weights is None:
+        return values.groupby(keys).sum(min_count=1)
+
+    weights = weights.reindex(values.index).where(values.notna())
+    return (values * weights).groupby(keys).sum(min_count=1) / weights.groupby(keys).sum()
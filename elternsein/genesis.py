@@ -0,0 +1,150 @@
+"""
+Reader for GENESIS "tablefile" CSVs as delivered by Destatis and the
+Regionalstatistik.
+
+A tablefile consists of a few title lines, a header block (all lines starting
+with the separator, since the label columns have no heading), the table body,
+and a footer of notes, introduced by a line of underscores. Instead of
+handing the whole file to pandas' python engine with fixed skiprows and
+skipfooter, we find these boundaries ourselves and let the C parser read only
+header and body.
+
+The tables are wide: label columns, then one column per period. wide_to_long()
+turns them into one row per label and period in a single pass.
+"""
+import re
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Platzhalter für fehlende Werte in GENESIS-Tabellen:
+#   "-" nichts vorhanden, "/" keine Angabe (zu unsicher), "." unbekannt oder
+#   geheim, "x" Tabellenfach gesperrt, "..." Angabe fällt später an
+missing_values = ["-", "/", ".", "x", "...", ""]
+
+footer_marker = "__________"
+
+# Kopfzeilen der Zeiträume: das Jahr steht vierstellig in der ersten Zeile
+# ("2016", "31.12.2016"), das Quartal ggf. in der zweiten ("1. Quartal"):
+period_patterns = [re.compile(r"(\d{4})"), re.compile(r"^(\d)\.")]
+period_dtypes = ["int16", "int8"]
+
+
+def tablefile_parts(text: str, sep: str = ";") -> tuple:
+    """
+    Return the header lines of a tablefile and the (start, end) offsets of
+    its body within <text>. Only the few lines above the body are looked at
+    one by one; the footer is found with a single search.
+    """
+    header = []
+    pos = 0
+    while True:
+        end = text.index("\n", pos)
+        line = text[pos:end].rstrip("\r")
+        if line.startswith(sep):
+            header.append(line)
+        elif header:
+            break
+        pos = end + 1
+
+    body_end = text.find("\n" + footer_marker, pos)
+    if body_end == -1:
+        body_end = len(text.rstrip())
+
+    return header, pos, body_end
+
+
+def read_tablefile(
+    path: Path,
+    header_rows: int = 1,
+    label_cols: int = 1,
+    encoding: str = "utf-8",
+    sep: str = ";",
+    engine: str = "c",
+) -> pd.DataFrame:
+    """
+    Read the body of a GENESIS tablefile into a DataFrame.
+
+    Column names come from the first <header_rows> lines of the header block
+    (further header lines, such as units, are skipped) and are named the way
+    pd.read_csv() names them. The first <label_cols> columns are read as
+    strings; all others are parsed as numbers, with German decimal commas and
+    the GENESIS placeholders for missing values turned into NaN.
+
+    :param path: the CSV file
+    :param header_rows: number of header lines that make up the column names
+    :param label_cols: number of leading columns holding labels, not values
+    :param encoding: encoding of the file
+    :param sep: field separator
+    :param engine: pandas parser engine, "c" or "pyarrow" (single header row only)
+    :return: DataFrame with one row per body line
+    """
+    text = Path(path).read_text(encoding=encoding)
+    header, body_start, body_end = tablefile_parts(text, sep)
+
+    buffer = StringIO()
+    buffer.write("\n".join(header[:header_rows]) + "\n")
+    buffer.write(text[body_start:body_end])
+    buffer.seek(0)
+
+    return pd.read_csv(
+        buffer,
+        sep=sep,
+        header=list(range(header_rows)) if header_rows > 1 else 0,
+        dtype={i: str for i in range(label_cols)},
+        na_values=missing_values,
+        keep_default_na=False,
+        decimal=",",
+        engine=engine,
+    )
+
+
+def parse_periods(columns: pd.Index, n_levels: int) -> list:
+    """
+    Parse the headers of the value columns once into integer arrays: the
+    year from the first header level and, with <n_levels> = 2, the quarter
+    from the second.
+    """
+    arrays = []
+    for level, (pattern, dtype) in enumerate(zip(period_patterns[:n_levels], period_dtypes)):
+        labels = columns.get_level_values(level) if isinstance(columns, pd.MultiIndex) else columns
+        numbers = []
+        for label in labels:
+            match = pattern.search(str(label))
+            if match is None:
+                raise ValueError(f"Can't read a period from column header {label!r}.")
+            numbers.append(int(match.group(1)))
+        arrays.append(np.array(numbers, dtype=dtype))
+
+    return arrays
+
+
+def wide_to_long(df: pd.DataFrame, labels: list, value_name: str, periods: list = ("jahr",)) -> pd.DataFrame:
+    """
+    Reshape a table as returned by read_tablefile() into one row per label
+    row and period, in the order of the table (row by row). Period columns
+    are tiled and label columns repeated with NumPy, and the values are
+    taken over in one block, instead of going through stack() and several
+    index rebuilds.
+
+    :param df: the first len(<labels>) columns hold labels, all others values
+    :param labels: names for the label columns
+    :param value_name: name for the value column
+    :param periods: names for year and, if the header has two rows, quarter
+    :return: DataFrame with the columns <periods>, <labels>, <value_name>
+    """
+    n_labels = len(labels)
+    values = df.iloc[:, n_labels:]
+    n_rows, n_periods = values.shape
+
+    columns = {}
+    for name, array in zip(periods, parse_periods(values.columns, len(periods))):
+        columns[name] = np.tile(array, n_rows)
+    for i, name in enumerate(labels):
+        columns[name] = np.repeat(df.iloc[:, i].to_numpy(), n_periods)
+    columns[value_name] = values.to_numpy().reshape(-1)
+
+    return pd.DataFrame(columns, copy=False)
@@ -1,6 +1,11 @@
 import os
 import json
+import hashlib
 import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from pathlib import Path
 
 import pandas as pd
@@ -18,7 +23,113 @@ dashapp_rootdir = Path(__file__).resolve().parents[1]
 # make the dictionary available to the whole app, so not each and every
 # string that gets translated at app init triggers loading the json data:
 dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-multiling_dictionary = json.loads(dictionary_path.read_text())
+
+
+class DictionaryCache:
+    """
+    In-process cache of the master dictionary and its per-language views.
+
+    The JSON file is stat'ed on every access, but only re-parsed if its mtime
+    changed *and* its content hash differs from the version we already hold.
+    Hits and misses are counted, so we can check that app init does not go to
+    the disk for every translated string.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._digest = None
+        self._master = None
+        self._by_language = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _refresh(self) -> None:
+        """
+        Make sure the master dictionary reflects the file on disk. Must be
+        called with the lock held.
+        """
+        mtime = self.path.stat().st_mtime_ns
+
+        if self._master is not None and mtime == self._mtime:
+            self.hits += 1
+            return
+
+        raw = self.path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        self._mtime = mtime
+
+        if self._master is not None and digest == self._digest:
+            # file was touched, but its content is what we have already:
+            self.hits += 1
+            return
+
+        self.misses += 1
+        self.reloads += self._master is not None
+        logger.info(f"(Re-)loading dictionary from {self.path}.")
+
+        self._digest = digest
+        self._master = json.loads(raw)
+        self._by_language = {}
+
+    def master(self) -> dict:
+        """
+        Return the master dictionary {"lorem": {"EN-GB": "ipsum"}, ...}.
+        """
+        with self._lock:
+            self._refresh()
+            return self._master
+
+    def get(self, language: str) -> dict:
+        """
+        Return the simple dictionary {"lorem": "ipsum", ...} for one language.
+        """
+        tgt = code[language]
+
+        with self._lock:
+            self._refresh()
+            if tgt not in self._by_language:
+                self._by_language[tgt] = {
+                    k: v[tgt] for k, v in self._master.items() if tgt in v
+                }
+            return self._by_language[tgt]
+
+    def store(self, master: dict, raw: bytes) -> None:
+        """
+        Take over a master dictionary that we just wrote to disk ourselves, so
+        the next access doesn't count as a change.
+        """
+        with self._lock:
+            self._master = master
+            self._digest = hashlib.sha256(raw).hexdigest()
+            self._mtime = self.path.stat().st_mtime_ns
+            self._by_language = {}
+
+    def digest(self) -> str:
+        """
+        Return the content hash of the dictionary, e.g. for cache keys.
+        """
+        with self._lock:
+            self._refresh()
+            return self._digest
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters, e.g. for logging after app init.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "entries": len(self._master or {}),
+            }
+
+
+dictionary_cache = DictionaryCache(dictionary_path)
+multiling_dictionary = dictionary_cache.master()
 
 
 def get_biling_dictionary(multiling_dictionary, language):
@@ -41,51 +152,18 @@ def get_translations(labels: pd.Series) -> None:
     current_language = language_context.get_language()
 
     # load label dictionary and set to target language:
-    dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-    dictionary = json.loads(dictionary_path.read_text())
-    src = code["de"]
-    tgt = code[current_language]
+    dictionary = load_current_dict(current_language)
     logger.info(f"Dictionary has {len(dictionary)} entries.")
 
-    # identify new labels (not in dict or not in the desired language):
-    data_labels = labels.unique()
-    new_labels = [label for label in data_labels if label not in dictionary]
-
-    # do the translating and put it into the global dictionary:
-    if new_labels:
-        auth_key = os.getenv("DEEPL_AUTH_KEY", None)
-        if auth_key:
-            logger.info(f"Translating {len(new_labels)} new labels.")
-            translator = deepl.Translator(auth_key)
-            # new_entries: {"lorem": "ipsum", ...}
-            new_entries = {
-                key: {
-                    tgt: translator.translate_text(
-                        key, target_lang=tgt, source_lang=src
-                    ).text
-                }
-                for key in new_labels
-            }
-
-            # bring new entries into the dictionary:
-            logger.info(f"Adding {len(new_entries)} new entries to the dictionary.")
-            for k, v in new_entries.items():
-                if k in dictionary:
-                    # entry exisits, but add this new language:
-                    dictionary[k][tgt] = v
-                else:
-                    # add completely new entry:
-                    dictionary[k] = {tgt: v}
-
-            json.dump(
-                dictionary,
-                open(dictionary_path, "w"),
-                indent=4,
-                ensure_ascii=False,
-            )
+    # identify new labels (not in dict or not in the desired language) and
+    # translate them in one go:
+    batch = TranslationBatch(current_language)
+    for label in labels.unique():
+        if label not in dictionary:
+            batch.add(label)
 
-        else:
-            logger.warning("No DeepL key found. Translations will not be available.")
+    if batch.pending:
+        batch.flush()
     else:
         logger.info("No new labels found. No translation needed.")
 
@@ -139,34 +217,50 @@ def list2dict(lst: list, key) -> dict:
 
 def load_current_dict(current_language: str = "en") -> dict:
     """
-    Load the master dictionary, bring into simple form:
+    Return the master dictionary in simple form:
     {"lorem": {"en": "ipsum"}, ...} => {"lorem": "ipsum", ...}
+    Served from the in-process cache; the JSON file is only parsed again if
+    it changed on disk.
     """
-    dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
+    return dictionary_cache.get(current_language)
+
 
+def save_current_dict(dictionary, current_language: str = "en") -> None:
+    """
+    Restore original dictionary form and save to JSON. Entries in other
+    languages are kept.
+    """
     tgt = code[current_language]
 
-    master_dict = json.loads(dictionary_path.read_text())
-    dictionary = {k: v[tgt] for k, v in master_dict.items()}
+    master_dict = {k: dict(v) for k, v in dictionary_cache.master().items()}
+    for k, v in dictionary.items():
+        master_dict.setdefault(k, {})[tgt] = v
 
-    return dictionary
+    raw = json.dumps(master_dict, ensure_ascii=False, indent=4).encode("utf-8")
+    write_atomically(dictionary_path, raw)
+    dictionary_cache.store(master_dict, raw)
 
 
-def save_current_dict(dictionary, current_language: str = "en") -> None:
+def write_atomically(path: Path, raw: bytes) -> None:
     """
-    Restore original dictionary form and save to JSON.
+    Write bytes to a temporary file next to <path> and move it into place, so
+    readers never see a half-written dictionary.
     """
-    dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-    
-    tgt = code[current_language]
-
-    master_dict = {k: {tgt: v} for k, v in dictionary.items()}
-    json.dump(master_dict, open(dictionary_path, "w"), ensure_ascii=False, indent=4)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(raw)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 def translate_series(series: pd.Series) -> pd.Series:
     """
-    Translate a series of strings into the current language.
+    Translate a series of strings into the current language. Categorical
+    series keep their codes, only the categories are translated (and sorted
+    again, so that they order like the translated strings would).
     """
     current_language = language_context.get_language()
 
@@ -175,6 +269,20 @@ def translate_series(series: pd.Series) -> pd.Series:
     
     dictionary = load_current_dict(current_language)
 
+    batch = active_batch()
+    if batch is not None:
+        for label in series.dropna().unique():
+            if isinstance(label, str) and label not in dictionary:
+                batch.add(label)
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        translated = [dictionary.get(label, label) for label in series.cat.categories]
+        # zwei Kategorien mit derselben Übersetzung lassen sich nicht umbenennen:
+        if len(set(translated)) == len(translated):
+            series = series.cat.rename_categories(translated)
+            return series.cat.reorder_categories(sorted(translated))
+        series = series.astype(object)
+
     return series.replace(dictionary)
 
 
@@ -183,7 +291,8 @@ def translate(text: str) -> str:
     Return a previously-cached translation for the given German string. If the
     current language is "de", just return the input string unchanged. Else,
     if no translation is found, get it from DeepL and store it in both
-    the bilingual and multilingual dictionaries.
+    the bilingual and multilingual dictionaries. Inside a translation_batch(),
+    missing strings are only queued and returned untranslated for now.
 
     :param text: the string to translate
     :param src_lang: the source language. Uses our app codes, "de", "en", etc.
@@ -203,11 +312,13 @@ def translate(text: str) -> str:
     # if string is in translation memory, return translation:
     if text in dictionary:
         translated_text = dictionary.get(text)
+    elif active_batch() is not None:
+        active_batch().add(text)
+        return text
     else:
         # if string is missing, get it from DeepL and store in TM:
         translated_text = request_translation(text)
-        dictionary[text] = translated_text
-        save_current_dict(dictionary, current_language)
+        save_current_dict({text: translated_text}, current_language)
 
     if translated_text is None:
         logger.error(
@@ -226,23 +337,185 @@ def request_translation(text: str) -> str:
     """
     current_language = language_context.get_language()
 
-    auth_key = os.getenv("DEEPL_AUTH_KEY", None)
+    backend = get_backend()
 
-    if auth_key:
+    if backend is not None:
         logger.info(
             f"Requesting translation for '{text[0:30]}"
             f"{'[...]' if len(text) > 30 else ''}'"
         )
-        translator = deepl.Translator(auth_key)
-
-        translated_text = translator.translate_text(
-            text,
-            target_lang=code[current_language],
-            source_lang="DE",
-        ).text
+        translated_text = backend.translate_many([text], code[current_language])[0]
 
     else:
         logger.warning("No DeepL key found. New translations will not be available.")
         translated_text = text
 
     return translated_text
+
+
+class TranslationBackend(ABC):
+    """
+    Base of the translation backends: texts are sent in chunks of up to
+    <max_texts> per request, each chunk through translate_chunk().
+    """
+
+    max_texts = 50
+
+    def __init__(self):
+        self.requests = 0
+
+    @abstractmethod
+    def translate_chunk(self, texts: list, target_lang: str) -> list:
+        """
+        Translate one chunk of at most <max_texts> texts in one request.
+        """
+
+    def translate_many(self, texts: list, target_lang: str) -> list:
+        out = []
+        for i in range(0, len(texts), self.max_texts):
+            out.extend(self.translate_chunk(texts[i:i + self.max_texts], target_lang))
+            self.requests += 1
+
+        return out
+
+
+class DeepLBackend(TranslationBackend):
+    """
+    Translation backend talking to DeepL. The client is created once and
+    reused.
+    """
+
+    def __init__(self, auth_key: str):
+        super().__init__()
+        self.auth_key = auth_key
+        self._translator = None
+
+    @property
+    def translator(self) -> deepl.Translator:
+        if self._translator is None:
+            self._translator = deepl.Translator(self.auth_key)
+        return self._translator
+
+    def translate_chunk(self, texts: list, target_lang: str) -> list:
+        results = self.translator.translate_text(
+            texts,
+            target_lang=target_lang,
+            source_lang=code["de"],
+        )
+        return [result.text for result in results]
+
+
+class FakeBackend(TranslationBackend):
+    """
+    Offline stand-in for DeepL: "translates" by tagging each text with the
+    target language code, and records every request, so batching can be tried
+    without network or API key. Enable with ELTERNSEIN_TRANSLATOR=fake.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def translate_chunk(self, texts: list, target_lang: str) -> list:
+        self.calls.append((target_lang, list(texts)))
+        return [f"[{target_lang}] {text}" for text in texts]
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Return the translation backend in use, creating it on first call: the fake
+    translator if ELTERNSEIN_TRANSLATOR=fake, DeepL if a key is configured,
+    else None.
+    """
+    global _backend
+
+    if _backend is None:
+        auth_key = os.getenv("DEEPL_AUTH_KEY", None)
+        if os.getenv("ELTERNSEIN_TRANSLATOR") == "fake":
+            _backend = FakeBackend()
+        elif auth_key:
+            _backend = DeepLBackend(auth_key)
+
+    return _backend
+
+
+def set_backend(backend) -> None:
+    """
+    Replace the translation backend, e.g. by a FakeBackend().
+    """
+    global _backend
+    _backend = backend
+
+
+class TranslationBatch:
+    """
+    Collects strings missing from the dictionary during a build phase and
+    translates them in bulk on flush(), writing the dictionary only once.
+    """
+
+    def __init__(self, language: str):
+        self.language = language
+        self.pending = {}
+        self.translated = 0
+
+    def add(self, text: str) -> None:
+        self.pending[text] = None
+
+    def flush(self) -> int:
+        """
+        Translate all pending strings and commit them to the dictionary.
+        Return the number of new entries.
+        """
+        if not self.pending:
+            return 0
+
+        backend = get_backend()
+        if backend is None:
+            logger.warning(
+                f"No DeepL key found. {len(self.pending)} strings stay untranslated."
+            )
+            self.pending = {}
+            return 0
+
+        texts = list(self.pending)
+        logger.info(f"Translating {len(texts)} new strings in one batch.")
+        translations = backend.translate_many(texts, code[self.language])
+
+        save_current_dict(dict(zip(texts, translations)), self.language)
+        self.pending = {}
+        self.translated += len(texts)
+
+        return len(texts)
+
+
+_batch_local = threading.local()
+
+
+def active_batch():
+    """
+    Return the translation batch collecting misses in this thread, if any.
+    """
+    return getattr(_batch_local, "batch", None)
+
+
+@contextmanager
+def translation_batch(language: str = None):
+    """
+    Within this context, translate() and translate_series() queue dictionary
+    misses instead of querying DeepL one by one. On exit, all queued strings
+    are translated in bulk and the dictionary is saved once. The batch's
+    <translated> count tells whether anything built inside the context still
+    carries untranslated placeholders.
+    """
+    batch = TranslationBatch(language or language_context.get_language())
+    outer = active_batch()
+    _batch_local.batch = batch
+    try:
+        yield batch
+    finally:
+        _batch_local.batch = outer
+
+    batch.flush()
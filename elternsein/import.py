@@ -1,13 +1,29 @@
-import re
+"""
+Import der heruntergeladenen Rohdaten nach data/processed:
+
+    python -m elternsein.import [stage ...] [--force] [--jobs N] [--dry-run]
+
+Der Import besteht aus Stufen mit deklarierten Ein- und Ausgabedateien (siehe
+=> elternsein.pipeline). Es laufen nur Stufen, deren Eingaben oder Code sich
+seit dem letzten Lauf geändert haben, und voneinander unabhängige Stufen
+parallel.
+"""
+import time
+import argparse
 from pathlib import Path
-import zipfile
-import tempfile
 import logging
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
 
-from data.sources import destatis_sources, bkg_source
+from data.sources import destatis_sources, bkg_source, bkg_gem_source
+from elternsein.genesis import read_tablefile, wide_to_long
+from elternsein.pipeline import Pipeline, print_report
+from elternsein.matching import resolve
+from elternsein.gemeinden import assign_areas
+from elternsein.utils import file_digest
 
 
 processed_dir = Path(__file__).resolve().parents[1] / "data" / "processed"
@@ -19,408 +35,403 @@ eg_hoehe = destatis_sources["eg_hoehe"]
 eg_dauer = destatis_sources["eg_dauer"]
 steuer   = destatis_sources["steuern"]  # wir warten noch, dass der Download aus der API klappt
 bkg = bkg_source
+bkg_gem = bkg_gem_source
+
+kreise_steuern_egdauer_file = processed_dir / "kreise_steuern_egdauer.parquet"
+
+# Zuordnung der Kreisnamen aus den Destatis-Tabellen zu AGS:
+krs_crosswalk_file = processed_dir / "crosswalk_krs.json"
 
 logger = logging.getLogger(__name__)
 
+# Fingerabdrücke der zuletzt erfolgreich gelaufenen Stufen:
+pipeline = Pipeline(processed_dir / "import-manifest.json")
+
+
+def compact(df: pd.DataFrame, categories: list = (), integers: dict = None) -> pd.DataFrame:
+    """
+    Return <df> with the label columns <categories> as categoricals (stored
+    dictionary-encoded in the parquet file and read back as categoricals)
+    and the columns in <integers> narrowed to the given numpy dtype, or its
+    nullable counterpart where values are missing.
+
+    :param categories: columns with few distinct values
+    :param integers: {column: dtype}, e.g. {"jahr": "int16"}
+    """
+    dtypes = {column: "category" for column in categories}
+    for column, dtype in (integers or {}).items():
+        dtypes[column] = dtype if df[column].notna().all() else dtype.capitalize()
+
+    return df.astype(dtypes)
+
+
 #
 # Geburten
 # =============================================================================
-df = pd.read_csv(
-    geburten["raw_file"],
-    # encoding="latin-1",
-    sep=";",
-    skiprows=4,
-    skipfooter=3,
-    engine="python",
-)
-df = (df
- .rename({"Unnamed: 0": "land", "Unnamed: 1": "fm"}, axis=1)
- .set_index(["land", "fm"])
- .loc[(slice(None), ["männlich", "weiblich"]), :]
- .rename_axis(axis=1, mapper="jahr")
- .stack()
- .to_frame("geburten")
- .reorder_levels(["jahr", "land", "fm"])
- .sort_index()
- .reset_index()
- .astype({"jahr": pd.Int64Dtype()})
+@pipeline.stage(
+    "geburten",
+    inputs=[geburten["raw_file"]],
+    outputs=[geburten["processed_file"]],
 )
+def import_geburten():
+    df = read_tablefile(geburten["raw_file"], **geburten["tablefile"])
+    # nur Mädchen und Jungen, ohne die Summe (zweite Spalte: Geschlecht):
+    df = df.loc[df.iloc[:, 1].isin(["männlich", "weiblich"])]
+    df = wide_to_long(df, ["land", "fm"], "geburten").sort_values(["jahr", "land", "fm"], ignore_index=True)
 
-df.to_parquet(geburten["processed_file"])
+    df = compact(df, ["land", "fm"], {"jahr": "int16", "geburten": "int32"})
+    df.to_parquet(geburten["processed_file"])
 
 
 #
 # Empfangende von Elterngeld
 # =============================================================================
-df = pd.read_csv(
-    eg_empf["raw_file"],
-    # encoding="latin-1",
-    sep=";",
-    skiprows=6,
-    header=[0, 1],
-    skipfooter=25,
-    engine="python",
+@pipeline.stage(
+    "eg_empf",
+    inputs=[eg_empf["raw_file"]],
+    outputs=[eg_empf["processed_file"]],
 )
+def import_eg_empf():
+    df = read_tablefile(eg_empf["raw_file"], **eg_empf["tablefile"])
 
-df = (df
-    .rename(columns={"Unnamed: 0_level_0": "land",
-                     "Unnamed: 1_level_0": "fm",
-                     "Unnamed: 2_level_0": "art",
-                     "Unnamed: 0_level_1": "",
-                     "Unnamed: 1_level_1": "",
-                     "Unnamed: 2_level_1": ""})
-    .rename_axis(columns=("jahr", "quartal"))
-)
+    df = df.drop(columns=[("2021", "4. Quartal")])
+    df = wide_to_long(df, ["land", "fm", "art"], "pers", periods=["jahr", "quartal"])
 
-df.columns = ['_'.join(col).strip() for col in df.columns.values]
-
-df = (
-    df
-    .drop("2021_4. Quartal", axis=1)
-    .rename(columns={"land_": "land", "fm_": "fm", "art_": "art"})
-    .set_index(["land", "fm", "art"])
-    .rename_axis("jahr_quartal", axis=1)
-    .stack()
-    .to_frame("pers")
-    .reset_index(level=3)
-    .assign(jahr=lambda x: x["jahr_quartal"].str.extract(r"(\d{4})"))
-    .assign(quartal=lambda x: x["jahr_quartal"].str[5])
-    .drop("jahr_quartal", axis=1)
-    .set_index(["jahr", "quartal"], append=True)
-    .reorder_levels(["jahr", "quartal", "land", "fm", "art"])
-    .reset_index()
-    .astype({"jahr": pd.Int64Dtype(), "quartal": pd.Int64Dtype()})
-)
-
-df.to_parquet(eg_empf["processed_file"])
+    df = compact(df, ["land", "fm", "art"], {"jahr": "int16", "quartal": "int8", "pers": "int32"})
+    df.to_parquet(eg_empf["processed_file"])
 
 
 #
 # Höhe des Elterngeldes
 # =============================================================================
-df = pd.read_csv(
-    eg_hoehe["raw_file"],
-    # encoding="latin-1",
-    sep=";",
-    skiprows=6,
-    header=[0, 1],
-    skipfooter=3,
-    engine="python",
+@pipeline.stage(
+    "eg_hoehe",
+    inputs=[eg_hoehe["raw_file"]],
+    outputs=[eg_hoehe["processed_file"]],
 )
+def import_eg_hoehe():
+    df = read_tablefile(eg_hoehe["raw_file"], **eg_hoehe["tablefile"])
 
-df = (df
-      .rename(columns={"Unnamed: 0_level_0": "state",
-                     "Unnamed: 1_level_0": "sex",
-                     "Unnamed: 2_level_0": "egplus",
-                     "Unnamed: 3_level_0": "erwerbstaetig",
-                     "Unnamed: 0_level_1": "",
-                     "Unnamed: 1_level_1": "",
-                     "Unnamed: 2_level_1": "",
-                     "Unnamed: 3_level_1": "",})
-      .rename_axis(columns=("year", "quarter"))
-)
+    df = wide_to_long(df, ["state", "sex", "egplus", "erwerbstaetig"], "eur", periods=["year", "quarter"])
 
-df.columns = ['_'.join(col).strip() for col in df.columns.values]
-
-df = (
-    df
-    .rename(columns={"state_": "state", "sex_": "sex", "egplus_": "egplus", "erwerbstaetig_": "erwerbstaetig"})
-    .set_index(["state", "sex", "egplus", "erwerbstaetig"])
-    .rename_axis("year_quarter", axis=1)
-    .stack()
-    .to_frame("eur")
-    .reset_index(level=4)
-    .assign(year=lambda x: x["year_quarter"].str.extract(r"(\d{4})"))
-    .assign(quarter=lambda x: x["year_quarter"].str[5])
-    .drop("year_quarter", axis=1)
-    .set_index(["year", "quarter"], append=True)
-    .reorder_levels(["year", "quarter", "state", "egplus", "erwerbstaetig", "sex"])
-    .sort_index()
-    .reset_index()
-)
+    order = ["year", "quarter", "state", "egplus", "erwerbstaetig", "sex"]
+    df = df[order + ["eur"]].sort_values(order, ignore_index=True)
 
-df = df.astype({
-    "state": pd.StringDtype(),
-    "year": pd.Int64Dtype(),
-    "quarter": pd.Int64Dtype(),
-    "egplus": pd.StringDtype(),
-    "erwerbstaetig": pd.StringDtype(),
-    "sex": pd.StringDtype(),
-    "eur": pd.Int64Dtype(),
-})
+    df = compact(
+        df,
+        ["state", "egplus", "erwerbstaetig", "sex"],
+        {"year": "int16", "quarter": "int8", "eur": "int32"},
+    )
 
-df.to_parquet(eg_hoehe["processed_file"])
+    df.to_parquet(eg_hoehe["processed_file"])
 
 
 #
-# Dauer des Elterngeldes
+# Steuerkraft
 # =============================================================================
-df = pd.read_csv(
-    eg_dauer["raw_file"],
-    # encoding="latin-1",
-    sep=";",
-    skiprows=5,
-    skipfooter=4,
-    engine="python",
+@pipeline.stage(
+    "steuern",
+    inputs=[steuer["raw_file"]],
+    outputs=[steuer["processed_file"]],
 )
+def import_steuern():
+    # die Zeile mit den Einheiten überspringt read_tablefile():
+    df = read_tablefile(steuer["raw_file"], **steuer["tablefile"])
 
-df = (df
-      .rename(columns={"Unnamed: 0": "krs",
-                       "Unnamed: 1": "fm",
-                       "Unnamed: 2": "egplus",})
-      .rename_axis(columns="jahr")
-)
+    df = (df
+          .rename(columns={"Unnamed: 0": "jahr",
+                           "Unnamed: 1": "rs",
+                           "Unnamed: 2": "krs",
+                           "Lohn- und Einkommensteuerpflichtige": "stpflichtige",
+                           "Gesamtbetrag der Einkünfte": "einkuenfte",
+                           "Lohn- und Einkommensteuer": "steuer",})
+          .set_index(["jahr", "krs", "rs"])
+          .astype(pd.Int64Dtype())
+          .reset_index()
+    )
 
-df = (
-    df
-    .set_index(["krs", "fm", "egplus"])
-    .stack()
-    .to_frame("monate")
-    .reorder_levels(["jahr", "krs", "fm", "egplus"])
-    .sort_index()
-    .reset_index()
-)
+    df.jahr = df.jahr.astype(pd.Int64Dtype())
 
-df = df.replace({"/": pd.NA, "-": pd.NA})
+    df.einkuenfte *= 1000
+    df.steuer *= 1000
 
-df.jahr = df.jahr.astype(pd.Int64Dtype())
-df.monate = df.monate.str.replace(",", ".").astype(pd.Float64Dtype())
+    df["steuer_pc"] = df.steuer / df.stpflichtige
 
-df.to_parquet(eg_dauer["processed_file"])
+    df = compact(df, ["krs"], {"jahr": "int16"})
+    df.to_parquet(steuer["processed_file"])
 
 
 #
-# Steuerkraft
+# Einwohnerzahlen
 # =============================================================================
-df = pd.read_csv(
-    steuer["raw_file"],
-    encoding="latin-1",
-    sep=";",
-    skiprows=5,
-    skipfooter=4,
-    engine="python",
-).iloc[1:, :]
-
-df = (df
-      .rename(columns={"Unnamed: 0": "jahr",
-                       "Unnamed: 1": "rs",
-                       "Unnamed: 2": "krs",
-                       "Lohn- und Einkommensteuerpflichtige": "stpflichtige",
-                       "Gesamtbetrag der Einkünfte": "einkuenfte",
-                       "Lohn- und Einkommensteuer": "steuer",})
-      .set_index(["jahr", "krs", "rs"])
-      .replace({"-": pd.NA, ".": pd.NA}).astype(pd.Int64Dtype())
-      .reset_index()
+@pipeline.stage(
+    "ewz",
+    inputs=[ewz["raw_file"]],
+    outputs=[ewz["processed_file"]],
 )
+def import_ewz():
+    df = read_tablefile(ewz["raw_file"], **ewz["tablefile"])
 
-df.jahr = df.jahr.astype(pd.Int64Dtype())
+    # Stichtag "31.12.<jahr>" im Kopf, wide_to_long() liest das Jahr heraus:
+    df = wide_to_long(df, ["land"], "ewz").sort_values(["jahr", "land"], ignore_index=True)
 
-df.einkuenfte *= 1000
-df.steuer *= 1000
+    df = compact(df, ["land"], {"jahr": "int16", "ewz": "int32"})
+    df.to_parquet(ewz["processed_file"])
 
-df["steuer_pc"] = df.steuer / df.stpflichtige
 
-df.to_parquet(steuer["processed_file"])
+#
+# Geodaten
+# =============================================================================
+def simplified(gdf: gpd.GeoDataFrame, variant: dict) -> gpd.GeoDataFrame:
+    """
+    Return a simplified copy of <gdf> (in UTM) as WGS84, see bkg_source["variants"].
+    The geometries are simplified as a coverage: each border shared by two
+    areas is simplified once, for both, so no gaps or overlaps open up
+    between neighbours.
+    """
+    simple = gdf.copy()
+    simple["geom"] = shapely.coverage_simplify(simple.geom.values, variant["tolerance"])
+    simple = simple.to_crs(epsg=4326)
+    simple["geom"] = shapely.set_precision(simple.geom.values, variant["grid_size"])
+
+    return simple
+
+
+def log_variants(variant_report: list) -> None:
+    for name, variant_gdf, path in variant_report:
+        n_vertices = shapely.get_num_coordinates(variant_gdf.geom.values).sum()
+        logger.info(
+            f"Geometrievariante {name}: {n_vertices} Stützpunkte, "
+            f"{path.stat().st_size / 1e6:.1f} MB ({path.name})"
+        )
+
+
+@pipeline.stage(
+    "geodaten",
+    inputs=[bkg["raw_file"]],
+    outputs=[bkg["processed_file"]] + [
+        variant["processed_file"] for variant in bkg["variants"].values()
+    ],
+)
+def import_geodaten():
+    # schönere Spaltennamen:
+    columns = {
+        "AGS_0": "ags",
+        "GEN": "gen",
+        "BEZ": "bez",
+        "EWZ": "ewz",
+        "geometry": "geom",
+    }
+
+    # Die Ebene direkt aus dem Zip-Archiv lesen (GDAL-Dateisystem /vsizip/),
+    # ohne das GeoPackage erst auszupacken; nur die benötigten Spalten und
+    # ohne Gewässer (GF = 2), gefiltert schon von GDAL (columns und where
+    # gibt es nur mit pyogrio):
+    gdf = gpd.read_file(
+        f"/vsizip/{bkg['raw_file']}/{bkg['extractable']}",
+        engine="pyogrio",
+        layer=6,
+        columns=[column for column in columns if column != "geometry"],
+        where="GF <> 2",
+    )
+
+    gdf = gdf.filter(columns).rename(columns, axis=1).set_geometry("geom")
+
+    gdf.to_crs(epsg=4326).to_parquet(bkg["processed_file"])
+
+    # Vereinfachte Varianten für kleinere Maßstäbe: Vereinfachung der
+    # gemeinsamen Grenzen in Metern, solange die Geometrien noch in UTM
+    # vorliegen, danach Koordinaten auf ein Raster runden, damit die Dateien
+    # klein bleiben.
+    variant_report = [("original", gdf.to_crs(epsg=4326), bkg["processed_file"])]
+
+    for name, variant in bkg["variants"].items():
+        simple = simplified(gdf, variant)
+        simple.to_parquet(variant["processed_file"])
+        variant_report.append((name, simple, variant["processed_file"]))
+
+    log_variants(variant_report)
 
 
 #
-# Einwohnerzahlen
+# Gemeinden: Geometrien einmal, Attribute über gid verknüpft
 # =============================================================================
-df = pd.read_csv(
-    ewz["raw_file"],
-    # encoding="latin-1",
-    sep=";",
-    skiprows=5,
-    skipfooter=4,
-    engine="python",
+@pipeline.stage(
+    "gemeinden",
+    inputs=[bkg_gem["raw_file"], bkg["processed_file"]],
+    outputs=[bkg_gem["geometry_file"], bkg_gem["attribute_file"]] + [
+        variant["processed_file"] for variant in bkg_gem["variants"].values()
+    ],
 )
+def import_gemeinden():
+    columns = {
+        "AGS_0": "ags",
+        "GEN": "gen",
+        "BEZ": "bez",
+        "EWZ": "ewz",
+        "geometry": "geom",
+    }
+
+    gdf = gpd.read_file(
+        f"/vsizip/{bkg_gem['raw_file']}/{bkg_gem['extractable']}",
+        engine="pyogrio",
+        layer=bkg_gem["layer"],
+        columns=[column for column in columns if column != "geometry"],
+        where="GF <> 2",
+    )
+
+    gdf = (
+        gdf.filter(columns).rename(columns, axis=1).set_geometry("geom")
+        .sort_values("ags", ignore_index=True)
+    )
+    gdf.index = pd.Index(np.arange(len(gdf), dtype="int32"), name="gid")
+
+    # Fläche in km², solange die Geometrien in UTM (Metern) vorliegen:
+    gdf["flaeche"] = gdf.area / 1e6
+
+    # Kreis jeder Gemeinde räumlich bestimmen (Kreisgeometrien aus der Stufe
+    # "geodaten") und mit dem Präfix des AGS abgleichen:
+    krs = gpd.read_parquet(bkg["processed_file"], columns=["ags", "geom"]).to_crs(gdf.crs)
+    gdf["krs"] = assign_areas(gdf, krs, "ags")
+
+    by_key = gdf.ags.str[:5] + "000"
+    differs = gdf.krs.notna() & gdf.krs.ne(by_key)
+    if differs.any():
+        logger.warning(f"{differs.sum()} Gemeinden liegen nicht im Kreis ihres AGS.")
+    if gdf.krs.isna().any():
+        logger.warning(f"{gdf.krs.isna().sum()} Gemeinden keinem Kreis zugeordnet, nehme den AGS.")
+        gdf["krs"] = gdf.krs.fillna(by_key)
+
+    gdf["land"] = gdf.krs.str[:2]
+
+    (
+        pd.DataFrame(gdf.drop(columns="geom"))
+        .astype({"ewz": "int32", "flaeche": "float32"})
+        .reset_index()
+        .to_parquet(bkg_gem["attribute_file"])
+    )
+
+    geometry = gdf[["geom"]].reset_index()
+    original = geometry.to_crs(epsg=4326)
+    original.to_parquet(bkg_gem["geometry_file"])
+
+    variant_report = [("Gemeinden original", original, bkg_gem["geometry_file"])]
+    for name, variant in bkg_gem["variants"].items():
+        simple = simplified(geometry, variant)
+        simple.to_parquet(variant["processed_file"])
+        variant_report.append((f"Gemeinden {name}", simple, variant["processed_file"]))
+
+    log_variants(variant_report)
 
-df = (df
- .rename({"Unnamed: 0": "land"}, axis=1)
- .set_index(["land"])
- .rename_axis(axis=1, mapper="jahr")
- .rename(columns=lambda x: re.sub(r"31\.12\.", "", x))
- .stack()
- .to_frame("ewz")
- .reorder_levels(["jahr", "land"])
- .sort_index()
- .reset_index()
- .astype({"jahr": pd.Int64Dtype(), "ewz": pd.Int64Dtype()})
+
+#
+# Dauer des Elterngeldes, Kreise mit AGS aus BKG-Daten verknüpfen
+# =============================================================================
+@pipeline.stage(
+    "eg_dauer",
+    inputs=[eg_dauer["raw_file"], bkg["processed_file"]],
+    outputs=[eg_dauer["processed_file"], krs_crosswalk_file],
 )
+def import_eg_dauer():
+    df = read_tablefile(eg_dauer["raw_file"], **eg_dauer["tablefile"])
 
-df.to_parquet(ewz["processed_file"])
+    df = wide_to_long(df, ["krs", "fm", "egplus"], "monate")
 
+    # Reihenfolge der Tabelle (nach Regionalschlüssel), für die unscharfe Suche:
+    table_order = df.krs
 
-#
-# Geodaten
-# =============================================================================
-with tempfile.TemporaryDirectory() as temp_dir:
-    
-    # Extract the contents of the zip file to the temporary directory
-    with zipfile.ZipFile(bkg["raw_file"], "r") as zip_file:
-        zip_file.extract(bkg["extractable"], path=temp_dir)
-    
-    # Construct the path to the extracted gpkg file
-    extracted_file_path = Path(temp_dir) / bkg["extractable"]
-
-    # Read the file with pandas
-    gdf = gpd.read_file(extracted_file_path, layer=6)
-
-# Gewässer ausschließen:
-gdf = gdf.loc[gdf.GF.ne(2)].to_crs(epsg=4326)
-
-# schönere Spaltennamen:
-columns = {
-    "AGS_0": "ags",
-    "GEN": "gen",
-    "BEZ": "bez",
-    "EWZ": "ewz",
-    "geometry": "geom",
-}
-gdf = gdf.filter(columns).rename(columns, axis=1)
-
-gdf.to_parquet(bkg["processed_file"])
+    df = df.sort_values(["jahr", "krs", "fm", "egplus"], ignore_index=True)
+    df.monate = df.monate.astype(pd.Float64Dtype())
 
-#
-#
-# Kreisdaten (Dauer EG-Bezug, Steuerkraft) mit AGS aus BKG-Daten verknüpfen
-# =============================================================================
-"""
-Die Destatis-Daten auf Kreisebene sind aus unbekannten Gründen nicht gut darin,
-Kreise einfach zu identifizieren. Es werden keine allgemeinen Gemeindeschlüssel
-(AGS) oder Regionalschlüssel ([a]rs) geliefert. Und die Namen stimmen ebenfalls
-nicht mit denen überein, die das BKG verwendet. Hier also folgt ein manueller
-Matching-Parcours.
-Schritt 1: EG-Dauer
-"""
-# Die Daten liegen in Langform vor. Wir brauchen eine Zeile pro Kreis und Jahr.
-df_dauer_krs = pd.read_parquet(destatis_sources["eg_dauer"]["processed_file"])
-
-# viele heute eingestellte Kreise mit fehlenden Daten; entfernen:
-df_dauer_krs = df_dauer_krs.dropna(subset="monate")
-
-# Geodaten laden:
-vg = gpd.read_parquet(bkg_source["processed_file"])
-
-# Unser erster Match-Versuch nutzt die Tatsache, dass im EG-Datensatz die
-# Kreise benannt sind nach der Form:
-# "<NAME>, <BEZEICHNUNG>".
-# Wir konstruieren im gdf eine neue Spalte aus "gen" & "bez", die das reproduziert.
-
-# Dafür müssen wir die Großschreibung korrigieren:
-vg.loc[vg.bez.eq("Kreisfreie Stadt"), "bez"] = "kreisfreie Stadt"
-vg["krs"] = vg.gen + ", " + vg.bez
-df_dauer_matched = pd.merge(df_dauer_krs, vg, on="krs")
-
-# Nichtmatches:
-df_dauer_mismatch = df_dauer_krs.query('~krs.isin(@df_dauer_matched.krs)')
-
-# Zweiter Join: die Bezeichnung des Kreises (Stadtkreis, Landkreis, kreisfreie
-# Stadt, ...) ist bei einigen Orten Teil von `gen`; wir matchen die bisherigen
-# Überbleibsel erneut und die erfolgreichen Matches kommen ins Töpfchen:
-df_dauer_matched = pd.concat([
-    df_dauer_matched,
-    pd.merge(df_dauer_mismatch, vg.drop("krs", axis=1), left_on="krs", right_on="gen")
-])
-
-# das Kröpfchen:
-df_dauer_mismatch = df_dauer_krs.query('~krs.isin(@df_dauer_matched.krs)')
-
-# dritter & vierter Join: Einige Kreise, die im EG-Datensatz "Landkreis" oder
-# "kreisfreie Stadt" heißen, heißen in der vg250 "Kreis" oder "Stadtkreis":
-# a)
-vg.krs = vg.krs.str.replace("Kreis", "Landkreis")
-df_dauer_matched = pd.concat([
-    df_dauer_matched,
-    pd.merge(df_dauer_mismatch, vg, on="krs")
-])
-
-# das Kröpfchen:
-df_dauer_mismatch = df_dauer_krs.query('~krs.isin(@df_dauer_matched.krs)')
-
-# b)
-vg.krs = vg.krs.str.replace("Stadtkreis", "kreisfreie Stadt")
-df_dauer_matched = pd.concat([
-    df_dauer_matched,
-    pd.merge(df_dauer_mismatch, vg, on="krs")
-])
-df_dauer_mismatch = df_dauer_krs.query('~krs.isin(@df_dauer_matched.krs)')
-
-# Und zuletzt gibt es einfach einige Totalverluste, vor allem weil im BKG seit
-# einiger Zeit eine neue Nomenklatur für Präpositionen im Namen gilt: abgekürzt
-# und ohne Leerzeichen bei mehreren Wörtern. Plus, wir kürzen
-# "Oberpfalz" und "Oldenburg" ab.
-translatedict = {
-    "Dillingen a.d. Donau, Landkreis": 'Dillingen an der Donau, Landkreis',
-    "Eisenach, kreisfreie Stadt": 'Eisenach, kreisfreie Stadt (bis 30.06.2021)',
-    "Mühldorf a. Inn, Landkreis": 'Mühldorf am Inn, Landkreis',
-    "Neumarkt i.d. OPf., Landkreis": 'Neumarkt in der Oberpfalz, Landkreis',
-    "Neustadt a.d. Aisch-Bad Windsheim, Landkreis": 'Neustadt an der Aisch-Bad Windsheim, Landkreis',
-    "Neustadt a.d. Waldnaab, Landkreis": 'Neustadt an der Waldnaab, Landkreis',
-    "Oldenburg (Oldb), kreisfreie Stadt": 'Oldenburg (Oldenburg), kreisfreie Stadt',
-    "Pfaffenhofen a.d. Ilm, Landkreis": 'Pfaffenhofen an der Ilm, Landkreis',
-    "St. Wendel, Landkreis": 'Sankt Wendel, Landkreis',
-    "Weiden i.d. OPf., kreisfreie Stadt": 'Weiden in der Oberpfalz, kreisfreie Stadt',
-    "Wunsiedel i. Fichtelgebirge, Landkreis": 'Wunsiedel im Fichtelgebirge, Landkreis'
-}
-
-vg.krs = vg.krs.replace(translatedict)
-
-df_dauer_matched = pd.concat([
-    df_dauer_matched,
-    pd.merge(df_dauer_mismatch, vg, on="krs")
-])
-df_dauer_mismatch = df_dauer_krs.query('~krs.isin(@df_dauer_matched.krs)')
-
-n_mismatched_krs = df_dauer_mismatch.krs.nunique()
-logger.info(f"Matching EG-Dauer and BKG left {n_mismatched_krs} districts unmatched.")
-
-df_dauer_matched[[
-    "jahr",
-    "ags", 
-    "krs",
-    "ewz",
-    "fm",
-    "egplus",
-    "monate",
-]].to_parquet(destatis_sources["eg_dauer"]["processed_file"])
+    # Die Destatis-Daten auf Kreisebene sind aus unbekannten Gründen nicht gut
+    # darin, Kreise einfach zu identifizieren. Es werden keine allgemeinen
+    # Gemeindeschlüssel (AGS) oder Regionalschlüssel ([a]rs) geliefert. Und die
+    # Namen stimmen ebenfalls nicht mit denen überein, die das BKG verwendet.
+    # Jeder Name wird daher einmal über die Kreuztabelle Name -> AGS
+    # aufgelöst (siehe => elternsein.matching) und das Ergebnis auf alle
+    # Zeilen übertragen. Was nicht exakt passt, wird unscharf mit den Kreisen
+    # desselben Landes verglichen.
 
-"""
-Schritt 2: Steuerdaten
-"""
-dfs = pd.read_parquet(destatis_sources["steuern"]["processed_file"])
-dfs = dfs.loc[
-    dfs.rs.str.len().eq(5)
-    & dfs.steuer_pc.notna()
-]
-dfs.rs = dfs.rs + "000"
+    # viele heute eingestellte Kreise mit fehlenden Daten; entfernen:
+    df = df.dropna(subset="monate")
 
-eg_dauer = pd.read_parquet(destatis_sources["eg_dauer"]["processed_file"])
+    # Geodaten ohne Geometrie laden:
+    vg = pd.read_parquet(bkg["processed_file"], columns=["ags", "gen", "bez", "ewz"])
 
-df_kreise = pd.merge(
-    left=dfs[[
-        "jahr",
-        "krs",
-        "rs",
-        "steuer_pc"
-    ]],
-    right=eg_dauer[[
+    names = table_order[table_order.isin(df.krs)]
+    crosswalk = resolve(names, vg, krs_crosswalk_file, file_digest(bkg["processed_file"]))
+
+    df = df.assign(ags=df.krs.map(crosswalk.ags)).dropna(subset="ags")
+    df["ewz"] = df.ags.map(vg.drop_duplicates("ags").set_index("ags").ewz)
+
+    df = compact(
+        df[["jahr", "ags", "krs", "ewz", "fm", "egplus", "monate"]],
+        ["krs", "fm", "egplus"],
+        {"jahr": "int16", "ewz": "int32"},
+    )
+    df.to_parquet(eg_dauer["processed_file"])
+
+
+#
+# Kreisdaten: Steuerkraft und Dauer des EG-Bezugs
+# =============================================================================
+@pipeline.stage(
+    "kreise_steuern_egdauer",
+    inputs=[steuer["processed_file"], eg_dauer["processed_file"]],
+    outputs=[kreise_steuern_egdauer_file],
+)
+def import_kreise_steuern_egdauer():
+    dfs = pd.read_parquet(destatis_sources["steuern"]["processed_file"])
+    dfs = dfs.loc[
+        dfs.rs.str.len().eq(5)
+        & dfs.steuer_pc.notna()
+    ]
+    dfs.rs = dfs.rs.astype(str) + "000"
+
+    eg_dauer = pd.read_parquet(destatis_sources["eg_dauer"]["processed_file"])
+
+    df_kreise = pd.merge(
+        left=dfs[[
+            "jahr",
+            "krs",
+            "rs",
+            "steuer_pc"
+        ]],
+        right=eg_dauer[[
+            "jahr",
+            "ags",
+            "fm",
+            "egplus",
+            "monate"
+        ]],
+        left_on=["rs", "jahr"],
+        right_on=["ags", "jahr"],
+    ).filter([
         "jahr",
         "ags",
+        "krs",
+        "steuer_pc",
         "fm",
         "egplus",
         "monate"
-    ]],
-    left_on=["rs", "jahr"],
-    right_on=["ags", "jahr"],
-).filter([
-    "jahr",
-    "ags",
-    "krs",
-    "steuer_pc",
-    "fm",
-    "egplus",
-    "monate"
-])
-
-df_kreise.to_parquet(processed_dir / "kreise_steuern_egdauer.parquet")
+    ])
+
+    df_kreise = compact(df_kreise, ["krs", "fm", "egplus"], {"jahr": "int16"})
+    df_kreise.to_parquet(kreise_steuern_egdauer_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m elternsein.import")
+    parser.add_argument("stages", nargs="*", help=", ".join(pipeline.stages))
+    parser.add_argument("--force", action="store_true", help="run stages even if up to date")
+    parser.add_argument("--jobs", type=int, help="number of parallel worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="only list stale stages")
+    args = parser.parse_args()
+
+    unknown = set(args.stages) - set(pipeline.stages)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    report = pipeline.run(args.stages, force=args.force, jobs=args.jobs, dry_run=args.dry_run)
+    print_report(report, time.perf_counter() - start)
@@ -1,4 +1,5 @@
 import threading
+from contextlib import contextmanager
 from flask import g, has_request_context
 import logging
 
@@ -28,4 +29,24 @@ class LanguageContext:
         # logger.info(f"Current language: {current_lang}")
         return current_lang
 
+    @classmethod
+    @contextmanager
+    def using(cls, language):
+        """
+        Switch to <language> within this context only, then back to the
+        language that was set before.
+        """
+        store = g if has_request_context() else cls._local
+        previous = getattr(store, "language", None)
+
+        cls.set_language(language)
+        try:
+            yield language
+        finally:
+            if previous is None:
+                delattr(store, "language")
+            else:
+                store.language = previous
+
+
 language_context = LanguageContext()
@@ -0,0 +1,326 @@
+"""
+Match district names from Destatis tables to the AGS of the BKG geometries.
+
+Destatis names its Kreise "<NAME>, <BEZEICHNUNG>" and doesn't deliver any
+key, while the BKG uses its own spelling (abbreviated prepositions, "Kreis"
+and "Stadtkreis" instead of "Landkreis" and "kreisfreie Stadt", ...). Instead
+of merging the long tables round after round, both sides are reduced to a
+canonical key once, and every distinct name is looked up once in an index of
+those keys. Names that still don't match are compared by token similarity
+with the remaining districts of the same Land only (blocking on the first two
+AGS digits), which keeps the search small even for Gemeinden.
+
+The result is kept as a versioned crosswalk file (name -> AGS), which later
+imports load as a lookup table; entries marked "manual" there survive any
+rebuild.
+"""
+import re
+import json
+import hashlib
+import logging
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pandas as pd
+
+from .i18n import write_atomically
+
+
+logger = logging.getLogger(__name__)
+
+# Schreibweisen, die auf eine gemeinsame Form gebracht werden (auf bereits
+# kleingeschriebene Namen angewandt, in dieser Reihenfolge):
+name_rules = [
+    (r"\s*\(bis \d{2}\.\d{2}\.\d{4}\)", ""),
+    (r"\ba\.\s*d\.\s*", "an der "),
+    (r"\bi\.\s*d\.\s*", "in der "),
+    # "a. M." steht immer für den Main (Frankfurt, Offenbach, ...):
+    (r"\ba\.\s*m\.", "am main"),
+    (r"\ba\.\s+", "am "),
+    (r"\bi\.\s+", "im "),
+    (r"\bst\.\s*", "sankt "),
+    (r"\bopf\.", "oberpfalz"),
+    (r"\(oldb\)", "(oldenburg)"),
+    (r"\s+", " "),
+]
+name_patterns = [(re.compile(pattern), replacement) for pattern, replacement in name_rules]
+
+# Bezeichnungen der Kreise, die dasselbe meinen:
+bez_synonyms = {
+    "kreis": "landkreis",
+    "stadtkreis": "kreisfreie stadt",
+}
+
+# Ähnlichkeit, ab der ein unscharfer Treffer gilt, und wie weit der beste
+# Kandidat vor dem zweitbesten liegen muss:
+fuzzy_threshold = 0.85
+fuzzy_margin = 0.05
+
+
+def normalize(name: str) -> str:
+    """
+    Return the canonical key of a district name.
+    """
+    key = name.strip().lower()
+    for pattern, replacement in name_patterns:
+        key = pattern.sub(replacement, key)
+
+    gen, sep, bez = key.rpartition(", ")
+    if sep and bez in bez_synonyms:
+        key = f"{gen}, {bez_synonyms[bez]}"
+
+    return key.strip()
+
+
+def tokens(key: str) -> list:
+    return sorted(set(re.findall(r"\w+", key)))
+
+
+def similarity(a: list, b: list) -> float:
+    """
+    Similarity of two token lists between 0 and 1: the better of the share
+    of common tokens (Dice) and the character similarity of the sorted
+    tokens, which forgives abbreviations and typos.
+    """
+    common = len(set(a) & set(b))
+    dice = 2 * common / (len(a) + len(b)) if a or b else 0.0
+    chars = SequenceMatcher(None, " ".join(a), " ".join(b)).ratio()
+
+    return max(dice, chars)
+
+
+def neighbour_states(results: list) -> list:
+    """
+    For each (ags, method) in table order, return the Länder (first two AGS
+    digits) of the nearest matched rows above and below it. Destatis sorts
+    its regional tables by key, so an unmatched district lies in one of them.
+    """
+    n = len(results)
+    before, after = [None] * n, [None] * n
+
+    last = None
+    for i, (ags, _) in enumerate(results):
+        before[i] = last
+        if ags is not None:
+            last = ags[:2]
+
+    last = None
+    for i in range(n - 1, -1, -1):
+        after[i] = last
+        if results[i][0] is not None:
+            last = results[i][0][:2]
+
+    return [{state for state in pair if state} for pair in zip(before, after)]
+
+
+class DistrictMatcher:
+    """
+    Index of the BKG districts by canonical key. Full names ("<gen>, <bez>")
+    take precedence; the bare "<gen>" is used as a key too, where it is
+    unambiguous, because some Destatis names carry the designation in the
+    name itself.
+    """
+
+    def __init__(self, vg: pd.DataFrame):
+        full = (vg.gen + ", " + vg.bez).map(normalize)
+        bare = vg.gen.map(normalize)
+
+        unique_bare = bare.loc[~bare.duplicated(keep=False)]
+        self.index = {
+            **dict(zip(unique_bare, vg.ags.loc[unique_bare.index])),
+            **dict(zip(full, vg.ags)),
+        }
+        self.full_keys = set(full)
+
+        # Kandidaten für die unscharfe Suche, nach Land:
+        self.blocks = {}
+        for ags, key in zip(vg.ags, full):
+            self.blocks.setdefault(ags[:2], []).append((ags, tokens(key)))
+
+    def match_one(self, name: str) -> tuple:
+        """
+        Return (ags, method) for one name; method is "name" if the canonical
+        key matched a full name, "gen" if it matched a bare one, and None
+        if nothing matched.
+        """
+        key = normalize(name)
+        if key not in self.index:
+            return None, None
+
+        return self.index[key], "name" if key in self.full_keys else "gen"
+
+    def match_fuzzy(self, name: str, states: set, taken: set) -> tuple:
+        """
+        Return (ags, score) of the most similar district not <taken> yet in
+        the Länder <states> (all, if empty), or (None, score) if no candidate
+        is similar enough and clearly ahead of the others.
+        """
+        name_tokens = tokens(normalize(name))
+        blocks = [self.blocks.get(state, []) for state in states] if states else self.blocks.values()
+
+        scores = sorted(
+            (
+                (similarity(name_tokens, candidate_tokens), ags)
+                for block in blocks
+                for ags, candidate_tokens in block
+                if ags not in taken
+            ),
+            reverse=True,
+        )
+        if not scores:
+            return None, 0.0
+
+        best, ags = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        if best < fuzzy_threshold or best - runner_up < fuzzy_margin:
+            return None, best
+
+        return ags, best
+
+    def match(self, names, known: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Match each distinct name once, exactly by key where possible, else
+        fuzzily within the Länder suggested by its neighbours in <names>.
+        Return a frame indexed by name with the columns "ags", "method" and
+        "score".
+
+        :param names: district names in table order, repetitions allowed
+        :param known: crosswalk entries to take as they are
+        """
+        unique = pd.Index(pd.unique(pd.Series(names).dropna()), name="name")
+        known = known if known is not None else empty_crosswalk()
+
+        results, scores, pending = [], [], []
+        for i, name in enumerate(unique):
+            if name in known.index and pd.notna(known.ags[name]):
+                results.append((known.ags[name], known.method[name]))
+                scores.append(known.score.get(name, 1.0))
+                continue
+            ags, method = self.match_one(name)
+            results.append((ags, method))
+            scores.append(1.0 if ags is not None else None)
+            if ags is None:
+                pending.append(i)
+
+        taken = {ags for ags, _ in results if ags is not None}
+        states = neighbour_states(results)
+        for i in pending:
+            name = unique[i]
+            ags, score = self.match_fuzzy(name, states[i], taken)
+            scores[i] = round(score, 3)
+            if ags is not None:
+                results[i] = (ags, "fuzzy")
+                taken.add(ags)
+                logger.info(f"Fuzzy match: {name!r} -> {ags} (score {score:.2f}).")
+
+        crosswalk = pd.DataFrame(results, index=unique, columns=["ags", "method"])
+        crosswalk["score"] = scores
+
+        return crosswalk
+
+
+def quality_report(crosswalk: pd.DataFrame) -> dict:
+    """
+    Summarise a crosswalk: how many names matched by which method, and
+    which names didn't match at all.
+    """
+    return {
+        "names": len(crosswalk),
+        "methods": crosswalk.method.fillna("unmatched").value_counts().to_dict(),
+        "unmatched": sorted(crosswalk.index[crosswalk.ags.isna()]),
+    }
+
+
+def empty_crosswalk() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"ags": pd.Series(dtype=object), "method": pd.Series(dtype=object), "score": pd.Series(dtype=float)},
+        index=pd.Index([], name="name"),
+    )
+
+
+def crosswalk_key(vg_digest: str) -> str:
+    """
+    Identify what a crosswalk was made from: the geometries and the rules.
+    """
+    rules = json.dumps([name_rules, bez_synonyms, fuzzy_threshold, fuzzy_margin])
+    return hashlib.sha256(f"{vg_digest}|{rules}".encode("utf-8")).hexdigest()
+
+
+def save_crosswalk(path: Path, crosswalk: pd.DataFrame, vg_digest: str, version: int) -> None:
+    """
+    Write a crosswalk, together with its version, its quality report and the
+    key of the geometries and rules it was made with.
+    """
+    content = {
+        "version": version,
+        "key": crosswalk_key(vg_digest),
+        "report": quality_report(crosswalk),
+        "entries": {
+            name: {
+                "ags": row.ags if pd.notna(row.ags) else None,
+                "method": row.method if pd.notna(row.method) else None,
+                "score": row.score if pd.notna(row.score) else None,
+            }
+            for name, row in crosswalk.iterrows()
+        },
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomically(path, json.dumps(content, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+def load_crosswalk(path: Path, vg_digest: str) -> tuple:
+    """
+    Read a crosswalk file and return (crosswalk, version). If it was made
+    for other geometries or rules, only its "manual" entries are kept.
+    """
+    try:
+        content = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return empty_crosswalk(), 0
+
+    crosswalk = (
+        pd.DataFrame.from_dict(content.get("entries", {}), orient="index")
+        .rename_axis("name")
+        .reindex(columns=empty_crosswalk().columns)
+    )
+    if content.get("key") != crosswalk_key(vg_digest):
+        crosswalk = crosswalk.loc[crosswalk.method == "manual"]
+
+    return crosswalk, content.get("version", 0)
+
+
+def resolve(names, vg: pd.DataFrame, path: Path, vg_digest: str) -> pd.DataFrame:
+    """
+    Return the crosswalk for <names>: names already in the crosswalk file are
+    looked up there, only new ones go through the matcher. If anything
+    changed, the file is written again with the next version number.
+
+    Pairs can be fixed by hand by setting their method to "manual" in the
+    file; such entries are never matched again.
+
+    :param names: district names in table order, repetitions allowed
+    :param vg: BKG districts with the columns "ags", "gen" and "bez"
+    :param path: crosswalk file
+    :param vg_digest: hash of the geometry file <vg> was read from
+    :return: frame indexed by name with the columns "ags", "method" and "score"
+    """
+    known, version = load_crosswalk(path, vg_digest)
+    unique = pd.Index(pd.unique(pd.Series(names).dropna()), name="name")
+
+    if len(unique.difference(known.index)):
+        matched = DistrictMatcher(vg).match(unique, known=known)
+        known = pd.concat([known.drop(matched.index, errors="ignore"), matched])
+        version += 1
+        save_crosswalk(path, known, vg_digest, version)
+        logger.info(f"Wrote crosswalk version {version} to {path}.")
+
+    crosswalk = known.reindex(unique)
+    report = quality_report(crosswalk)
+    logger.info(
+        f"Matched {report['names'] - len(report['unmatched'])} of {report['names']} "
+        f"district names ({', '.join(f'{k}: {v}' for k, v in report['methods'].items())})."
+    )
+    for name in report["unmatched"]:
+        logger.warning(f"No district found for {name!r}.")
+
+    return crosswalk
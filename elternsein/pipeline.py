@@ -0,0 +1,265 @@
+"""
+A small build system for the data import.
+
+The import is a graph of stages. Each stage is a function that reads some
+files and writes others; a stage depends on every stage that writes one of its
+inputs. Before a stage runs, it is fingerprinted from the content of its
+inputs and its code: the source of its function, of the functions of the same
+module it calls, and of every project module that module imports (see
+local_functions() and utils.module_files()). If the fingerprint matches the one
+recorded in the manifest after the last successful run, and all outputs still
+exist, the stage is skipped. Stages whose dependencies are done run in
+parallel worker processes.
+
+See => elternsein.import for the stages themselves.
+"""
+import sys
+import json
+import time
+import inspect
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .utils import file_digest, module_files
+
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """
+    Raised when the stages asked for cannot be run: unknown, or depending on
+    each other in a cycle.
+    """
+
+
+class Stage:
+    """
+    One step of the import: a function plus the files it reads and writes.
+    """
+
+    def __init__(self, name: str, func, inputs: list, outputs: list):
+        self.name = name
+        self.func = func
+        self.inputs = [Path(path) for path in inputs]
+        self.outputs = [Path(path) for path in outputs]
+
+    def code_files(self) -> list:
+        """
+        Return the project modules the stage's module imports, directly or
+        not (without the stage's module itself, see local_functions()).
+        """
+        module = sys.modules[self.func.__module__]
+        # mit "python -m" heißt das Modul __main__, die Spec kennt den Namen:
+        name = module.__spec__.name if module.__spec__ else module.__name__
+        own = Path(inspect.getsourcefile(self.func)).resolve()
+
+        return [path for path in module_files(name) if path != own]
+
+    def fingerprint(self) -> str:
+        source = "".join(inspect.getsource(func) for func in local_functions(self.func))
+        parts = [
+            self.name,
+            hashlib.sha256(source.encode("utf-8")).hexdigest(),
+            *[file_digest(path) for path in self.code_files()],
+            *[file_digest(path) for path in self.inputs],
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def local_functions(func) -> list:
+    """
+    Return <func> and the functions of its module that it calls, directly or
+    through each other, in a stable order.
+    """
+    found = {}
+    todo = [func]
+    while todo:
+        current = todo.pop()
+        if current.__qualname__ in found:
+            continue
+        found[current.__qualname__] = current
+
+        # auch Lambdas, Comprehensions und innere Funktionen:
+        codes = [current.__code__]
+        while codes:
+            code = codes.pop()
+            codes.extend(const for const in code.co_consts if inspect.iscode(const))
+            for name in code.co_names:
+                value = current.__globals__.get(name)
+                if inspect.isfunction(value) and value.__module__ == func.__module__:
+                    todo.append(value)
+
+    return [found[name] for name in sorted(found)]
+
+
+class Pipeline:
+    """
+    A set of stages, run in dependency order. Register stages with the
+    @pipeline.stage(...) decorator, then call run().
+    """
+
+    def __init__(self, manifest_file: Path):
+        self.manifest_file = Path(manifest_file)
+        self.stages = {}
+
+    def stage(self, name: str, inputs: list, outputs: list):
+        """
+        Decorator that registers a function as stage <name>.
+        """
+        def register(func):
+            self.stages[name] = Stage(name, func, inputs, outputs)
+            return func
+
+        return register
+
+    def dependencies(self, name: str) -> set:
+        """
+        Return the names of the stages that write an input of stage <name>.
+        """
+        inputs = set(self.stages[name].inputs)
+        return {
+            other.name
+            for other in self.stages.values()
+            if other.name != name and inputs.intersection(other.outputs)
+        }
+
+    def upstream(self, names: list) -> list:
+        """
+        Return <names> plus everything they depend on, in registration order.
+        """
+        needed = set()
+        todo = list(names)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.dependencies(name))
+
+        return [name for name in self.stages if name in needed]
+
+    def check(self, names: list) -> None:
+        """
+        Make sure the stages <names> exist and their dependencies form no
+        cycle, else raise PipelineError.
+        """
+        unknown = [name for name in names if name not in self.stages]
+        if unknown:
+            raise PipelineError(f"Unknown stage(s): {', '.join(unknown)}")
+
+        # Stufen ohne offene Abhängigkeiten so lange abräumen, bis nichts mehr
+        # geht; was übrig bleibt, hängt im Kreis voneinander ab:
+        dependencies = {name: self.dependencies(name) for name in self.upstream(names)}
+        while dependencies:
+            done = [name for name, deps in dependencies.items() if not deps & dependencies.keys()]
+            if not done:
+                raise PipelineError(f"Stages depend on each other in a cycle: {', '.join(dependencies)}")
+            for name in done:
+                del dependencies[name]
+
+    def read_manifest(self) -> dict:
+        try:
+            return json.loads(self.manifest_file.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def write_manifest(self, manifest: dict) -> None:
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest_file.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+    def is_fresh(self, stage: Stage, fingerprint: str, manifest: dict) -> bool:
+        return (
+            manifest.get(stage.name) == fingerprint
+            and all(path.exists() for path in stage.outputs)
+        )
+
+    def run(self, targets: list = None, force: bool = False, jobs: int = None, dry_run: bool = False) -> dict:
+        """
+        Run all stale stages needed for <targets> (default: all stages).
+
+        :param targets: names of the stages to bring up to date
+        :param force: run the stages even if they are fresh
+        :param jobs: number of worker processes (default: one per CPU)
+        :param dry_run: only report which stages would run
+        :return: {stage name: {"status": "ran" | "skipped" | "stale", "seconds": float}}
+        """
+        self.check(targets or list(self.stages))
+        names = self.upstream(targets or list(self.stages))
+        manifest = self.read_manifest()
+        report = {}
+        pending = set(names)
+        running = {}
+        fingerprints = {}
+
+        def ready():
+            return [
+                name for name in names
+                if name in pending
+                and not self.dependencies(name).intersection(set(pending) | set(running.values()))
+            ]
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            while pending or running:
+                batch = ready()
+                for name in batch:
+                    pending.discard(name)
+                    stage = self.stages[name]
+                    fingerprint = stage.fingerprint()
+
+                    # in a dry run, nothing upstream is rebuilt, so whatever
+                    # depends on a stale stage is stale as well:
+                    stale_upstream = dry_run and any(
+                        report[dep]["status"] == "stale" for dep in self.dependencies(name)
+                    )
+
+                    if not force and not stale_upstream and self.is_fresh(stage, fingerprint, manifest):
+                        logger.info(f"Stage {name} is up to date.")
+                        report[name] = {"status": "skipped", "seconds": 0.0}
+                        continue
+
+                    if dry_run:
+                        report[name] = {"status": "stale", "seconds": 0.0}
+                        continue
+
+                    logger.info(f"Running stage {name}.")
+                    future = executor.submit(timed, stage.func)
+                    running[future] = name
+                    fingerprints[name] = fingerprint
+
+                if not running:
+                    # nichts lief, nichts wurde frei (siehe check()):
+                    if not batch:
+                        raise PipelineError(f"No stage can run, waiting: {', '.join(sorted(pending))}")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    # lets exceptions from the stage surface here:
+                    seconds = future.result()
+                    manifest[name] = fingerprints[name]
+                    self.write_manifest(manifest)
+                    report[name] = {"status": "ran", "seconds": seconds}
+
+        return {name: report[name] for name in names}
+
+
+def timed(func) -> float:
+    """
+    Run <func> and return how long it took in seconds (runs in the worker).
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def print_report(report: dict, total: float) -> None:
+    """
+    Print one line per stage and the wall-clock time of the whole run.
+    """
+    width = max(len(name) for name in report)
+    for name, entry in report.items():
+        print(f"{name:<{width}}  {entry['status']:<8} {entry['seconds']:>8.2f} s")
+    print(f"{'total':<{width}}  {'':<8} {total:>8.2f} s")
@@ -0,0 +1,261 @@
+"""
+Cache of the filtered and aggregated data the interactive callbacks send.
+
+A callback only ever asks for a small piece of data, e.g. the values of one
+map for one year, sex and EG Plus selection. Each such result is computed
+once and then kept at two levels:
+
+- in a bounded LRU cache in every process (config.query_cache_size entries),
+- as a JSON file under data/cache/queries, from which other workers of the
+  same server and later restarts take it instead of reading and reshaping
+  parquet files. Beyond config.query_cache_files files, the least recently
+  used ones are removed.
+
+Results are keyed by (dataset, jahr, fm, egplus, language) and the content
+hashes of the files they are made from, so a changed input never matches an
+old entry. Results without translated text are the same in every language
+and are kept once for all of them. Hit ratio and callback latency are counted per process in
+query_stats and served as JSON (see init_routes()).
+"""
+import os
+import sys
+import json
+import math
+import time
+import inspect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import suppress
+from functools import wraps
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.append(str(base_dir))
+
+from .config import query_cache_size, query_cache_files
+from .i18n import write_atomically
+from .language_context import language_context
+from .utils import file_digest
+
+
+logger = logging.getLogger(__name__)
+
+cache_dir = base_dir / "data" / "cache" / "queries"
+
+# Bestandteile des Schlüssels neben dem Datensatz; Parameter, die eine
+# Abfrage nicht hat, bleiben None:
+key_fields = ["jahr", "fm", "egplus"]
+
+
+class QueryStats:
+    """
+    Count where query results came from, and how long callbacks took (the
+    last <window> calls of each, for percentiles).
+    """
+
+    def __init__(self, window: int = 1000):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.window = window
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def record_lookup(self, source: str) -> None:
+        """
+        Count one lookup answered from <source>: "hits" (memory), "disk_hits"
+        or "misses".
+        """
+        with self._lock:
+            setattr(self, source, getattr(self, source) + 1)
+
+    def record_latency(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def as_dict(self) -> dict:
+        callbacks = {}
+        with self._lock:
+            hits, disk_hits, misses = self.hits, self.disk_hits, self.misses
+            for name, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                callbacks[name] = {
+                    "calls": len(ordered),
+                    "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+                    "p95_ms": round(ordered[math.ceil(0.95 * len(ordered)) - 1] * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                }
+
+        lookups = hits + disk_hits + misses
+
+        return {
+            "hits": hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_ratio": round((hits + disk_hits) / lookups, 3) if lookups else None,
+            "callbacks": callbacks,
+        }
+
+
+query_stats = QueryStats()
+
+# Schlüssel -> Ergebnis, zuletzt benutzte am Ende:
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def query_path(key: tuple, inputs: list) -> Path:
+    """
+    Return the cache file of one result: named after the dataset and a hash
+    of its key and the content of its input files.
+    """
+    parts = [json.dumps(key, default=str), *[file_digest(Path(path)) for path in inputs]]
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:24]
+
+    return cache_dir / f"{key[0]}-{digest}.json"
+
+
+def remember(path: Path, result) -> None:
+    """
+    Keep <result> in the LRU cache, dropping the least recently used entries
+    beyond query_cache_size.
+    """
+    with _memory_lock:
+        _memory[path] = result
+        _memory.move_to_end(path)
+        while len(_memory) > query_cache_size:
+            _memory.popitem(last=False)
+
+
+def lookup(path: Path, compute):
+    """
+    Return the result stored under <path>: from memory, else from disk, else
+    computed by <compute>() and stored at both levels.
+    """
+    with _memory_lock:
+        if path in _memory:
+            _memory.move_to_end(path)
+            query_stats.record_lookup("hits")
+            return _memory[path]
+
+    try:
+        result = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        query_stats.record_lookup("misses")
+        result = compute()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomically(path, json.dumps(result).encode("utf-8"))
+        prune()
+    else:
+        query_stats.record_lookup("disk_hits")
+        # zuletzt benutzt, siehe prune() (falls nicht gerade weggeräumt):
+        with suppress(FileNotFoundError):
+            os.utime(path)
+
+    remember(path, result)
+
+    return result
+
+
+def prune(limit: int = None) -> int:
+    """
+    Remove the least recently used result files (last written or read from
+    disk) beyond <limit> (default: config.query_cache_files). Return the
+    number of files removed.
+    """
+    limit = query_cache_files if limit is None else limit
+
+    # ohne die Zwischendateien, die andere Worker gerade schreiben:
+    entries = [
+        entry for entry in os.scandir(cache_dir)
+        if entry.name.endswith(".json") and not entry.name.startswith(".")
+    ]
+    if len(entries) <= limit:
+        return 0
+
+    def last_used(entry):
+        try:
+            return entry.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    n = 0
+    for entry in sorted(entries, key=last_used)[:len(entries) - limit]:
+        # ein anderer Worker räumt womöglich gleichzeitig auf:
+        with suppress(FileNotFoundError):
+            os.unlink(entry.path)
+            n += 1
+
+    logger.info(f"Removed {n} least recently used query results from disk.")
+    return n
+
+
+def cached_query(dataset: str, inputs: list, translated: bool = True):
+    """
+    Decorator: cache the JSON-ready results of a query function by
+    (<dataset>, jahr, fm, egplus, language), for as long as the files
+    <inputs> stay the same. The function's parameters must be among
+    key_fields.
+
+    :param translated: whether results contain translated text; if not, the
+        language is left out of the key and all languages share each result
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+        unknown = set(signature.parameters) - set(key_fields)
+        if unknown:
+            raise ValueError(f"{func.__qualname__} has parameters outside {key_fields}: {sorted(unknown)}")
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (
+                dataset,
+                *[bound.arguments.get(field) for field in key_fields],
+                language_context.get_language() if translated else None,
+            )
+
+            return lookup(query_path(key, inputs), lambda: func(*bound.args, **bound.kwargs))
+
+        return wrapper
+
+    return decorate
+
+
+def timed_callback(name: str):
+    """
+    Decorator for Dash callbacks: record how long each call takes in
+    query_stats, under <name>.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                query_stats.record_latency(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+def invalidate() -> int:
+    """
+    Drop all cached query results, in memory and on disk. Return the number
+    of files removed.
+    """
+    with _memory_lock:
+        _memory.clear()
+
+    n = 0
+    for path in cache_dir.glob("*.json"):
+        path.unlink()
+        n += 1
+
+    logger.info(f"Removed {n} cached query results.")
+    return n
@@ -1,3 +1,9 @@
+import ast
+import hashlib
+import importlib.util
+from functools import lru_cache
+from pathlib import Path
+
 import pandas as pd
 from pandas import Series
 import numpy as np
@@ -22,6 +28,119 @@ rs_state = {
 }
 state_rs = {v: k for k, v in rs_state.items()}
 
+# Hashes of files, keyed by (path, mtime, size), so each file is only read
+# once per process:
+_file_digests = {}
+
+
+def file_digest(path: Path) -> str:
+    """
+    Return the sha256 of a file's content, or "missing".
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return "missing"
+
+    stamp = (str(path), stat.st_mtime_ns, stat.st_size)
+    if stamp not in _file_digests:
+        with open(path, "rb") as file:
+            _file_digests[stamp] = hashlib.file_digest(file, "sha256").hexdigest()
+
+    return _file_digests[stamp]
+
+
+project_dir = Path(__file__).resolve().parents[1]
+
+
+@lru_cache
+def module_file(name: str) -> Path:
+    """
+    Return the source file of module <name> if it belongs to this project,
+    else None (installed packages, built-ins, names that are no module).
+    """
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+
+    if spec is None or not spec.has_location or not spec.origin.endswith(".py"):
+        return None
+
+    path = Path(spec.origin).resolve()
+    if project_dir not in path.parents or "site-packages" in path.parts:
+        return None
+
+    return path
+
+
+@lru_cache
+def imported_modules(name: str) -> tuple:
+    """
+    Return the project modules that module <name> imports itself.
+    """
+    path = module_file(name)
+    package = name if path.name == "__init__.py" else name.rpartition(".")[0]
+
+    imported = []
+    for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+        if isinstance(node, ast.Import):
+            imported.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = importlib.util.resolve_name("." * node.level + (node.module or ""), package)
+            # "from paket import modul" braucht das Modul, nicht den Code
+            # des Pakets; "from modul import name" das Modul selbst:
+            for alias in node.names:
+                submodule = f"{base}.{alias.name}"
+                imported.append(submodule if module_file(submodule) else base)
+
+    return tuple(dict.fromkeys(module for module in imported if module_file(module)))
+
+
+@lru_cache
+def module_files(name: str) -> tuple:
+    """
+    Return the source files of module <name> and of all modules of this
+    project it imports, directly or through others, sorted. Their content is
+    what the module's results depend on besides its data.
+    """
+    found = {}
+    todo = [name]
+    while todo:
+        name = todo.pop()
+        if name not in found and module_file(name):
+            found[name] = module_file(name)
+            todo.extend(imported_modules(name))
+
+    return tuple(sorted(set(found.values())))
+
+
+magwords = {
+    "k": {
+        "div": 1000,
+        "de": " Tsd.",
+        "en": "k",
+    },
+    "M": {
+        "div": 1e6,
+        "de": " Mio.",
+        "en": "m",
+    },
+    "G": {
+        "div": 1e9,
+        "de": " Mrd.",
+        "en": "bn",
+    },
+    None: {
+        "div": 1,
+        "de": "",
+        "en": "",
+    }
+}
+
+# Grenzen für magnitude="auto":
+auto_magnitudes = [(1e6, None), (1e9, "M"), (np.inf, "G")]
+
 
 def num(number: float, separator: str = ".", magnitude: str = None, digits: int = 0, lang: str = "de", space: str = "&#x202F;"):
     """
@@ -33,29 +152,6 @@ def num(number: float, separator: str = ".", magnitude: str = None, digits: int
     :param lang: German (de) or English (en). Defaults to German.
     :param space: character(s) between the number and magnitude string, if any. Defaults to "narrow non-breaking space".
     """
-    magwords = {
-        "k": {
-            "div": 1000,
-            "de": " Tsd.",
-            "en": "k",
-        },
-        "M": {
-            "div": 1e6,
-            "de": " Mio.",
-            "en": "m",
-        },
-        "G": {
-            "div": 1e9,
-            "de": " Mrd.",
-            "en": "bn",
-        },
-        None: {
-            "div": 1,
-            "de": "",
-            "en": "",
-        }
-    }
-
     # throw out nans
     if pd.isna(number):
         return ""
@@ -100,6 +196,104 @@ def num(number: float, separator: str = ".", magnitude: str = None, digits: int
     return outstring
 
 
+# 10, 100, 1000, ...: Stellenzahl ganzer Zahlen per searchsorted
+_powers_of_ten = 10 ** np.arange(1, 19, dtype=np.int64)
+# Ziffer -> Zeichen:
+_figures = np.array(list("0123456789"))
+
+
+def figures(integers: np.ndarray, length: int) -> np.ndarray:
+    """
+    Return the last <length> decimal digits of non-negative integers as a
+    character matrix, one row per number, zero-padded on the left.
+    """
+    return _figures[integers[:, None] // 10 ** np.arange(length - 1, -1, -1) % 10]
+
+
+def nums(numbers, separator: str = ".", magnitude: str = None, digits: int = 0, lang: str = "de", space: str = "&#x202F;"):
+    """
+    num() for many numbers at once, e.g. for the hover labels of all Kreise.
+    The result is the same as that of num(), element by element, but nothing
+    is done per element in Python: numbers are rounded and split into digits
+    as arrays, and all strings of the same layout (length, sign, decimals,
+    suffix) are put together as one character matrix.
+
+    :param numbers: Series, array or list of numbers; missing values become ""
+    :param magnitude: as in num(); "auto" chooses it for each element
+    :param digits: as in num(), but must be an integer
+    :return: strings as a Series with the index of <numbers>, if that is a
+        Series, else as an array
+    """
+    index = numbers.index if isinstance(numbers, Series) else None
+    values = Series(numbers).to_numpy(dtype=float, na_value=np.nan)
+    missing = np.isnan(values)
+    values = np.where(missing, 0, values)
+
+    # Größenordnung je Element:
+    if magnitude == "auto":
+        bounds, magnitudes = zip(*auto_magnitudes)
+        chosen = np.searchsorted(bounds, np.trunc(values), side="right")
+    else:
+        magnitudes = [magnitude]
+        chosen = np.zeros(len(values), dtype=int)
+    divisors = np.array([magwords[m]["div"] for m in magnitudes])[chosen]
+    suffixes = [space + magwords[m][lang] for m in magnitudes]
+
+    rounded = np.round(values / divisors, digits)
+    absolute = np.abs(rounded)
+    integers = np.trunc(absolute).astype(np.int64)
+    lengths = np.searchsorted(_powers_of_ten, integers, side="right") + 1
+
+    # Nachkommastellen, ohne Nullen am Ende (ganze Zahlen haben keine):
+    fraction = np.round((absolute - integers) * 10 ** digits).astype(np.int64)
+    decimals = np.where(fraction > 0, digits, 0)
+    for _ in range(digits):
+        zero = (fraction % 10 == 0) & (decimals > 0)
+        fraction[zero] //= 10
+        decimals[zero] -= 1
+
+    # Tausender und Dezimalzeichen wie "{:,}" und dessen deutsche Variante:
+    if separator == "":
+        thousands = ""
+    else:
+        thousands = separator if lang == "de" else ","
+    decimal = "," if lang == "de" else "."
+
+    # Zeilen gleichen Layouts, als eine Zahl kodiert:
+    negative = rounded < 0
+    layout = ((lengths * 2 + negative) * (digits + 1) + decimals) * len(suffixes) + chosen
+    _, first, layout_of = np.unique(layout, return_index=True, return_inverse=True)
+
+    strings = np.empty(len(values), dtype=object)
+    for i, row in enumerate(first):
+        rows = layout_of == i
+        length, n_decimals = lengths[row], decimals[row]
+
+        # Spalten der Matrix: einzelne Zeichen oder Ziffern je Zeile
+        int_figures = figures(integers[rows], length)
+        columns = ["-"] if negative[row] else []
+        for j in range(length):
+            if j and thousands and (length - j) % 3 == 0:
+                columns.extend(thousands)
+            columns.append(int_figures[:, j])
+        if n_decimals:
+            columns.extend(decimal)
+            columns.extend(figures(fraction[rows], n_decimals).T)
+        columns.extend(suffixes[chosen[row]])
+
+        matrix = np.empty((rows.sum(), len(columns)), dtype="<U1")
+        for j, column in enumerate(columns):
+            matrix[:, j] = column
+        strings[rows] = matrix.view(f"<U{len(columns)}").ravel()
+
+    strings[missing] = ""
+
+    if index is not None:
+        return Series(strings, index=index, dtype=object)
+
+    return strings
+
+
 def ticker(x):
     """
     Automatic tick finding, so we can apply text functions before plotting ticks.
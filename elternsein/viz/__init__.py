@@ -4,3 +4,4 @@ from .cht_eg_births import cht_eg_births
 from .map_bezdauer import map_bezdauer
 from .map_steuern import map_steuern
 from .cht_krs_steuern_bezdauer import cht_krs_steuern_bezdauer
+from .choropleth import chp_bezdauer, chp_steuern, chp_gem_dichte
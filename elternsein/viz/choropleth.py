@@ -0,0 +1,239 @@
+import sys
+from pathlib import Path
+import pandas as pd
+import geopandas as gpd
+import plotly.graph_objects as go
+
+base_dir = Path(__file__).resolve().parents[2]
+sys.path.append(str(base_dir))
+
+from data.sources import destatis_sources, bkg_gem_source
+from .. import datasets
+from ..datasets import memoized
+from ..querycache import cached_query
+from ..i18n import translate as t
+from ..gemeinden import gem_attributes
+from . import geometry
+from .geometry import krs_geometry_files, gem_geometry_files
+
+eg_dauer_file = destatis_sources["eg_dauer"]["processed_file"]
+steuern_file = destatis_sources["steuern"]["processed_file"]
+
+
+# Detailstufen der Kreisgeometrien (Varianten aus dem Import, siehe
+# bkg_source["variants"]) und ab welchem Zoom der Karte sie gezeigt werden:
+geometry_levels = {
+    "coarse": {"variant": "5m", "min_zoom": 0},
+    "medium": {"variant": "1m", "min_zoom": 6},
+    "fine": {"variant": None, "min_zoom": 8},
+}
+
+
+def level_for_zoom(zoom: float) -> str:
+    """
+    Return the coarsest geometry level that still looks right at <zoom>.
+    """
+    fitting = [
+        level for level, spec in geometry_levels.items() if zoom >= spec["min_zoom"]
+    ]
+    return fitting[-1]
+
+
+@memoized(*krs_geometry_files)
+def krs_geometry() -> gpd.GeoDataFrame:
+    """
+    Kreise mit AGS als Index, in der Reihenfolge, in der die Karten sie führen.
+    """
+    gdf = geometry.krs_geometry().copy()
+    gdf["name"] = gdf.gen + ", " + gdf.bez
+
+    return gdf.set_index("ags").sort_index()
+
+
+@memoized(*krs_geometry_files)
+def krs_geojson(level: str = "coarse") -> dict:
+    """
+    Kreisgeometrien der gewünschten Detailstufe als GeoJSON mit AGS als
+    Feature-ID.
+    """
+    gdf = geometry.krs_geometry(geometry_levels[level]["variant"])
+
+    return gdf.set_index("ags").geometry.__geo_interface__
+
+
+@memoized(bkg_gem_source["attribute_file"], *gem_geometry_files)
+def gem_table() -> pd.DataFrame:
+    """
+    Gemeinden mit gid als Index und Namen, in der Reihenfolge der Geometrien.
+    """
+    df = gem_attributes().reindex(geometry.gem_geometry().index)
+    df["name"] = df.gen + " (" + df.bez + ")"
+
+    return df
+
+
+@memoized(*gem_geometry_files)
+def gem_geojson(level: str = "coarse") -> dict:
+    """
+    Gemeindegeometrien der gewünschten Detailstufe als GeoJSON mit der gid als
+    Feature-ID.
+    """
+    return geometry.gem_geometry(geometry_levels[level]["variant"]).geometry.__geo_interface__
+
+
+# Gebietsebenen der Karten: Tabelle (Index = Feature-ID, Spalte "name"),
+# GeoJSON je Detailstufe, und wie dick die Grenzen gezeichnet werden (bei
+# 11.000 Gemeinden kosten Umrisslinien mehr als die Flächen):
+units = {
+    "krs": {"table": krs_geometry, "geojson": krs_geojson, "line_width": 0.3},
+    "gem": {"table": gem_table, "geojson": gem_geojson, "line_width": 0},
+}
+
+
+@memoized(eg_dauer_file, *krs_geometry_files)
+def bezdauer_table() -> pd.DataFrame:
+    """
+    Bezugsdauer in Monaten, eine Zeile pro Kreis (in der Reihenfolge der
+    Geometrien), eine Spalte pro (jahr, egplus, fm).
+    """
+    eg = datasets.eg_dauer()
+
+    return (
+        eg.pivot_table(index="ags", columns=["jahr", "egplus", "fm"], values="monate", observed=True)
+        .reindex(krs_geometry().index)
+    )
+
+
+@memoized(steuern_file, *krs_geometry_files)
+def steuern_table() -> pd.DataFrame:
+    """
+    Steuerkraft pro Steuerpflichtigem, eine Zeile pro Kreis (in der Reihenfolge
+    der Geometrien), eine Spalte pro Jahr.
+    """
+    dfs = datasets.steuern()
+    dfs = dfs.loc[dfs.rs.str.len().le(5)]
+    dfs["ags"] = dfs.rs.str.ljust(8, "0")
+
+    return (
+        dfs.pivot_table(index="ags", columns="jahr", values="steuer_pc", observed=True)
+        .reindex(krs_geometry().index)
+    )
+
+
+def bezdauer_years() -> list:
+    return sorted(datasets.eg_dauer().jahr.unique().tolist())
+
+
+def steuern_years() -> list:
+    return sorted(datasets.steuern().jahr.unique().tolist())
+
+
+def z_values(table: pd.DataFrame, column, digits: int) -> list:
+    """
+    Return one column of a value table as JSON-ready list, with None for
+    missing values (and for a selection that doesn't exist at all).
+    """
+    if column not in table.columns:
+        return [None] * len(table)
+
+    values = table[column].round(digits)
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+@cached_query("bezdauer", [eg_dauer_file, *krs_geometry_files], translated=False)
+def bezdauer_values(jahr: int, egplus: str, fm: str) -> list:
+    """
+    Return the z values for one selection, aligned with the map's locations.
+    """
+    return z_values(bezdauer_table(), (jahr, egplus, fm), digits=1)
+
+
+@cached_query("steuern", [steuern_file, *krs_geometry_files], translated=False)
+def steuern_values(jahr: int) -> list:
+    """
+    Return the z values for one year, aligned with the map's locations.
+    """
+    return z_values(steuern_table(), jahr, digits=0)
+
+
+def choropleth(z: list, hovertemplate: str, colorbar_title: str, unit: str = "krs", **trace_args) -> go.Figure:
+    """
+    Kreis- oder Gemeindekarte (<unit>, siehe units) als Plotly-Choropleth.
+    Geometrie und Orte werden einmal übertragen; für eine andere Auswahl
+    müssen nur die z-Werte ausgetauscht werden (siehe init_map_callbacks()).
+    """
+    table = units[unit]["table"]()
+
+    fig = go.Figure(
+        go.Choroplethmapbox(
+            geojson=units[unit]["geojson"]("coarse"),
+            # GeoJSON-IDs sind Zeichenketten:
+            locations=table.index.astype(str),
+            z=z,
+            customdata=table.name,
+            hovertemplate=hovertemplate,
+            colorbar=dict(title=colorbar_title),
+            marker_line_width=units[unit]["line_width"],
+            marker_line_color="white",
+            **trace_args,
+        )
+    )
+
+    fig.update_layout(
+        mapbox=dict(
+            style="white-bg",
+            center=dict(lat=51.2, lon=10.4),
+            zoom=4.8,
+        ),
+        paper_bgcolor="rgba(255,255,255, 0)",
+        height=750,
+        margin=dict(t=20, r=20, b=20, l=20),
+        # Zoom & Ausschnitt bleiben erhalten, wenn nur die Werte wechseln:
+        uirevision="choropleth",
+    )
+
+    return fig
+
+
+def chp_bezdauer(jahr: int = None, egplus: str = "Mit Elterngeld Plus", fm: str = "Insgesamt"):
+    # ohne Angabe das letzte Jahr, wie am Schieberegler (siehe build_layout()):
+    jahr = jahr if jahr is not None else max(bezdauer_years())
+
+    return choropleth(
+        z=bezdauer_values(jahr, egplus, fm),
+        hovertemplate="<b>%{customdata}</b><br>%{z:.1f} " + t("Monate Elterngeld") + "<extra></extra>",
+        colorbar_title=t("Monate"),
+        colorscale="Viridis",
+    )
+
+
+def chp_steuern(jahr: int = None):
+    jahr = jahr if jahr is not None else max(steuern_years())
+
+    return choropleth(
+        z=steuern_values(jahr),
+        hovertemplate="<b>%{customdata}</b><br>" + t("Steuerkraft") + ": %{z:,.0f} €<extra></extra>",
+        colorbar_title=t("Steuerkraft"),
+        colorscale="Viridis",
+        # gleiche Skala für alle Jahre:
+        zmin=float(steuern_table().min().min()),
+        zmax=12000,
+    )
+
+
+def chp_gem_dichte():
+    """
+    Einwohner je km² in den Gemeinden.
+    """
+    gem = gem_table()
+    dichte = gem.ewz / gem.flaeche
+
+    return choropleth(
+        z=z_values(dichte.to_frame("dichte"), "dichte", digits=0),
+        hovertemplate="<b>%{customdata}</b><br>%{z:,.0f} " + t("Einwohner je km²") + "<extra></extra>",
+        colorbar_title=t("Einwohner je km²"),
+        unit="gem",
+        colorscale="Viridis",
+        # wenige Großstädte würden die Skala sonst für alle anderen plattdrücken:
+        zmax=float(dichte.quantile(0.95)),
+    )
@@ -1,38 +1,20 @@
 import sys
 from pathlib import Path
-import pandas as pd
 import plotly.graph_objects as go
 
 base_dir = Path(__file__).resolve().parents[2]
 sys.path.append(str(base_dir))
 
-from data.sources import destatis_sources
+from ..datasets import eg_empf_jahre
 from ..i18n import translate_series, translate as t
+from .traces import grouped_traces, bulk_figure
 
 
 def cht_eg():
 
-    eg = pd.read_parquet(destatis_sources["eg_empf"]["processed_file"])
-    eg = eg.reset_index(drop=True)
+    eg = eg_empf_jahre()
     eg.land = translate_series(eg.land)
 
-    lastyear = eg.jahr.max()
-    entries_lastyear = eg[["jahr"]].value_counts().sort_index().iloc[-1]
-    entries_penultim = eg[["jahr"]].value_counts().sort_index().iloc[-2]
-
-    if entries_lastyear < entries_penultim:
-        eg = eg.loc[eg.jahr.ne(lastyear)]
-
-    eg = eg.loc[eg.art.eq("Insgesamt")]
-    eg = eg.loc[eg.fm.ne("Insgesamt")]
-
-    eg = eg.groupby(["jahr", "land", "fm", "art"]).sum().drop("quartal", axis=1).reset_index()
-
-    eg["grp_display"] = eg.apply(
-        lambda row: f"{t('Mütter') if row.fm=='weiblich' else t('Väter')} in {row.land}",
-        axis=1
-    )
-
     eg = eg.sort_values(by=["jahr", "land", "fm"], ascending=[True, True, False]).reset_index(drop=True)
     land_clr = {
         t('Schleswig-Holstein'): '#1f77b4',
@@ -58,27 +40,32 @@ def cht_eg():
         "männlich": "dash",
     }
 
-    fig = go.Figure()
+    # was alle Linien gemeinsam haben...
+    shared = go.Scatter(
+        mode="markers+lines",
+        hovertemplate="%{meta}: %{y:f}<extra></extra>",
+    )
 
-    for var, lgrp in eg.groupby(["land", "fm"]):
-        fig.add_trace(
-            go.Scatter(
-                x=lgrp.jahr,
-                y=lgrp.pers,
-                mode="markers+lines",
-                line=dict(
-                    dash=fm_line[var[1]],
-                    color=land_clr[var[0]]
-                ),
-                name=var[0],
-                showlegend=var[1]=="weiblich",
-                legendgroup=var[0],
-                visible=True if var[0] == "Berlin" else "legendonly",
-                customdata=lgrp.grp_display.values,
-                hovertemplate="%{customdata}: %{y:f}<extra></extra>"
-            )
+    # ...und was eine Linie ausmacht:
+    def per_group(var, lgrp):
+        land, fm = var
+        return dict(
+            line=dict(
+                dash=fm_line[fm],
+                color=land_clr[land]
+            ),
+            name=land,
+            showlegend=fm=="weiblich",
+            legendgroup=land,
+            visible=True if land == "Berlin" else "legendonly",
+            meta=f"{t('Mütter') if fm=='weiblich' else t('Väter')} in {land}",
         )
 
+    fig = bulk_figure(
+        shared,
+        grouped_traces(eg, ["land", "fm"], columns={"x": "jahr", "y": "pers"}, per_group=per_group),
+    )
+
     fig.update_layout(
         paper_bgcolor="rgba(255,255,255, 0)",
         plot_bgcolor="rgba(255,255,255, 0)",
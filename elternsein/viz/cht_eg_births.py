@@ -6,31 +6,16 @@ import plotly.graph_objects as go
 base_dir = Path(__file__).resolve().parents[2]
 sys.path.append(str(base_dir))
 
-from data.sources import destatis_sources
+from ..datasets import eg_empf_jahre, geburten_land
 from ..i18n import translate as t, translate_series
+from .traces import grouped_traces, bulk_figure
 
 def cht_eg_births():
 
     # Elterngeld data:
-    eg = pd.read_parquet(destatis_sources["eg_empf"]["processed_file"])
-    eg = eg.reset_index(drop=True)
+    eg = eg_empf_jahre()
 
-    lastyear = eg.jahr.max()
-    entries_lastyear = eg[["jahr"]].value_counts().sort_index().iloc[-1]
-    entries_penultim = eg[["jahr"]].value_counts().sort_index().iloc[-2]
-
-    if entries_lastyear < entries_penultim:
-        eg = eg.loc[eg.jahr.ne(lastyear)]
-
-    eg = eg.loc[eg.art.eq("Insgesamt")]
-    eg = eg.loc[eg.fm.ne("Insgesamt")]
-
-    eg = eg.groupby(["jahr", "land", "fm", "art"]).sum().drop("quartal", axis=1).reset_index()
-
-    eg["grp_display"] = eg.apply(
-        lambda row: f"{'Mütter' if row.fm=='weiblich' else 'Väter'} in {row.land}",
-        axis=1
-    )
+    eg["grp_display"] = eg.fm.eq("weiblich").map({True: "Mütter", False: "Väter"}) + " in " + eg.land.astype(str)
 
     eg.land = translate_series(eg.land)
 
@@ -55,16 +40,9 @@ def cht_eg_births():
     }
 
     # Birth data:
-    gb = pd.read_parquet(destatis_sources["geburten"]["processed_file"])
-    gb = gb.groupby(["jahr", "land"]).geburten.sum().to_frame().reset_index()
+    gb = geburten_land()
     gb.land = translate_series(gb.land)
 
-    ewz = pd.read_parquet(destatis_sources["ewz"]["processed_file"])
-    ewz.land = translate_series(ewz.land)
-
-    gb = pd.merge(gb, ewz, on=["jahr", "land"])
-    gb["geburten_pro_1000"] = gb.geburten / gb.ewz * 1000
-
     egb = pd.merge(
         eg,
         gb[["jahr", "land", "geburten"]],
@@ -82,27 +60,32 @@ def cht_eg_births():
     egb.land = translate_series(egb.land)
     egb.grp_display = translate_series(egb.grp_display)
 
-    fig = go.Figure()
-
-    for var, lgrp in egb.groupby(["land", "fm"]):
-        fig.add_trace(
-            go.Scatter(
-                x=lgrp.jahr,
-                y=lgrp.eg_rate,
-                mode="markers+lines",
-                line=dict(
-                    dash=fm_line[var[1]],
-                    color=land_clr[var[0]]
-                ),
-                name=var[0],
-                showlegend=var[1]=="weiblich",
-                legendgroup=var[0],
-                visible=True if var[0] == "Berlin" else "legendonly",
-                customdata=lgrp.grp_display.values,
-                hovertemplate="%{customdata}: " + t("bei %{y:.1f}% der geborenen Kinder<extra></extra>")
-            )
+    # was alle Linien gemeinsam haben...
+    shared = go.Scatter(
+        mode="markers+lines",
+        hovertemplate="%{meta}: " + t("bei %{y:.1f}% der geborenen Kinder<extra></extra>"),
+    )
+
+    # ...und was eine Linie ausmacht (die Beschriftung gilt für die ganze Gruppe):
+    def per_group(var, lgrp):
+        land, fm = var
+        return dict(
+            line=dict(
+                dash=fm_line[fm],
+                color=land_clr[land]
+            ),
+            name=land,
+            showlegend=fm=="weiblich",
+            legendgroup=land,
+            visible=True if land == "Berlin" else "legendonly",
+            meta=lgrp.grp_display.iloc[0],
         )
 
+    fig = bulk_figure(
+        shared,
+        grouped_traces(egb, ["land", "fm"], columns={"x": "jahr", "y": "eg_rate"}, per_group=per_group),
+    )
+
     fig.update_layout(
         paper_bgcolor="rgba(255,255,255, 0)",
         plot_bgcolor="rgba(255,255,255, 0)",
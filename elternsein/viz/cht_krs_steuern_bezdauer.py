@@ -1,105 +1,121 @@
 import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
-from elternsein.utils import num, cuyo
+from elternsein.utils import num, nums
+from elternsein.datasets import kreise_steuern_egdauer, kreise_steuern_egdauer_file, memoized
 from elternsein.colors import color_rgba
 from ..i18n import translate as t
+from ..querycache import cached_query
+from .traces import bulk_figure
 
 base_dir = Path(__file__).resolve().parents[2]
 sys.path.append(str(base_dir))
 
-# from ...data.sources import destatis_sources
 
-processed_dir = base_dir / "data" / "processed"
+# Ost und West, in der Reihenfolge der Traces, und ihre Farben:
+regions = {
+    "Ost": "#ff0000",
+    "West": "#66ccff",
+}
 
 
-def cht_krs_steuern_bezdauer():
+@memoized(kreise_steuern_egdauer_file)
+def steuern_bezdauer_table() -> pd.DataFrame:
+    """
+    Steuerkraft und Bezugsdauer (mit Elterngeld Plus, alle Eltern) je Kreis
+    und Jahr, mit Ost-West-Markierung und lesbar formatierter Steuerkraft.
+    """
+    df = kreise_steuern_egdauer()
 
-    df = pd.read_parquet(processed_dir / "kreise_steuern_egdauer.parquet")
-
-    # unnötige Einrückung in Kreisnamen entfernen:
-    df.krs = df.krs.str.lstrip()
-
-    # schönere Zahlendarstellung:
-    df["steuer_pc_pretty"] = df.steuer_pc.apply(num)
+    df = df.loc[
+        df.fm.eq("Insgesamt")
+        & df.egplus.eq("Mit Elterngeld Plus")
+    ]
 
     # Jahre sortieren:
     df = df.sort_values(["jahr", "ags"]).reset_index(drop=True)
 
-    # die Ost-West-Markierung:
-    df["ostwest"] = df.ags.apply(lambda x: t("Ost") if int(x[0:2]) > 10 else t("West"))
+    # unnötige Einrückung in Kreisnamen entfernen:
+    df["krs"] = df.krs.str.lstrip()
 
-    # auf ein Jahr festlegen:
-    df = df.loc[
-        # df.jahr.eq(2019)
-        df.fm.eq("Insgesamt")
-        & df.egplus.eq("Mit Elterngeld Plus")
-    ]
+    # schönere Zahlendarstellung:
+    df["steuer_pc_pretty"] = nums(df.steuer_pc)
 
-    # Farben:
-    colormap = {
-        t("Ost"): "#ff0000",
-        t("West"): "#66ccff",
-    }
-
-    fig = go.Figure()
-
-    for jahr, grp in df.groupby("jahr"):
-
-        for ostwest, lgrp in grp.groupby("ostwest"):
-
-            fig.add_trace(
-                go.Scatter(
-                    x=lgrp.steuer_pc,
-                    y=lgrp.monate,
-                    visible=jahr==2016,
-                    mode="markers",
-                    marker=dict(color=color_rgba(colormap[ostwest], .5), size=10, line=dict(width=1, color="black")),
-                    customdata=lgrp[["krs", "steuer_pc_pretty", "monate"]],
-                    hovertemplate=(
-                        "<b>%{customdata[0]}:</b><br><br>"
-                        f"{t('Steuerkraft')}" + ": €%{customdata[1]}<br>"
-                        f"{t('durchschnittlich')}" + " %{customdata[2]} "
-                        f"{t('Monate Elterngeld')}<extra></extra>"
-                    ),
-                    name=lgrp.ostwest.iloc[0] + " " + str(jahr)
-                )
-            )
-
-    steps = []
-    for i, jahr in enumerate(df.jahr.unique()):
-        title = f"<b>Steuerkraft und Bezugsdauer beim Elterngeld</b><br>im Jahr {jahr}"
-
-        # jeder Step definiert den Plot-Titel und welche Traces sichtbar sind
-        step = dict(
-            method="update",
-            args=[
-                {"visible": [False] * len(fig.data)},  # alle ausblenden...
-                {"title": title}
-            ]
-        )
-        # ...außer diesen:
-        for idx in cuyo(fig, str(jahr)):
-            step["args"][0]["visible"][idx] = True
-        
-        steps.append(step)
+    # die Ost-West-Markierung:
+    df["ostwest"] = np.where(df.ags.str[0:2].astype(int) > 10, "Ost", "West")
+
+    return df
+
+
+def steuern_bezdauer_years() -> list:
+    return sorted(steuern_bezdauer_table().jahr.unique().tolist())
+
+
+@cached_query("steuern_bezdauer", [kreise_steuern_egdauer_file], translated=False)
+def steuern_bezdauer_values(jahr: int) -> list:
+    """
+    Return x, y and customdata of the chart's traces (one per entry of
+    <regions>) for one year, JSON-ready. This is all that changes when
+    another year is chosen (see init_chart_callbacks()).
+    """
+    df = steuern_bezdauer_table()
+    df = df.loc[df.jahr.eq(jahr)]
+
+    values = []
+    for region in regions:
+        grp = df.loc[df.ostwest.eq(region)]
+        values.append({
+            "x": grp.steuer_pc.to_numpy(dtype=object, na_value=None).tolist(),
+            "y": grp.monate.to_numpy(dtype=object, na_value=None).tolist(),
+            "customdata": grp[["krs", "steuer_pc_pretty", "monate"]].to_numpy(dtype=object, na_value=None).tolist(),
+        })
+
+    return values
+
+
+def steuern_bezdauer_title(jahr: int) -> str:
+    return f"<b>Steuerkraft und Bezugsdauer beim Elterngeld</b><br>im Jahr {jahr}"
+
+
+def cht_krs_steuern_bezdauer(jahr: int = None):
+    """
+    Steuerkraft vs. Bezugsdauer der Kreise in einem Jahr (ohne Angabe im
+    ersten). Die Figur enthält nur dieses Jahr; für ein anderes tauscht ein
+    Callback x, y und customdata aus (siehe init_chart_callbacks()).
+    """
+    jahr = jahr if jahr is not None else steuern_bezdauer_years()[0]
+
+    # was beide Punktwolken gemeinsam haben...
+    shared = go.Scatter(
+        mode="markers",
+        marker=dict(size=10, line=dict(width=1, color="black")),
+        hovertemplate=(
+            "<b>%{customdata[0]}:</b><br><br>"
+            f"{t('Steuerkraft')}" + ": €%{customdata[1]}<br>"
+            f"{t('durchschnittlich')}" + " %{customdata[2]} "
+            f"{t('Monate Elterngeld')}<extra></extra>"
+        ),
+    )
 
-    sliders = [
+    # ...und was eine ausmacht:
+    traces = [
         dict(
-            active=0,
-            currentvalue={"prefix": "Jahr "},
-            pad={"t": 0},
-            steps=steps,
-            transition={"duration": 300, "easing": "cubic-in-out"},
+            name=t(region),
+            marker=dict(color=color_rgba(color, .5)),
+            **values,
         )
+        for (region, color), values in zip(regions.items(), steuern_bezdauer_values(jahr))
     ]
+    fig = bulk_figure(shared, traces)
 
     xticks = [5000, 10000, 15000, 20000]
     yticks = list(range(23))
 
     fig.update_layout(
+        title=steuern_bezdauer_title(jahr),
         paper_bgcolor="rgba(255,255,255, 0)",
         plot_bgcolor="rgba(255,255,255, 0)",
         # width=800,
@@ -119,7 +135,10 @@ def cht_krs_steuern_bezdauer():
             x=.7, y=.8,
             bgcolor="rgba(0,0,0,0)"
         ),
-        sliders=sliders
+        # die Punkte wandern beim Jahreswechsel an ihre neue Stelle:
+        transition=dict(duration=300, easing="cubic-in-out"),
+        # Zoom & Legendenauswahl bleiben erhalten, wenn nur die Werte wechseln:
+        uirevision="steuern_bezdauer",
     )
 
     return fig
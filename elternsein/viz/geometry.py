@@ -0,0 +1,85 @@
+import sys
+import logging
+from pathlib import Path
+import geopandas as gpd
+
+base_dir = Path(__file__).resolve().parents[2]
+sys.path.append(str(base_dir))
+
+from data.sources import bkg_source, bkg_gem_source
+from ..datasets import memoized
+
+
+logger = logging.getLogger(__name__)
+
+krs_geometry_files = [bkg_source["processed_file"]] + [
+    variant["processed_file"] for variant in bkg_source["variants"].values()
+]
+gem_geometry_files = [bkg_gem_source["geometry_file"]] + [
+    variant["processed_file"] for variant in bkg_gem_source["variants"].values()
+]
+
+# Ost-West-Ausdehnung Deutschlands in Metern, um aus der Breite einer Karte in
+# Pixeln die Auflösung in Metern pro Pixel abzuschätzen:
+germany_width_m = 640_000
+
+
+def variant_for_width(width_px: float):
+    """
+    Return the name of the coarsest geometry variant whose simplification
+    tolerance stays below one pixel on a map of Germany <width_px> wide, or
+    None if only the original geometries will do.
+    """
+    m_per_px = germany_width_m / width_px
+    fitting = [
+        (variant["tolerance"], name)
+        for name, variant in bkg_source["variants"].items()
+        if variant["tolerance"] <= m_per_px
+    ]
+
+    return max(fitting)[1] if fitting else None
+
+
+def variant_file(source: dict, original: Path, variant: str = None) -> Path:
+    """
+    Return the file of a geometry variant of <source>, or <original> if the
+    variant is None or hasn't been built.
+    """
+    if variant is None:
+        return original
+
+    path = source["variants"][variant]["processed_file"]
+    if not path.exists():
+        logger.warning(f"{path.name} not found, using the original geometries.")
+        return original
+
+    return path
+
+
+@memoized(*krs_geometry_files)
+def krs_geometry(variant: str = None) -> gpd.GeoDataFrame:
+    """
+    Kreisgeometrien in der gewünschten Variante (None: Originalauflösung),
+    einmal pro Prozess geladen (bis sich die Dateien ändern).
+    """
+    return gpd.read_parquet(variant_file(bkg_source, bkg_source["processed_file"], variant))
+
+
+@memoized(*krs_geometry_files)
+def krs_shapes(variant: str = None) -> gpd.GeoSeries:
+    """
+    Nur die Kreisgeometrien, mit AGS als Index, einmal pro Prozess und
+    Variante erzeugt. Karten verknüpfen ihre Werte erst beim Zeichnen damit.
+    """
+    return krs_geometry(variant).set_index("ags").geometry
+
+
+@memoized(*gem_geometry_files)
+def gem_geometry(variant: str = None) -> gpd.GeoDataFrame:
+    """
+    Gemeindegeometrien in der gewünschten Variante, mit gid als Index, einmal
+    pro Prozess geladen. Alles andere über die Gemeinden steht in
+    => elternsein.gemeinden.gem_attributes().
+    """
+    path = variant_file(bkg_gem_source, bkg_gem_source["geometry_file"], variant)
+    return gpd.read_parquet(path).set_index("gid")
@@ -1,30 +1,46 @@
 import sys
 from pathlib import Path
 from matplotlib import pyplot as plt
-import pandas as pd
 import geopandas as gpd
-import numpy as np
 
 base_dir = Path(__file__).resolve().parents[2]
 sys.path.append(str(base_dir))
 
-from data.sources import destatis_sources, bkg_source
-from ..i18n import translate_series, translate as t
-
-
-def map_bezdauer():
-    eg = pd.read_parquet(destatis_sources["eg_dauer"]["processed_file"])
-    eg.fm = eg.fm.replace({"weiblich": t("weiblich"), "männlich": t("männlich"), "Insgesamt": t("Insgesamt")})
+from ..datasets import eg_dauer
+from ..i18n import translate as t
+from ..config import map_image_widths
+from .geometry import krs_shapes, variant_for_width
+
+
+def bezdauer_facets(variant: str = None, egplus: str = "Mit Elterngeld Plus", jahr: int = 2023) -> dict:
+    """
+    Return {fm: GeoDataFrame} with the months of EG support per Kreis for
+    one selection. The rows of the selection are picked first, and only then
+    joined with the geometries by AGS, so no polygon is copied into rows
+    that would be thrown away.
+    """
+    eg = eg_dauer()
+    eg = eg.loc[eg.egplus.eq(egplus) & eg.jahr.eq(jahr), ["ags", "fm", "monate"]]
+
+    values = eg.pivot(index="ags", columns="fm", values="monate")
+    shapes = krs_shapes(variant)
+
+    return {
+        fm: gpd.GeoDataFrame(
+            values[fm].rename("monate").to_frame().join(shapes, how="inner"),
+            geometry=shapes.name,
+        )
+        for fm in values.columns
+    }
 
-    gdf = gpd.read_parquet(bkg_source["processed_file"])
 
-    df = gpd.GeoDataFrame(
-        pd.merge(
-            eg, gdf[["ags", "geom"]],
-            on="ags"
-        ),
-        geometry="geom"
-    )
+def map_bezdauer(width_px: int = max(map_image_widths)):
+    """
+    <width_px> is the widest the image will be rendered; it decides which
+    geometry variant is detailed enough.
+    """
+    # die Selektion von egplus und jahr ist dann als interaktiver Teil realisiert:
+    facets = bezdauer_facets(variant_for_width(width_px / 3))
 
     fig, axs = plt.subplots(
         ncols=3,
@@ -34,21 +50,6 @@ def map_bezdauer():
 
     fig.set_size_inches(20, 7.5)
 
-    z_var = "monate"
-    xfac_var = "fm"
-
-    # die Selektion von egplus und jahr ist dann als interaktiver Teil realisiert:
-    df_plot = df.query(
-        'egplus == "Mit Elterngeld Plus"'
-        'and jahr == 2023'
-    )
-
-    facet_var = "fm"
-    facets = df_plot[facet_var].unique()
-
-    cols = np.array([0, 1, 2])
-    subpltcoord = cols
-
     # die drei Karten haben jeweils unterschiedliche Schwankungsbreiten und damit Farbskalen;
     # daher benutzen wir auch drei unterschiedliche Paletten, damit nicht der Eindruck von
     # Vergleichbarkeit entsteht:
@@ -58,19 +59,15 @@ def map_bezdauer():
         "cividis",
     ]
 
-    for xy, facet in zip(subpltcoord, facets):
-
-        df_facet = df_plot.loc[df_plot[facet_var].eq(facet)]
-
-        x = xy
+    for ax, cmap, (facet, df_facet) in zip(axs, colorpalettes, facets.items()):
         df_facet.plot(
-            ax=axs[x],
-            column=z_var,
+            ax=ax,
+            column="monate",
             legend=True,
-            cmap=colorpalettes[x]
+            cmap=cmap,
         )
 
-        axs[x].set_title(facet)
+        ax.set_title(t(facet))
 
     for ax in axs:
         ax.axis("off")
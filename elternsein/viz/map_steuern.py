@@ -1,33 +1,43 @@
 import sys
 from pathlib import Path
 from matplotlib import pyplot as plt
-import pandas as pd
 import geopandas as gpd
 
 base_dir = Path(__file__).resolve().parents[2]
 sys.path.append(str(base_dir))
 
-from data.sources import destatis_sources, bkg_source
-from ..i18n import translate_series, translate as t
+from ..datasets import steuern
+from ..i18n import translate as t
+from ..config import map_image_widths
+from .geometry import krs_shapes, variant_for_width
 
 
-def map_steuern():
-    dfs = pd.read_parquet(destatis_sources["steuern"]["processed_file"])
-    # interaktiv:
-    dfs = dfs.query('jahr == 2019')
+def steuern_frame(variant: str = None, jahr: int = 2019) -> gpd.GeoDataFrame:
+    """
+    Return the tax level per Kreis for one year, joined with the geometries
+    by AGS only after the year has been selected.
+    """
+    dfs = steuern()
+    dfs = dfs.loc[dfs.jahr.eq(jahr), ["rs", "steuer_pc"]]
 
     dfs = dfs.loc[dfs.rs.str.len().le(5)]
     dfs["ags"] = dfs.rs.str.ljust(8, "0")
 
-    gdf = gpd.read_parquet(bkg_source["processed_file"])
+    shapes = krs_shapes(variant)
+
+    return gpd.GeoDataFrame(
+        dfs.drop("rs", axis=1).join(shapes, on="ags", how="inner"),
+        geometry=shapes.name,
+    )
 
-    df = gpd.GeoDataFrame(
-        pd.merge(
-            dfs, gdf[["ags", "geom"]],
-            on="ags"
-        ),
-        geometry="geom"
-    ).drop("rs", axis=1)
+
+def map_steuern(width_px: int = max(map_image_widths)):
+    """
+    <width_px> is the widest the image will be rendered; it decides which
+    geometry variant is detailed enough.
+    """
+    # interaktiv:
+    df = steuern_frame(variant_for_width(width_px))
 
     fig, ax = plt.subplots()
 
@@ -0,0 +1,53 @@
+"""
+Figures with one trace per group, built in bulk.
+
+Instead of one go.Scatter per group, each validated with all its styling and
+each carrying that styling into the JSON sent to the browser, what all traces
+have in common is given once, as a trace that goes into the figure's template
+(plotly.js applies it to every trace of that type). The groups only
+contribute their data and what sets them apart (name, colour, ...), as plain
+dicts, and all of them are added to the figure at once.
+"""
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.basedatatypes import BaseTraceType
+
+
+def grouped_traces(df: pd.DataFrame, by, columns: dict, per_group=None) -> dict:
+    """
+    Return one trace (a dict) per group of <df>, keyed by the group's key, in
+    the order of groupby().
+
+    :param by: column(s) to group by
+    :param columns: trace property -> column of <df>, e.g. {"x": "jahr", "y": "pers"}
+    :param per_group: function (key, group) -> dict of further properties of
+        the group's trace, e.g. its name or colour
+    """
+    traces = {}
+    for key, grp in df.groupby(by, observed=True):
+        trace = {prop: grp[column].to_numpy() for prop, column in columns.items()}
+        if per_group is not None:
+            trace.update(per_group(key, grp))
+        traces[key] = trace
+
+    return traces
+
+
+def bulk_figure(shared: BaseTraceType, traces) -> go.Figure:
+    """
+    Return a figure with <traces>, all of the type of <shared> and with its
+    properties, unless a trace sets them itself. <shared> is added to the
+    default template's properties for that type, replacing those it sets.
+
+    :param shared: trace with the common properties, e.g. go.Scatter(mode="lines")
+    :param traces: trace dicts, as made by grouped_traces() (or its values)
+    """
+    traces = traces.values() if isinstance(traces, dict) else traces
+    fig = go.Figure(data=[{"type": shared.type, **trace} for trace in traces])
+
+    # zu den Vorgaben des Templates für diesen Typ hinzufügen (als dicts, das
+    # Aktualisieren der Template-Objekte selbst ist um ein Vielfaches langsamer):
+    defaults = [default.to_plotly_json() for default in fig.layout.template.data[shared.type]] or [{}]
+    fig.layout.template.data[shared.type] = [{**default, **shared.to_plotly_json()} for default in defaults]
+
+    return fig
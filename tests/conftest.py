@@ -0,0 +1,15 @@
+import sys
+import types
+
+
+# data/sources.py liest die Zugangsdaten aus logindata.py, das nicht im Repo
+# liegt; die Tests fragen keine echte API an und kommen ohne aus:
+try:
+    import logindata  # noqa: F401
+except ImportError:
+    sys.modules["logindata"] = types.SimpleNamespace(
+        destatis_login="",
+        destatis_password="",
+        regiostat_login="",
+        regiostat_password="",
+    )
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from elternsein import datasets
+
+
+def test_handout_protects_cache(tmp_path):
+    path = tmp_path / "werte.parquet"
+    pd.DataFrame({"jahr": [2020, 2021], "wert": [1.0, 2.0]}).to_parquet(path)
+
+    @datasets.memoized(path)
+    def werte():
+        return pd.read_parquet(path)
+
+    # in die ausgehändigte Kopie schreiben, auf jede Art:
+    df = werte()
+    df.loc[0, "wert"] = 99.0
+    df["jahr"] += 1
+    df.iloc[1, 1] = -1.0
+    werte()["wert"].to_numpy()[0] = 42.0
+
+    assert werte().equals(pd.DataFrame({"jahr": [2020, 2021], "wert": [1.0, 2.0]}))
+    assert datasets.builds[f"{__name__}.test_handout_protects_cache.<locals>.werte"] == 1
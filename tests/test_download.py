@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from elternsein.download import DownloadError, download_source, fetch, make_session, part_file
+
+
+body = b"".join(f"{i};Kreis {i};{i * 7 % 23}\n".encode("utf-8") for i in range(20000))
+etag = '"v1"'
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    A server for one file. What it does differs per test: <respond> is
+    called with the handler and the number of the request (from 0).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        self.server.respond(self, len(self.server.requests) - 1)
+
+    def send(self, status: int, payload: bytes = b"", headers: dict = None, length: int = None):
+        self.send_response(status)
+        for name, value in {"ETag": etag, **(headers or {})}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload) if length is None else length))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/table.csv"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def plain(handler, n):
+    handler.send(200, body)
+
+
+def gzipped(handler, n):
+    # wie ein Server, der komprimiert, wenn er darf:
+    if "gzip" in handler.headers.get("Accept-Encoding", ""):
+        handler.send(200, gzip.compress(body), {"Content-Encoding": "gzip"})
+    else:
+        handler.send(200, body)
+
+
+def fetch_from(server, path, **kwargs):
+    with make_session() as session:
+        return fetch(session, server.url, path, backoff=0, **kwargs)
+
+
+def test_full_fetch(server, tmp_path):
+    server.respond = plain
+    path = tmp_path / "table.csv"
+
+    result = fetch_from(server, path)
+
+    assert result["status"] == "fetched"
+    assert result["etag"] == etag
+    assert result["sha256"] == hashlib.sha256(body).hexdigest()
+    assert path.read_bytes() == body
+    assert not part_file(path).exists()
+
+
+def test_gzip_capable_server(server, tmp_path):
+    server.respond = gzipped
+    path = tmp_path / "table.csv"
+
+    result = fetch_from(server, path, retries=1)
+
+    assert result["status"] == "fetched"
+    assert path.read_bytes() == body
+    assert len(server.requests) == 1
+    assert server.requests[0]["Accept-Encoding"] == "identity"
+
+
+def test_gzip_regardless(server, tmp_path):
+    # komprimiert auch ohne Accept-Encoding; Content-Length zählt die
+    # komprimierten Bytes:
+    server.respond = lambda handler, n: handler.send(200, gzip.compress(body), {"Content-Encoding": "gzip"})
+    path = tmp_path / "table.csv"
+
+    result = fetch_from(server, path, retries=1)
+
+    assert result["status"] == "fetched"
+    assert path.read_bytes() == body
+    assert len(server.requests) == 1
+
+
+def test_resume_after_early_close(server, tmp_path):
+    half = len(body) // 2
+
+    def respond(handler, n):
+        if n == 0:
+            # kündigt alles an, schickt die Hälfte und legt auf:
+            handler.close_connection = True
+            handler.send(200, body[:half], {"Accept-Ranges": "bytes"}, length=len(body))
+        else:
+            start = int(handler.headers["Range"].removeprefix("bytes=").rstrip("-"))
+            handler.send(206, body[start:], {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+
+    server.respond = respond
+    path = tmp_path / "archive.zip"
+
+    result = fetch_from(server, path, resume=True)
+
+    assert result["status"] == "fetched"
+    assert path.read_bytes() == body
+    assert result["sha256"] == hashlib.sha256(body).hexdigest()
+    assert len(server.requests) == 2
+    # fortgesetzt wird hinter dem letzten vollständig geschriebenen Stück:
+    offset = int(server.requests[1]["Range"].removeprefix("bytes=").rstrip("-"))
+    assert 0 < offset <= half
+
+
+def test_416_on_complete_part_file(server, tmp_path):
+    server.respond = lambda handler, n: handler.send(416, headers={"Content-Range": f"bytes */{len(body)}"})
+    path = tmp_path / "archive.zip"
+    part_file(path).write_bytes(body)
+
+    result = fetch_from(server, path, resume=True)
+
+    assert result["status"] == "fetched"
+    assert result["sha256"] == hashlib.sha256(body).hexdigest()
+    assert path.read_bytes() == body
+    assert server.requests[0]["Range"] == f"bytes={len(body)}-"
+
+
+def test_416_on_stale_part_file(server, tmp_path):
+    def respond(handler, n):
+        if "Range" in handler.headers:
+            handler.send(416, headers={"Content-Range": f"bytes */{len(body)}"})
+        else:
+            handler.send(200, body)
+
+    server.respond = respond
+    path = tmp_path / "archive.zip"
+    part_file(path).write_bytes(b"x" * (len(body) + 10))
+
+    result = fetch_from(server, path, resume=True)
+
+    assert result["status"] == "fetched"
+    assert path.read_bytes() == body
+    assert "Range" not in server.requests[1]
+
+
+def test_304_revalidation(server, tmp_path):
+    def respond(handler, n):
+        if handler.headers.get("If-None-Match") == etag:
+            handler.send(304)
+        else:
+            handler.send(200, body)
+
+    server.respond = respond
+    source = {"url": server.url, "raw_file": tmp_path / "table.csv"}
+
+    with make_session() as session:
+        first = download_source(session, source, transcode=False)
+        mtime = source["raw_file"].stat().st_mtime_ns
+        second = download_source(session, source, transcode=False, refresh=True)
+
+    assert (first, second) == ("fetched", "not-modified")
+    assert server.requests[1]["If-None-Match"] == etag
+    assert source["raw_file"].read_bytes() == body
+    assert source["raw_file"].stat().st_mtime_ns == mtime
+
+
+def test_error_keeps_credentials_out(server, tmp_path, caplog):
+    server.respond = lambda handler, n: handler.send(403, b"no")
+    params = {"username": "nutzer", "password": "geheim"}
+
+    with pytest.raises(DownloadError) as caught:
+        fetch_from(server, tmp_path / "table.csv", params=params)
+
+    assert str(caught.value) == f"{server.url}: HTTP 403 Forbidden"
+    assert "geheim" not in caplog.text
+    assert isinstance(caught.value.__cause__, requests.HTTPError)
@@ -0,0 +1,12 @@
+from elternsein import figcache
+
+
+def test_prewarm_only_layout_figures(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(figcache, "load_figure", lambda name, language: loaded.append(name))
+    monkeypatch.setattr(figcache, "map_engine", "choropleth")
+
+    figcache.prewarm(["de"])
+
+    assert set(loaded) == set(figcache.figure_specs) - {"map_bezdauer", "map_steuern"}
+    assert loaded.count("chp_bezdauer") == 2
@@ -0,0 +1,133 @@
+import json
+
+import pandas as pd
+import pytest
+
+from elternsein import i18n
+from elternsein.language_context import language_context
+
+
+@pytest.fixture
+def dictionary(tmp_path, monkeypatch):
+    """
+    A dictionary file of our own, with entries in English and French, and
+    the fake translator as backend. Counts how often the file is written.
+    """
+    path = tmp_path / "dictionary.json"
+    path.write_text(json.dumps({
+        "Hallo": {"EN-GB": "Hello", "FR": "Bonjour"},
+        "Welt": {"FR": "Monde"},
+    }))
+    monkeypatch.setattr(i18n, "dictionary_path", path)
+    monkeypatch.setattr(i18n, "dictionary_cache", i18n.DictionaryCache(path))
+
+    writes = []
+    write_atomically = i18n.write_atomically
+
+    def counted(target, raw):
+        writes.append(target)
+        write_atomically(target, raw)
+
+    monkeypatch.setattr(i18n, "write_atomically", counted)
+
+    monkeypatch.setenv("ELTERNSEIN_TRANSLATOR", "fake")
+    i18n.set_backend(None)
+    yield path, writes
+    i18n.set_backend(None)
+
+
+def test_batch_translates_in_chunks_and_saves_once(dictionary):
+    path, writes = dictionary
+    texts = [f"Satz {i}" for i in range(120)]
+
+    with language_context.using("en"):
+        with i18n.translation_batch("en") as batch:
+            # bekannte Texte sofort, fehlende erst nach dem Batch:
+            assert i18n.translate("Hallo") == "Hello"
+            assert [i18n.translate(text) for text in texts] == texts
+            series = i18n.translate_series(pd.Series(["Hallo", "Welt", "Welt", "Satz 0"]))
+            assert series.tolist() == ["Hello", "Welt", "Welt", "Satz 0"]
+            assert writes == []
+
+        assert batch.translated == 121
+        assert i18n.translate("Satz 7") == "[EN-GB] Satz 7"
+        assert i18n.translate("Welt") == "[EN-GB] Welt"
+
+    backend = i18n.get_backend()
+    assert isinstance(backend, i18n.FakeBackend)
+    assert [len(texts) for _, texts in backend.calls] == [50, 50, 21]
+    assert backend.requests == 3
+    assert {target for target, _ in backend.calls} == {"EN-GB"}
+
+    # einmal geschrieben, ohne Reste einer Zwischendatei, andere Sprachen erhalten:
+    assert writes == [path]
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
+    saved = json.loads(path.read_text())
+    assert saved["Hallo"] == {"EN-GB": "Hello", "FR": "Bonjour"}
+    assert saved["Welt"] == {"FR": "Monde", "EN-GB": "[EN-GB] Welt"}
+    assert saved["Satz 119"] == {"EN-GB": "[EN-GB] Satz 119"}
+
+
+def test_backend_is_reused(dictionary):
+    with language_context.using("en"):
+        for texts in [["eins", "zwei"], ["drei"]]:
+            with i18n.translation_batch("en"):
+                for text in texts:
+                    i18n.translate(text)
+
+    backend = i18n.get_backend()
+    assert backend is i18n.get_backend()
+    assert [texts for _, texts in backend.calls] == [["eins", "zwei"], ["drei"]]
+
+
+def test_deepl_client_is_created_once(monkeypatch):
+    clients = []
+
+    class Result:
+        def __init__(self, text):
+            self.text = text
+
+    class Translator:
+        def __init__(self, auth_key):
+            clients.append(self)
+            self.chunks = []
+
+        def translate_text(self, texts, target_lang, source_lang):
+            self.chunks.append(len(texts))
+            return [Result(text.upper()) for text in texts]
+
+    monkeypatch.setattr(i18n.deepl, "Translator", Translator)
+    backend = i18n.DeepLBackend("key")
+
+    assert backend.translate_many([f"t{i}" for i in range(120)], "EN-GB")[-1] == "T119"
+    assert backend.translate_many(["x"], "EN-GB") == ["X"]
+    assert len(clients) == 1
+    assert clients[0].chunks == [50, 50, 20, 1]
+    assert backend.requests == 4
+
+
+def test_lazy_figures_translate_in_one_batch(dictionary, monkeypatch):
+    import elternsein
+
+    path, writes = dictionary
+
+    def get_figure(name):
+        return {"title": [i18n.translate(text) for text in ["Monate", "Jahre", "Hallo"]]}
+
+    monkeypatch.setattr(elternsein, "get_figure", get_figure)
+    load = elternsein.figure_loader("fig", "plotly", "/en/elternsein/", "en")
+
+    with language_context.using("en"):
+        fig = load(True)
+
+    assert fig == {"title": ["[EN-GB] Monate", "[EN-GB] Jahre", "Hello"]}
+    assert [texts for _, texts in i18n.get_backend().calls] == [["Monate", "Jahre"]]
+    assert writes == [path]
+
+
+def test_incomplete_backend_fails_early():
+    class Incomplete(i18n.TranslationBackend):
+        pass
+
+    with pytest.raises(TypeError, match="translate_chunk"):
+        Incomplete()
@@ -0,0 +1,91 @@
+import json
+
+import pandas as pd
+import pytest
+
+from elternsein import matching
+from elternsein.matching import DistrictMatcher, load_crosswalk, normalize, resolve, save_crosswalk
+
+
+# ein paar Kreise in der Schreibweise des BKG (Neustadt a.d.Aisch gekürzt):
+vg = pd.DataFrame({
+    "ags": ["06412", "09373", "09374", "09575", "13003", "13072"],
+    "gen": [
+        "Frankfurt am Main",
+        "Neumarkt i.d.OPf.",
+        "Neustadt a.d.Waldnaab",
+        "Neustadt a.d.Aisch",
+        "Rostock",
+        "Rostock",
+    ],
+    "bez": ["Kreisfreie Stadt", "Kreis", "Kreis", "Kreis", "Kreisfreie Stadt", "Landkreis"],
+})
+
+
+@pytest.mark.parametrize("destatis, bkg", [
+    ("Neumarkt i.d.OPf., Landkreis", "Neumarkt i.d.OPf., Kreis"),
+    ("Neumarkt i. d. OPf., Landkreis", "Neumarkt in der Oberpfalz, Landkreis"),
+    ("Frankfurt a. M., kreisfreie Stadt", "Frankfurt am Main, Kreisfreie Stadt"),
+    ("Frankfurt a.M., Stadtkreis", "Frankfurt am Main, Kreisfreie Stadt"),
+    ("Rostock (bis 03.10.2011), Landkreis", "Rostock, Landkreis"),
+])
+def test_normalize(destatis, bkg):
+    assert normalize(destatis) == normalize(bkg)
+
+
+def test_match_one():
+    matcher = DistrictMatcher(vg)
+
+    assert matcher.match_one("Neumarkt i.d.OPf., Landkreis") == ("09373", "name")
+    assert matcher.match_one("Frankfurt a. M., kreisfreie Stadt") == ("06412", "name")
+    # nur der Name, und der ist eindeutig:
+    assert matcher.match_one("Frankfurt am Main") == ("06412", "gen")
+    assert matcher.match_one("Rostock") == (None, None)
+
+
+def test_fuzzy_needs_threshold_and_margin():
+    matcher = DistrictMatcher(vg)
+
+    assert matcher.match_fuzzy("Neustadt a. d. Waldn, Landkreis", {"09"}, set())[0] == "09374"
+
+    # ähnlich genug, aber beide Neustadt gleich ähnlich:
+    ags, score = matcher.match_fuzzy("Neustadt an der, Landkreis", {"09"}, set())
+    assert ags is None
+    assert score >= matching.fuzzy_threshold
+
+    ags, score = matcher.match_fuzzy("Neumarkt, Stadt", {"09"}, set())
+    assert ags is None
+    assert score < matching.fuzzy_threshold
+
+
+def test_fuzzy_skips_taken():
+    matcher = DistrictMatcher(vg)
+
+    assert matcher.match_fuzzy("Landkreis Rostock", {"13"}, set())[0] == "13072"
+    assert matcher.match_fuzzy("Landkreis Rostock", {"13"}, {"13072"})[0] is None
+
+    # in einer Tabelle nimmt der exakte Treffer den Kreis zuerst:
+    crosswalk = matcher.match(["Rostock, Landkreis", "Landkreis Rostock"])
+    assert crosswalk.ags.tolist() == ["13072", None]
+
+
+def test_manual_entries_survive_new_key(tmp_path):
+    path = tmp_path / "crosswalk.json"
+    crosswalk = pd.DataFrame(
+        {"ags": ["13072", "13003"], "method": ["fuzzy", "manual"], "score": [0.9, None]},
+        index=pd.Index(["Landkreis Rostock", "Hansestadt Rostock"], name="name"),
+    )
+    save_crosswalk(path, crosswalk, "alt", version=3)
+
+    assert load_crosswalk(path, "alt")[0].index.tolist() == ["Landkreis Rostock", "Hansestadt Rostock"]
+    known, version = load_crosswalk(path, "neu")
+    assert (known.index.tolist(), version) == (["Hansestadt Rostock"], 3)
+
+    result = resolve(["Hansestadt Rostock", "Rostock, Landkreis"], vg, path, "neu")
+
+    assert result.ags.tolist() == ["13003", "13072"]
+    assert result.method.tolist() == ["manual", "name"]
+    content = json.loads(path.read_text())
+    assert content["version"] == 4
+    assert content["entries"]["Hansestadt Rostock"]["method"] == "manual"
+    assert "Landkreis Rostock" not in content["entries"]
@@ -0,0 +1,90 @@
+import pytest
+
+from elternsein.pipeline import Pipeline, PipelineError
+
+
+# Stufen laufen in Arbeitsprozessen und müssen sich picklen lassen, also
+# Funktionen auf Modulebene; die Dateien liegen im Verzeichnis des Tests:
+workdir = None
+
+
+def stage_a():
+    (workdir / "a.txt").write_text((workdir / "raw.txt").read_text() + "+")
+
+
+def stage_b():
+    (workdir / "b.txt").write_text((workdir / "a.txt").read_text() + "+")
+
+
+def make_chain(tmp_path):
+    """
+    raw -> a -> b: two stages, the second reading what the first writes.
+    """
+    global workdir
+    workdir = tmp_path
+    raw, a, b = tmp_path / "raw.txt", tmp_path / "a.txt", tmp_path / "b.txt"
+    raw.write_text("x")
+
+    pipeline = Pipeline(tmp_path / "manifest.json")
+    pipeline.stage("a", inputs=[raw], outputs=[a])(stage_a)
+    pipeline.stage("b", inputs=[a], outputs=[b])(stage_b)
+
+    return pipeline, raw, b
+
+
+def test_runs_then_skips(tmp_path):
+    pipeline, raw, b = make_chain(tmp_path)
+
+    first = pipeline.run(jobs=1)
+    second = pipeline.run(jobs=1)
+
+    assert [entry["status"] for entry in first.values()] == ["ran", "ran"]
+    assert [entry["status"] for entry in second.values()] == ["skipped", "skipped"]
+    assert b.read_text() == "x++"
+
+
+def test_changed_input_reruns_downstream(tmp_path):
+    pipeline, raw, b = make_chain(tmp_path)
+    pipeline.run(jobs=1)
+
+    raw.write_text("y")
+    report = pipeline.run(jobs=1)
+
+    assert [entry["status"] for entry in report.values()] == ["ran", "ran"]
+    assert b.read_text() == "y++"
+
+
+def test_unknown_stage(tmp_path):
+    pipeline, _, _ = make_chain(tmp_path)
+
+    with pytest.raises(PipelineError, match="Unknown stage"):
+        pipeline.run(["c"], jobs=1)
+
+
+def test_cycle(tmp_path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    pipeline = Pipeline(tmp_path / "manifest.json")
+    pipeline.stage("a", inputs=[b], outputs=[a])(stage_a)
+    pipeline.stage("b", inputs=[a], outputs=[b])(stage_b)
+
+    with pytest.raises(PipelineError, match="cycle"):
+        pipeline.run(jobs=1)
+
+
+def test_fingerprint_covers_code():
+    import importlib
+    from elternsein.pipeline import local_functions
+
+    stages = importlib.import_module("elternsein.import").pipeline.stages
+
+    helpers = [func.__name__ for func in local_functions(stages["geodaten"].func)]
+    assert helpers == ["import_geodaten", "log_variants", "simplified"]
+
+    files = {path.relative_to(path.parents[1]).as_posix() for path in stages["eg_dauer"].code_files()}
+    assert {
+        "elternsein/genesis.py",
+        "elternsein/matching.py",
+        "elternsein/utils.py",
+        "data/sources.py",
+    } <= files
+    assert "elternsein/import.py" not in files
@@ -0,0 +1,76 @@
+import os
+import threading
+
+import pytest
+
+from elternsein import querycache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """
+    An empty query cache of our own: directory, memory and stats.
+    """
+    monkeypatch.setattr(querycache, "cache_dir", tmp_path)
+    monkeypatch.setattr(querycache, "query_stats", querycache.QueryStats())
+    monkeypatch.setattr(querycache, "_memory", querycache.OrderedDict())
+    yield tmp_path
+
+
+def test_lookup_levels(cache):
+    path = cache / "t-1.json"
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"wert": 1}
+
+    assert querycache.lookup(path, compute) == {"wert": 1}
+    assert querycache.lookup(path, compute) == {"wert": 1}
+    querycache._memory.clear()
+    assert querycache.lookup(path, compute) == {"wert": 1}
+
+    assert calls == [1]
+    stats = querycache.query_stats.as_dict()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_prune_keeps_recently_used(cache):
+    paths = [cache / f"t-{i}.json" for i in range(5)]
+    for i, path in enumerate(paths):
+        path.write_text("1")
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+    # eine Zwischendatei eines anderen Workers bleibt unberührt:
+    (cache / ".t-9.json.tmp").write_text("")
+
+    # t-0 ist die älteste, wird aber gerade von der Platte gelesen:
+    querycache.lookup(paths[0], lambda: pytest.fail("should be read from disk"))
+
+    assert querycache.prune(limit=3) == 2
+    assert sorted(p.name for p in cache.iterdir()) == [".t-9.json.tmp", "t-0.json", "t-3.json", "t-4.json"]
+    assert querycache.prune(limit=3) == 0
+
+
+def test_lookup_prunes_on_write(cache, monkeypatch):
+    monkeypatch.setattr(querycache, "query_cache_files", 2)
+
+    for i in range(4):
+        querycache.lookup(cache / f"t-{i}.json", lambda: i)
+
+    assert len(list(cache.glob("*.json"))) == 2
+
+
+def test_stats_count_every_lookup(cache):
+    def worker(n):
+        for i in range(200):
+            querycache.lookup(cache / f"t-{n}-{i % 20}.json", lambda: i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = querycache.query_stats.as_dict()
+    assert stats["hits"] + stats["disk_hits"] + stats["misses"] == 800
+    assert stats["misses"] == 80
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from elternsein.utils import num, nums
+
+
+values = pd.Series(
+    [np.nan, 0.0, -0.0, 0.4, -0.6, 1.0, -1.5, 12.25, 999.5, 1234.0, -98765.4321,
+     999_999.0, 1_000_000.0, 2_345_678.9, -3_000_000.0, 999_999_999.0, 1.5e9, 7.25e12],
+    index=range(100, 118),
+)
+
+
+@pytest.mark.parametrize("lang", ["de", "en"])
+@pytest.mark.parametrize("magnitude", [None, "k", "M", "auto"])
+@pytest.mark.parametrize("digits", [0, 1, 2])
+@pytest.mark.parametrize("separator", [".", ""])
+def test_nums_matches_num(lang, magnitude, digits, separator):
+    options = dict(separator=separator, magnitude=magnitude, digits=digits, lang=lang)
+
+    result = nums(values, **options)
+
+    pd.testing.assert_series_equal(result, values.map(lambda number: num(number, **options)), check_dtype=False)
+
+
+def test_nums_without_index():
+    assert list(nums([1234.5, None], digits=1, lang="en")) == [num(1234.5, digits=1, lang="en"), ""]